@@ -33,6 +33,15 @@ export default function NewClientPage() {
     fetch("/api/client-types").then(r => r.json()).then(setClientTypes);
   }, []);
 
+  // список исполнителей обновляется по ленте изменений, без периодических перезапросов
+  useEffect(() => {
+    const reload = () => fetch("/api/executors").then(r => r.json()).then(setExecutors);
+    const source = new EventSource("/api/events?entities=executor");
+    source.addEventListener("change", reload);
+    source.addEventListener("reset", reload);
+    return () => source.close();
+  }, []);
+
   const handleSave = async () => {
     setSaving(true);
     setErrorSave("");
@@ -1,14 +1,30 @@
 # app.py
+import asyncio
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
 
-from db import SessionLocal, engine
-from models import Base, Executor, ClientType, SampleContract
+from db import engine
+import migrations
 from routes import router as crm_router
+from bulk_import import router as bulk_import_router
+from export import router as export_router
+from search import router as search_router
+from dashboard import router as dashboard_router
+from metrics import MetricsMiddleware, instrument_pool, router as metrics_router
+from jobs import router as jobs_router
+from events import router as events_router
+from documents import router as documents_router
+from signed_docs import router as signed_docs_router
+import documents
+import status_engine
 
 app = FastAPI()
 
+# Латентность/SQL по маршрутам -> /metrics
+app.add_middleware(MetricsMiddleware)
+instrument_pool(engine)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,42 +34,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Создание таблиц
-Base.metadata.create_all(bind=engine)
+# Схема и начальные данные: на старте одно чтение schema_version, миграции — только если версия отстала
+@app.on_event("startup")
+def migrate_schema():
+    migrations.ensure_schema(engine)
+
+
+# Фоновый пересчёт статусов приложений/договоров (0 — выключить)
+STATUS_INTERVAL = float(os.getenv("CRM_STATUS_INTERVAL", "300"))
+_background: list[asyncio.Task] = []
+
 
-# Наполним начальными данными, если пусто
 @app.on_event("startup")
-def seed_data():
-    db: Session = SessionLocal()
-    try:
-        if db.query(ClientType).count() == 0:
-            db.add(ClientType(id_type_client=1, id_type_short="ООО", id_type_long="Общество с ограниченной ответственностью"))
-        if db.query(Executor).count() == 0:
-            db.add(Executor(
-                id_executor="executor1",
-                type_executor=1,
-                name_executor="Иван Петров",
-                inn_executor="1234567890",
-                ogrn_executor="1234567890123",
-                kpp_executor=None,
-                adress_executor="Адрес",
-                bank_executor="Банк",
-                cor_bank_executor="12345678901234567890",
-                acc_bank_executor="12345678901234567890",
-                bik_bank_executor="123456789",
-                contact_name_executor="Иван Петров",
-                mail_executor="ivan@example.com",
-                tel_executor="1234567890",
-                mess_executor="Telegram",
-            ))
-        if db.query(SampleContract).count() == 0:
-            db.add(SampleContract(
-                id_sample_contract="sample_contract1",
-                name_sample_contract="Договор А",
-                path_sample_contract="/docs/contract_a.doc",
-            ))
-        db.commit()
-    finally:
-        db.close()
+async def start_status_recompute():
+    if STATUS_INTERVAL > 0:
+        _background.append(asyncio.create_task(status_engine.run_periodically(STATUS_INTERVAL)))
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in _background:
+        task.cancel()
+    documents.shutdown_pool()
+
 
+# поиск — до crm_router, чтобы /clients/search не перехватывался маршрутами /clients/{id}
+app.include_router(search_router)
 app.include_router(crm_router)
+app.include_router(bulk_import_router)
+app.include_router(export_router)
+app.include_router(jobs_router)
+app.include_router(events_router)
+app.include_router(documents_router)
+app.include_router(signed_docs_router)
+app.include_router(dashboard_router)
+app.include_router(metrics_router)
@@ -0,0 +1,13 @@
+"""
+Нагрузочные и микро-бенчмарки. Запуск из каталога server: python -m bench.<модуль>
+
+Без CRM_DATABASE_URL бенчмарки работают с отдельным файлом во временном каталоге, а не с
+sqlite:///./crm.db по умолчанию приложения: из server/ это был бы crm.db под git.
+Пакет импортируется раньше db, поэтому значение по умолчанию ставится здесь.
+"""
+
+import os
+import tempfile
+
+BENCH_DATABASE_URL = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'crm-bench.db')}"
+os.environ.setdefault("CRM_DATABASE_URL", BENCH_DATABASE_URL)
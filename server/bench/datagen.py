@@ -0,0 +1,316 @@
+"""
+Синтетические данные в объёмах продакшена: все CHECK-ограничения models.py выполняются.
+
+    python -m bench.datagen [--clients 100000] [--deals 500000] [--attachments 2000000]
+                            [--executors 200] [--services 40] [--seed 1] [--today 2025-01-01]
+    База — CRM_DATABASE_URL (без неё — временный файл, см. bench/__init__.py);
+    схема создаётся migrations.ensure_schema.
+
+- ИНН/ОГРН с верными контрольными цифрами: юрлица — ИНН 10 + ОГРН 13 + КПП,
+  ИП — ИНН 12 + ОГРНИП 15 без КПП; БИК 9 цифр, корр. счёт 301... и расчётный счёт
+  20 цифр с контрольным ключом по БИК.
+- Ключи — того же вида, что ids.new_id, но воспроизводимые: метки времени идут от начала
+  периода договоров, случайная часть — из того же генератора (SeededIds). При одинаковых
+  --seed и --today данные совпадают побайтно. Номера договоров — только цифры.
+- Приложение начинается не раньше договора, date_end_attachment >= date_start_attachment,
+  status_attachment согласован с датой окончания, status_deal — есть ли у договора
+  действующее приложение (как после status_engine).
+- Загрузка — core insert() пачками по --batch строк, транзакция на пачку; триггеры
+  сводки дашборда и FTS поиска работают как при обычной записи.
+"""
+
+from __future__ import annotations
+import argparse
+import calendar
+import json
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Callable, Iterator
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+import migrations
+from db import engine
+from ids import make_id
+from models import Attachment, Client, ClientType, Deal, Executor, SampleContract, Service
+
+CLIENT_TYPES = [
+    dict(id_type_client=1, id_type_short="ООО", id_type_long="Общество с ограниченной ответственностью"),
+    dict(id_type_client=2, id_type_short="ИП", id_type_long="Индивидуальный предприниматель"),
+    dict(id_type_client=3, id_type_short="АО", id_type_long="Акционерное общество"),
+]
+INDIVIDUAL_TYPE = 2
+
+NAMES = ["Альфа", "Вектор", "Гранит", "Дельта", "Север", "Орион", "Меридиан", "Восход", "Прогресс", "Сфера"]
+SUFFIXES = ["Строй", "Торг", "Сервис", "Логистик", "Проект", "Инвест", "Технологии", "Консалт"]
+PEOPLE = ["Иванов Иван", "Петров Пётр", "Сидорова Анна", "Кузнецов Олег", "Смирнова Мария", "Попов Артём"]
+CITIES = ["Москва", "Санкт-Петербург", "Казань", "Екатеринбург", "Новосибирск", "Самара"]
+BANKS = ["ПАО Сбербанк", "Банк ВТБ (ПАО)", "АО «Альфа-Банк»", "АО «Т-Банк»", "ПАО «Совкомбанк»"]
+MESSENGERS = ["Telegram", "WhatsApp", "—"]
+PLACES = ["Офис заказчика", "Удалённо", "Склад", "Объект"]
+
+
+# ================= Реквизиты с контрольными цифрами =================
+def _digits(rnd: random.Random, n: int) -> str:
+    return "".join(rnd.choices("0123456789", k=n))
+
+
+def _weighted(digits: str, weights: tuple[int, ...]) -> int:
+    return sum(int(d) * w for d, w in zip(digits, weights))
+
+
+def inn10(rnd: random.Random) -> str:
+    base = f"{rnd.randint(1, 99):02d}" + _digits(rnd, 7)
+    return base + str(_weighted(base, (2, 4, 10, 3, 5, 9, 4, 6, 8)) % 11 % 10)
+
+
+def inn12(rnd: random.Random) -> str:
+    base = f"{rnd.randint(1, 99):02d}" + _digits(rnd, 8)
+    n11 = str(_weighted(base, (7, 2, 4, 10, 3, 5, 9, 4, 6, 8)) % 11 % 10)
+    n12 = str(_weighted(base + n11, (3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8)) % 11 % 10)
+    return base + n11 + n12
+
+
+def ogrn13(rnd: random.Random) -> str:
+    base = rnd.choice("15") + _digits(rnd, 11)
+    return base + str(int(base) % 11 % 10)
+
+
+def ogrnip15(rnd: random.Random) -> str:
+    base = "3" + _digits(rnd, 13)
+    return base + str(int(base) % 13 % 10)
+
+
+def kpp(rnd: random.Random, inn: str) -> str:
+    return inn[:4] + rnd.choice(["01", "43", "45"]) + "001"
+
+
+def bik(rnd: random.Random) -> str:
+    return "04" + _digits(rnd, 4) + f"{rnd.randint(50, 999):03d}"
+
+
+ACCOUNT_WEIGHTS = (7, 1, 3) * 8
+
+
+def _with_key(prefix3: str, account: str) -> str:
+    """Контрольный ключ счёта (9-я цифра) по трём цифрам, зависящим от БИК."""
+    zeroed = account[:8] + "0" + account[9:]
+    key = _weighted(prefix3 + zeroed, ACCOUNT_WEIGHTS) % 10 * 3 % 10
+    return account[:8] + str(key) + account[9:]
+
+
+def settlement_account(rnd: random.Random, bik_: str) -> str:
+    return _with_key(bik_[-3:], rnd.choice(["40702", "40802"]) + "810" + _digits(rnd, 12))
+
+
+def correspondent_account(bik_: str) -> str:
+    return _with_key("0" + bik_[4:6], "30101810" + "0" + "00000000" + bik_[-3:])
+
+
+def account_is_valid(prefix3: str, account: str) -> bool:
+    return _weighted(prefix3 + account, ACCOUNT_WEIGHTS) % 10 == 0
+
+
+# ================= Строки =================
+class SeededIds:
+    """Замена ids.new_id для --seed: по миллисекунде на ключ начиная со start, случайная часть — из rnd."""
+
+    def __init__(self, rnd: random.Random, start: date):
+        self.rnd = rnd
+        self.ms = calendar.timegm(start.timetuple()) * 1000
+
+    def __call__(self, prefix: str) -> str:
+        self.ms += 1
+        return make_id(prefix, self.ms, self.rnd.getrandbits(80))
+
+
+NewId = Callable[[str], str]
+
+
+def _requisites(rnd: random.Random, individual: bool, suffix: str) -> dict:
+    inn = inn12(rnd) if individual else inn10(rnd)
+    bik_ = bik(rnd)
+    person = rnd.choice(PEOPLE)
+    name = f"ИП {person}" if individual else f"{rnd.choice(NAMES)}{rnd.choice(SUFFIXES)} {rnd.randint(1, 999)}"
+    return {
+        f"name_{suffix}": name,
+        f"inn_{suffix}": inn,
+        f"ogrn_{suffix}": ogrnip15(rnd) if individual else ogrn13(rnd),
+        f"kpp_{suffix}": None if individual else kpp(rnd, inn),
+        f"adress_{suffix}": f"г. {rnd.choice(CITIES)}, ул. {rnd.choice(NAMES)}, д. {rnd.randint(1, 200)}",
+        f"bank_{suffix}": rnd.choice(BANKS),
+        f"bik_bank_{suffix}": bik_,
+        f"cor_bank_{suffix}": correspondent_account(bik_),
+        f"acc_bank_{suffix}": settlement_account(rnd, bik_),
+        f"contact_name_{suffix}": person,
+        f"mail_{suffix}": f"user{rnd.randint(1, 10**6)}@example.com",
+        f"tel_{suffix}": "+79" + _digits(rnd, 9),
+        f"mess_{suffix}": rnd.choice(MESSENGERS),
+    }
+
+
+def _client_type(rnd: random.Random) -> int:
+    return rnd.choices([1, INDIVIDUAL_TYPE, 3], weights=[70, 25, 5])[0]
+
+
+def clients(rnd: random.Random, new_id: NewId, n: int, ids: list[str]) -> Iterator[dict]:
+    for _ in range(n):
+        type_client = _client_type(rnd)
+        row = {"id_client": new_id("client"), "type_client": type_client,
+               **_requisites(rnd, type_client == INDIVIDUAL_TYPE, "client")}
+        ids.append(row["id_client"])
+        yield row
+
+
+def executors(rnd: random.Random, new_id: NewId, n: int, ids: list[str]) -> Iterator[dict]:
+    for _ in range(n):
+        type_executor = _client_type(rnd)
+        row = {"id_executor": new_id("executor"), "type_executor": type_executor,
+               **_requisites(rnd, type_executor == INDIVIDUAL_TYPE, "executor")}
+        ids.append(row["id_executor"])
+        yield row
+
+
+def deals(rnd: random.Random, new_id: NewId, n: int, client_ids: list[str], executor_ids: list[str],
+          first: date, days: int, out: list[tuple[str, date]]) -> Iterator[dict]:
+    for i in range(n):
+        id_deal = new_id("deal")
+        date_deal = first + timedelta(days=rnd.randrange(days))
+        out.append((id_deal, date_deal))
+        yield {
+            "id_deal": id_deal,
+            "id_client_deal": rnd.choice(client_ids),
+            "id_executor_deal": rnd.choice(executor_ids),
+            "number_deal": f"{i + 1:06d}",
+            "date_deal": date_deal,
+            "status_deal": False,  # проставляется после приложений (mark_active_deals)
+            "path_doc_deal": f"/docs/{id_deal}/{id_deal}.doc",
+            "path_pdf_deal": f"/docs/{id_deal}/{id_deal}.pdf",
+            "path_sign_deal": f"/docs/{id_deal}/{id_deal}.sig.pdf" if rnd.random() < 0.6 else None,
+            "status_orig_deal": rnd.random() < 0.5,
+        }
+
+
+def attachments(rnd: random.Random, new_id: NewId, n: int, deal_rows: list[tuple[str, date]],
+                service_ids: list[str], today: date, active: set[str]) -> Iterator[dict]:
+    for _ in range(n):
+        id_deal, date_deal = rnd.choice(deal_rows)
+        id_attachment = new_id("attachment")
+        start = date_deal + timedelta(days=rnd.randrange(60))
+        end = start + timedelta(days=rnd.randint(0, 365))
+        signed = rnd.random() < 0.7
+        if end >= today:
+            active.add(id_deal)
+        yield {
+            "id_attachment": id_attachment,
+            "id_attachment_deal": id_deal,
+            "id_service_attachment": rnd.choice(service_ids),
+            "date_start_attachment": start,
+            "date_end_attachment": end,
+            "place_attachment": rnd.choice(PLACES),
+            "price_attachment": Decimal(rnd.randint(1_000, 5_000_000)) / 100 if rnd.random() < 0.95 else None,
+            "path_doc_attachment": f"/docs/{id_deal}/{id_attachment}.doc",
+            "path_pdf_attachment": f"/docs/{id_deal}/{id_attachment}.pdf",
+            "path_sign_attachment": f"/docs/{id_deal}/{id_attachment}.sig.pdf" if signed else None,
+            "status_sign_attachment": signed,
+            "status_attachment": end >= today,
+        }
+
+
+# ================= Загрузка =================
+def _load(model, rows: Iterator[dict], batch: int) -> tuple[int, float]:
+    stmt = insert(model.__table__)
+    started, total = time.perf_counter(), 0
+    chunk: list[dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= batch:
+            with engine.begin() as conn:
+                conn.execute(stmt, chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        with engine.begin() as conn:
+            conn.execute(stmt, chunk)
+        total += len(chunk)
+    return total, time.perf_counter() - started
+
+
+def mark_active_deals(active: set[str], batch: int) -> tuple[int, float]:
+    """status_deal = true у договоров с действующим приложением (остальные вставлены с false)."""
+    stmt = update(Deal.__table__).where(Deal.__table__.c.id_deal == bindparam("b_id")).values(status_deal=True)
+    started = time.perf_counter()
+    ids = sorted(active)
+    for i in range(0, len(ids), batch):
+        with engine.begin() as conn:
+            conn.execute(stmt, [{"b_id": id_deal} for id_deal in ids[i:i + batch]])
+    return len(ids), time.perf_counter() - started
+
+
+def generate(n_clients: int, n_deals: int, n_attachments: int, n_executors: int = 200,
+             n_services: int = 40, seed: int = 1, batch: int = 5000,
+             progress: Callable[[str], None] = print, today: date | None = None) -> dict:
+    rnd = random.Random(seed)
+    today = today or date.today()
+    first = today - timedelta(days=3 * 365)
+    new_id = SeededIds(rnd, first)
+    migrations.ensure_schema(engine)
+    dialect_insert = postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert
+    with engine.begin() as conn:
+        conn.execute(dialect_insert(ClientType.__table__).on_conflict_do_nothing(), CLIENT_TYPES)
+
+    report: dict = {"seed": seed, "today": today.isoformat(), "tables": {}}
+
+    def record(name: str, count: int, seconds: float) -> None:
+        report["tables"][name] = {"rows": count, "seconds": round(seconds, 1),
+                                  "rows_per_s": round(count / seconds) if seconds else None}
+        progress(f"{name}: {count} строк за {seconds:.1f} с")
+
+    def step(name: str, model, rows: Iterator[dict]) -> None:
+        record(name, *_load(model, rows, batch))
+
+    contract_ids = [new_id("sample_contract") for _ in range(max(1, n_services // 8))]
+    step("sample_contracts", SampleContract, (
+        {"id_sample_contract": cid, "name_sample_contract": f"Договор {i + 1}",
+         "path_sample_contract": f"/templates/contract_{i + 1}.doc"}
+        for i, cid in enumerate(contract_ids)
+    ))
+    service_ids = [new_id("service") for _ in range(n_services)]
+    step("services", Service, (
+        {"id_service": sid, "name_service": f"Услуга {i + 1}", "id_contract_service": rnd.choice(contract_ids)}
+        for i, sid in enumerate(service_ids)
+    ))
+    executor_ids: list[str] = []
+    step("executors", Executor, executors(rnd, new_id, n_executors, executor_ids))
+    client_ids: list[str] = []
+    step("clients", Client, clients(rnd, new_id, n_clients, client_ids))
+    deal_rows: list[tuple[str, date]] = []
+    step("deals", Deal, deals(rnd, new_id, n_deals, client_ids, executor_ids, first, 3 * 365, deal_rows))
+    active: set[str] = set()
+    step("attachments", Attachment, attachments(rnd, new_id, n_attachments, deal_rows, service_ids, today, active))
+    record("deals.status_deal", *mark_active_deals(active, batch))
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100_000)
+    parser.add_argument("--deals", type=int, default=500_000)
+    parser.add_argument("--attachments", type=int, default=2_000_000)
+    parser.add_argument("--executors", type=int, default=200)
+    parser.add_argument("--services", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--today", type=date.fromisoformat, default=None,
+                        help="дата «сегодня» для статусов и периода договоров (по умолчанию — текущая)")
+    args = parser.parse_args()
+    report = generate(args.clients, args.deals, args.attachments, args.executors, args.services,
+                      args.seed, args.batch, today=args.today)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
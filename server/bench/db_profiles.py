@@ -0,0 +1,123 @@
+"""
+Конкурентная нагрузка на профили движка из db.py: несколько процессов (как воркеры
+uvicorn) параллельно пишут и читают одну таблицу; считаем операции в секунду и ошибки
+("database is locked" и т.п.).
+
+    python -m bench.db_profiles [--writers 4] [--readers 8] [--seconds 10]
+    CRM_BENCH_PG_URL=postgresql+psycopg://... — добавить профиль PostgreSQL
+
+Профили: sqlite-default (create_engine без настроек, как было раньше), sqlite-tuned
+(db.make_engine как в приложении: WAL + pragmas, писатели BEGIN IMMEDIATE, читатели BEGIN),
+sqlite-tuned-deferred (то же, но писатели тоже BEGIN — видно, откуда "database is locked"),
+postgres.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import tempfile
+import time
+from dataclasses import replace
+
+from sqlalchemy import Column, Integer, MetaData, Table, Text, create_engine, func, insert, select
+from sqlalchemy.exc import OperationalError
+
+from db import SqliteProfile, make_engine
+
+metadata = MetaData()
+bench_kv = Table(
+    "bench_kv", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("k", Text, nullable=False),
+    Column("v", Text, nullable=False),
+)
+
+
+def _engine(profile: str, url: str):
+    if profile == "sqlite-default":
+        return create_engine(url)
+    if profile == "sqlite-tuned-deferred":
+        return make_engine(url, replace(SqliteProfile.from_env(), begin="DEFERRED"))
+    return make_engine(url)
+
+
+def _worker(profile: str, url: str, role: str, seconds: float, out: mp.Queue) -> None:
+    engine = _engine(profile, url)
+    ok = errors = 0
+    payload = "x" * 200
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            if role == "writer":
+                with engine.begin() as conn:
+                    # чтение + запись в одной транзакции — как типичный обработчик
+                    conn.execute(select(func.max(bench_kv.c.id))).scalar()
+                    conn.execute(insert(bench_kv).values(k=str(random.random()), v=payload))
+            else:
+                # как ReadSessionLocal в приложении
+                with engine.execution_options(sqlite_begin="DEFERRED").connect() as conn:
+                    lo = random.randint(1, 10_000)
+                    conn.execute(select(bench_kv).where(bench_kv.c.id.between(lo, lo + 20))).all()
+            ok += 1
+        except OperationalError:
+            errors += 1
+    engine.dispose()
+    out.put((role, ok, errors))
+
+
+def run_profile(profile: str, url: str, writers: int, readers: int, seconds: float) -> dict:
+    engine = _engine(profile, url)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(bench_kv), [{"k": str(i), "v": "x" * 200} for i in range(10_000)])
+    engine.dispose()
+
+    out: mp.Queue = mp.Queue()
+    procs = [mp.Process(target=_worker, args=(profile, url, role, seconds, out))
+             for role in ["writer"] * writers + ["reader"] * readers]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    totals = {"writes": 0, "write_errors": 0, "reads": 0, "read_errors": 0}
+    for role, ok, errors in results:
+        prefix = "write" if role == "writer" else "read"
+        totals[f"{prefix}s"] += ok
+        totals[f"{prefix}_errors"] += errors
+    return {
+        "profile": profile,
+        "writers": writers,
+        "readers": readers,
+        "seconds": seconds,
+        "writes_per_s": round(totals["writes"] / seconds, 1),
+        "reads_per_s": round(totals["reads"] / seconds, 1),
+        **totals,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in ("sqlite-default", "sqlite-tuned", "sqlite-tuned-deferred"):
+            url = f"sqlite:///{os.path.join(tmp, profile + '.db')}"
+            reports.append(run_profile(profile, url, args.writers, args.readers, args.seconds))
+    pg_url = os.getenv("CRM_BENCH_PG_URL")
+    if pg_url:
+        reports.append(run_profile("postgres", pg_url, args.writers, args.readers, args.seconds))
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Рассылка ленты изменений (events.hub): один писатель, --subscribers подписчиков в одном процессе.
+
+    python -m bench.events_fanout [--subscribers 1000] [--slow 50] [--commits 2000]
+
+Уменьшенный прогон тех же проверок прямо на events.hub — tests/test_events_fanout.py.
+
+- Писатель в отдельном потоке (как обработчик в пуле) коммитит через SessionLocal во
+  временную SQLite: вставки клиентов и повторные изменения одних и тех же строк.
+- Подписчики — корутины в цикле событий: быстрые забирают пачки сразу, медленные
+  спят --slow-delay секунд между пачками (склейка по ключу, при переполнении — reset).
+- Проверки (код выхода 1 при нарушении):
+  * ни у одного подписчика не больше MAX_PENDING неотправленных событий (опрос по ходу);
+  * каждый подписчик в итоге видит последнее событие либо получил reset;
+  * пик памяти Python (tracemalloc) не растёт с числом коммитов: сравнивается с
+    прогоном на --commits // 4.
+
+Результат — JSON: доставлено и склеено событий, reset, задержка доставки p50/p99 и пик памяти.
+commits_per_s занижен: tracemalloc замедляет и писателя.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+
+from bench import datagen
+from bench.stats import percentile
+from db import SessionLocal, make_engine
+import events
+from models import Client, ClientType
+import migrations
+
+MEMORY_GROWTH_LIMIT = 2.0  # пик на полном прогоне / пик на четверти — не больше
+
+
+def writer(engine, commits: int, published_at: dict[int, float], seed: int) -> None:
+    rnd = random.Random(seed)
+    db = SessionLocal(bind=engine)
+    ids: list[str] = []
+    try:
+        for n in range(commits):
+            if ids and n % 3:
+                # повторные изменения «горячих» строк — их подписчик должен получить склеенными
+                client = db.get(Client, rnd.choice(ids[-32:]))
+                client.adress_client = f"г. {rnd.choice(datagen.CITIES)}, д. {n}"
+                db.commit()
+            else:
+                type_client = datagen._client_type(rnd)
+                client = Client(type_client=type_client,
+                                **datagen._requisites(rnd, type_client == datagen.INDIVIDUAL_TYPE, "client"))
+                db.add(client)
+                db.commit()
+                ids.append(client.id_client)
+            published_at[events.hub.stats["published"]] = time.perf_counter()
+    finally:
+        db.close()
+
+
+async def run(engine, subscribers: int, slow: int, slow_delay: float, commits: int, seed: int) -> dict:
+    published_at: dict[int, float] = {}
+    latencies: list[float] = []
+    subs = [events.hub.subscribe() for _ in range(subscribers)]
+    base = subs[0].since
+    received = [0] * subscribers
+    resets = [0] * subscribers
+    last_seq = [base] * subscribers
+    max_pending = 0
+    done = asyncio.Event()
+
+    async def consume(i: int) -> None:
+        sub = subs[i]
+        while True:
+            reset, batch = await events.hub.next_batch(sub, 0.1)
+            now = time.perf_counter()
+            if reset:
+                resets[i] += 1
+                last_seq[i] = sub.since  # после reset клиент перечитывает всё
+            if batch:
+                received[i] += len(batch)
+                last_seq[i] = max(last_seq[i], batch[-1].seq)
+                sent = published_at.get(batch[-1].seq)
+                if sent is not None and i >= slow:
+                    latencies.append(now - sent)
+            if done.is_set() and not (sub.pending or sub.reset):
+                return
+            if i < slow:
+                await asyncio.sleep(slow_delay)
+
+    async def watch() -> None:
+        nonlocal max_pending
+        while not done.is_set():
+            max_pending = max(max_pending, max(len(s.pending) for s in subs))
+            await asyncio.sleep(0.01)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(consume(i)) for i in range(subscribers)]
+    watcher = asyncio.create_task(watch())
+    await asyncio.to_thread(writer, engine, commits, published_at, seed)
+    published_until = time.perf_counter()
+    done.set()
+    await watcher
+    await asyncio.wait_for(asyncio.gather(*tasks), timeout=60)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for sub in subs:
+        events.hub.unsubscribe(sub)
+
+    final = events.hub._seq
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    return {
+        "subscribers": subscribers,
+        "slow_subscribers": slow,
+        "commits": commits,
+        "published": final - base,
+        "commits_per_s": round(commits / (published_until - started)),
+        "delivered": sum(received),
+        "coalesced": subscribers * (final - base) - sum(received),
+        "resets": sum(resets),
+        "max_pending": max_pending,
+        "stale_subscribers": sum(1 for seq in last_seq if seq < final),
+        "delivery_latency_ms": {"p50": round(percentile(ms, 50), 2), "p99": round(percentile(ms, 99), 2)},
+        "peak_traced_mib": round(peak / 2**20, 2),
+    }
+
+
+async def fanout(url: str, subscribers: int = 1000, slow: int = 50, slow_delay: float = 0.5,
+                 commits: int = 2000, seed: int = 1) -> dict:
+    """Два прогона (commits // 4 и commits) и проверки; failures пуст — всё в порядке."""
+    engine = make_engine(url)
+    migrations.ensure_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(ClientType.__table__).prefix_with("OR IGNORE"), datagen.CLIENT_TYPES)
+    try:
+        small = await run(engine, subscribers, slow, slow_delay, max(commits // 4, 1), seed)
+        full = await run(engine, subscribers, slow, slow_delay, commits, seed + 1)
+    finally:
+        engine.dispose()
+    failures = []
+    if full["max_pending"] > events.MAX_PENDING:
+        failures.append(f"max_pending {full['max_pending']} > MAX_PENDING {events.MAX_PENDING}")
+    for report in (small, full):
+        if report["stale_subscribers"]:
+            failures.append(f"{report['stale_subscribers']} подписчиков не дошли до последнего события")
+    if full["peak_traced_mib"] > small["peak_traced_mib"] * MEMORY_GROWTH_LIMIT:
+        failures.append(f"память растёт с числом коммитов: {small['peak_traced_mib']} -> {full['peak_traced_mib']} MiB")
+    return {"max_pending_limit": events.MAX_PENDING, "runs": [small, full], "failures": failures}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--slow", type=int, default=50, help="из них медленных")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="пауза медленного подписчика, с")
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = asyncio.run(fanout(f"sqlite:///{os.path.join(tmp, 'events.db')}", args.subscribers, args.slow,
+                                    args.slow_delay, args.commits, args.seed))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if report["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
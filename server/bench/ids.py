@@ -0,0 +1,100 @@
+"""
+Ключи ids.new_id (префикс + ULID) против прежних prefix + uuid4().hex: скорость вставки
+и размер индекса первичного ключа.
+
+    python -m bench.ids [--rows 1000000] [--batch 10000]
+    CRM_BENCH_PG_URL=postgresql+psycopg://... — добавить PostgreSQL
+
+Таблица повторяет форму clients: String(128) PK + текстовая нагрузка; вставка пачками
+по --batch строк, транзакция на пачку (как bulk_import). Для каждой схемы ключей —
+строк в секунду (общая и на последних 10% — там разброс по B-дереву сильнее всего)
+и размер индекса PK: SQLite — через dbstat, PostgreSQL — pg_relation_size.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import Column, MetaData, String, Table, Text, insert, text
+
+from db import make_engine
+from ids import new_id
+
+metadata = MetaData()
+bench_ids = Table(
+    "bench_ids", metadata,
+    Column("id", String(128), primary_key=True),
+    Column("payload", Text, nullable=False),
+)
+
+KEYS = {
+    "uuid4": lambda: f"client{uuid.uuid4().hex}",
+    "ulid": lambda: new_id("client"),
+}
+
+
+def _index_size(conn) -> int:
+    if conn.dialect.name == "postgresql":
+        return conn.execute(text("SELECT pg_relation_size('bench_ids_pkey')")).scalar()
+    return conn.execute(text(
+        "SELECT SUM(pgsize) FROM dbstat WHERE name = 'sqlite_autoindex_bench_ids_1'"
+    )).scalar()
+
+
+def run(url: str, scheme: str, rows: int, batch: int) -> dict:
+    engine = make_engine(url)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    make_key = KEYS[scheme]
+    payload = "x" * 100
+    tail_from = rows - max(rows // 10, 1)
+    tail_started, tail_rows = None, 0
+    started = time.perf_counter()
+    for offset in range(0, rows, batch):
+        size = min(batch, rows - offset)
+        # хвост начинается с пачки, в которую попадает tail_from, и считается по реально вставленным строкам
+        if tail_started is None and offset + size > tail_from:
+            tail_started = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(insert(bench_ids), [{"id": make_key(), "payload": payload} for _ in range(size)])
+        if tail_started is not None:
+            tail_rows += size
+    finished = time.perf_counter()
+    with engine.connect() as conn:
+        index_bytes = _index_size(conn)
+    metadata.drop_all(engine)
+    engine.dispose()
+    return {
+        "backend": engine.dialect.name,
+        "keys": scheme,
+        "rows": rows,
+        "rows_per_s": round(rows / (finished - started)),
+        "last_10pct_rows_per_s": round(tail_rows / (finished - tail_started)),
+        "pk_index_mib": round(index_bytes / 2**20, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    args = parser.parse_args()
+
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scheme in KEYS:
+            url = f"sqlite:///{os.path.join(tmp, scheme + '.db')}"
+            reports.append(run(url, scheme, args.rows, args.batch))
+    pg_url = os.getenv("CRM_BENCH_PG_URL")
+    if pg_url:
+        for scheme in KEYS:
+            reports.append(run(pg_url, scheme, args.rows, args.batch))
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Сквозная нагрузка на API: локальный uvicorn + конкурентные запросы ко всем маршрутам routes.py.
+
+    python -m bench.datagen                       # один раз: данные в CRM_DATABASE_URL
+    python -m bench.load [--workers 1] [--concurrency 16] [--duration 10] [--out run.json]
+
+- Сервер — отдельный процесс `uvicorn app:app` на свободном порту с той же
+  CRM_DATABASE_URL (фоновый пересчёт статусов выключен, CRM_STATUS_INTERVAL=0).
+- Идентификаторы для /deals/{id_deal} и фильтров берутся выборкой из базы; курсоры
+  второй и следующих страниц — обходом первых страниц списков перед замером.
+- Маршруты нагружаются по очереди: --concurrency корутин шлют запросы --duration секунд.
+  POST /api/clients пишет в базу настоящие строки (реквизиты — как в bench.datagen).
+- Пиковый RSS — сумма VmRSS процесса uvicorn и его воркеров, опрос /proc каждые 50 мс
+  (только Linux): за время каждого маршрута и за весь прогон.
+
+Результат — JSON (stdout или --out): p50/p95/p99/max латентности в мс, запросов в
+секунду, ошибки (HTTP >= 400 и сетевые) и пиковый RSS по каждому маршруту.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+import httpx
+from sqlalchemy import func, select
+
+from bench import datagen
+from bench.stats import percentile
+from db import DATABASE_URL, engine
+from models import Client, Deal, Executor
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+RSS_POLL_S = 0.05
+
+
+# ================= RSS процесса uvicorn =================
+def _children(pid: int) -> list[int]:
+    found = []
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            found += [int(p) for p in (task / "children").read_text().split()]
+        except OSError:
+            pass
+    return found
+
+
+def tree_rss_bytes(pid: int) -> int:
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            for line in Path(f"/proc/{current}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1]) * 1024
+                    break
+        except OSError:
+            continue
+        stack += _children(current)
+    return total
+
+
+class RssSampler:
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.peak = 0
+        self.overall_peak = 0
+
+    def reset(self) -> None:
+        self.peak = 0
+
+    async def run(self) -> None:
+        while True:
+            rss = await asyncio.to_thread(tree_rss_bytes, self.pid)
+            self.peak = max(self.peak, rss)
+            self.overall_peak = max(self.overall_peak, rss)
+            await asyncio.sleep(RSS_POLL_S)
+
+
+# ================= Сценарии =================
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    url: Callable[[random.Random], str]
+    body: Callable[[random.Random], dict] | None = None
+
+
+@dataclass
+class Sample:
+    ids_client: list[str]
+    ids_executor: list[str]
+    ids_deal: list[str]
+    cursors: dict[str, list[str]] = field(default_factory=dict)
+
+
+def sample_ids(limit: int = 1000) -> Sample:
+    with engine.connect() as conn:
+        def pick(column):
+            return list(conn.scalars(select(column).order_by(func.random()).limit(limit)))
+        sample = Sample(pick(Client.id_client), pick(Executor.id_executor), pick(Deal.id_deal))
+    if not (sample.ids_client and sample.ids_executor and sample.ids_deal):
+        raise SystemExit(f"В {DATABASE_URL} нет данных — сначала python -m bench.datagen")
+    return sample
+
+
+async def collect_cursors(client: httpx.AsyncClient, path: str, pages: int) -> list[str]:
+    cursors, cursor = [], None
+    for _ in range(pages):
+        r = await client.get(path, params={"cursor": cursor} if cursor else None)
+        cursor = r.json().get("next_cursor")
+        if not cursor:
+            break
+        cursors.append(cursor)
+    return cursors
+
+
+def _client_payload(rnd: random.Random) -> dict:
+    type_client = datagen._client_type(rnd)
+    return {"type_client": type_client,
+            **datagen._requisites(rnd, type_client == datagen.INDIVIDUAL_TYPE, "client")}
+
+
+def scenarios(s: Sample) -> list[Scenario]:
+    def cursor_of(path: str) -> Callable[[random.Random], str]:
+        cursors = s.cursors.get(path)
+        if not cursors:
+            return lambda r: path
+        return lambda r: f"{path}?cursor={r.choice(cursors)}"
+
+    return [
+        Scenario("GET /api/executors", "GET", lambda r: "/api/executors"),
+        Scenario("GET /api/sample-contracts", "GET", lambda r: "/api/sample-contracts"),
+        Scenario("GET /api/client-types", "GET", lambda r: "/api/client-types"),
+        Scenario("GET /api/reference-cache/stats", "GET", lambda r: "/api/reference-cache/stats"),
+        Scenario("GET /api/clients", "GET", lambda r: "/api/clients"),
+        Scenario("GET /api/clients?cursor", "GET", cursor_of("/api/clients")),
+        Scenario("GET /api/clients?type_client", "GET", lambda r: f"/api/clients?type_client={r.randint(1, 3)}"),
+        Scenario("GET /api/deals", "GET", lambda r: "/api/deals"),
+        Scenario("GET /api/deals?cursor", "GET", cursor_of("/api/deals")),
+        Scenario("GET /api/deals?id_client_deal", "GET",
+                 lambda r: f"/api/deals?id_client_deal={r.choice(s.ids_client)}"),
+        Scenario("GET /api/deals?id_executor_deal&date_from", "GET",
+                 lambda r: f"/api/deals?id_executor_deal={r.choice(s.ids_executor)}&date_from=2024-01-01"),
+        Scenario("GET /api/deals/detailed", "GET", lambda r: "/api/deals/detailed"),
+        Scenario("GET /api/deals/{id_deal}", "GET", lambda r: f"/api/deals/{r.choice(s.ids_deal)}"),
+        Scenario("GET /api/attachments", "GET", lambda r: "/api/attachments"),
+        Scenario("GET /api/attachments?cursor", "GET", cursor_of("/api/attachments")),
+        Scenario("GET /api/attachments?status_attachment=false", "GET",
+                 lambda r: "/api/attachments?status_attachment=false&sort=-date_end"),
+        Scenario("POST /api/clients", "POST", lambda r: "/api/clients", _client_payload),
+    ]
+
+
+# ================= Замер =================
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, concurrency: int,
+                       duration: float, sampler: RssSampler, seed: int) -> dict:
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(n: int) -> None:
+        rnd = random.Random(seed * 1000 + n)
+        while time.perf_counter() < deadline:
+            url = scenario.url(rnd)
+            body = scenario.body(rnd) if scenario.body else None
+            started = time.perf_counter()
+            try:
+                r = await client.request(scenario.method, url, json=body)
+                await r.aread()
+                key = None if r.status_code < 400 else str(r.status_code)
+            except httpx.HTTPError as e:
+                key = type(e).__name__
+            if key is None:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors[key] = errors.get(key, 0) + 1
+
+    sampler.reset()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    return {
+        "endpoint": scenario.name,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(ms, 50), 2),
+            "p95": round(percentile(ms, 95), 2),
+            "p99": round(percentile(ms, 99), 2),
+            "max": round(ms[-1], 2) if ms else 0.0,
+        },
+        "peak_rss_mib": round(sampler.peak / 2**20, 1),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    env = {**os.environ, "CRM_DATABASE_URL": DATABASE_URL, "CRM_STATUS_INTERVAL": "0",
+           "CRM_SLOW_REQUEST_MS": "0", "CRM_SLOW_QUERY_MS": "0"}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"uvicorn завершился с кодом {server.returncode}")
+        try:
+            if (await client.get("/api/client-types")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("uvicorn не ответил за отведённое время")
+
+
+async def main_async(args: argparse.Namespace) -> dict:
+    sample = sample_ids()
+    port = _free_port()
+    server = start_server(port, args.workers)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            await wait_ready(client, server)
+            for path in ("/api/clients", "/api/deals", "/api/attachments"):
+                sample.cursors[path] = await collect_cursors(client, path, args.cursor_pages)
+
+            sampler = RssSampler(server.pid)
+            poller = asyncio.create_task(sampler.run())
+            results = []
+            try:
+                for scenario in scenarios(sample):
+                    if args.only and args.only not in scenario.name:
+                        continue
+                    results.append(await run_scenario(client, scenario, args.concurrency, args.duration,
+                                                      sampler, args.seed))
+                    print(f"{scenario.name}: {results[-1]['throughput_rps']} rps, "
+                          f"p99 {results[-1]['latency_ms']['p99']} ms", file=sys.stderr)
+            finally:
+                poller.cancel()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "database": engine.dialect.name,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "seed": args.seed,
+        },
+        "endpoints": results,
+        "server_peak_rss_mib": round(sampler.overall_peak / 2**20, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=1, help="воркеров uvicorn")
+    parser.add_argument("--concurrency", type=int, default=16, help="одновременных запросов")
+    parser.add_argument("--duration", type=float, default=10, help="секунд на маршрут")
+    parser.add_argument("--cursor-pages", type=int, default=20, help="страниц на сбор курсоров")
+    parser.add_argument("--only", help="только маршруты, содержащие подстроку")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="файл для JSON-отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
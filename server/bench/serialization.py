@@ -0,0 +1,113 @@
+"""
+Списочный ответ на N строк: прежний путь против проекции колонок (projection.py).
+
+    python -m bench.serialization [--rows 10000] [--repeat 5]
+
+- orm: select(Model) -> ORM-сущности (identity map, все колонки) -> валидация модели
+  ответа from_attributes -> JSON; так FastAPI обрабатывает response_model.
+- projected: select(*columns(Model, Schema)) -> Row -> JSONBody.dump (как в routes.py).
+
+Для каждого варианта — лучшее время из --repeat прогонов (запрос + сериализация) и
+строк в секунду. Выборки идут по временной SQLite-базе, созданной через db.make_engine.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from db import make_engine
+import migrations
+from models import Client, Deal, Executor
+from projection import JSONBody, columns
+from routes import DealOut, ExecutorOut
+
+
+def _executor_row(i: int) -> dict:
+    return dict(
+        id_executor=f"executor{i:06d}", type_executor=1, name_executor=f"Исполнитель {i}",
+        inn_executor="7707083893", ogrn_executor="1027700132195", kpp_executor=None,
+        adress_executor="г. Москва, ул. Вавилова, д. 19", bank_executor="ПАО Сбербанк",
+        cor_bank_executor="30101810400000000225", acc_bank_executor="40702810938000000001",
+        bik_bank_executor="044525225", contact_name_executor="Иван Петров",
+        mail_executor="ivan@example.com", tel_executor="84950000000", mess_executor="Telegram",
+    )
+
+
+def _fill(engine, rows: int) -> None:
+    migrations.ensure_schema(engine)  # схема + справочники (client_types для FK)
+    with engine.begin() as conn:
+        conn.execute(insert(Executor.__table__), [_executor_row(i) for i in range(rows)])
+        conn.execute(insert(Client.__table__), [dict(
+            id_client="client1", type_client=1, inn_client="7707083893", ogrn_client="1027700132195",
+            kpp_client="773601001", name_client="ООО Ромашка", adress_client="Адрес", bank_client="Банк",
+            bik_bank_client="044525225", acc_bank_client="40702810938000000001",
+            cor_bank_client="30101810400000000225", tel_client="84950000000", mail_client="a@b.c",
+            mess_client="Telegram", contact_name_client="Пётр",
+        )])
+        start = date(2024, 1, 1)
+        conn.execute(insert(Deal.__table__), [dict(
+            id_deal=f"deal{i:06d}", id_client_deal="client1", id_executor_deal=f"executor{i % rows:06d}",
+            number_deal=f"{i:06d}", date_deal=start + timedelta(days=i % 365), status_deal=True,
+            path_doc_deal=f"/docs/deal{i}.doc", path_pdf_deal=f"/docs/deal{i}.pdf", status_orig_deal=False,
+        ) for i in range(rows)])
+
+
+# адаптеры собираются один раз в обоих вариантах — как response_model в FastAPI
+def _orm(model, schema):
+    adapter = TypeAdapter(list[schema])
+
+    def run(session: Session) -> bytes:
+        entities = session.scalars(select(model)).all()
+        return adapter.dump_json(adapter.validate_python(entities, from_attributes=True))
+    return run
+
+
+def _projected(model, schema):
+    body, stmt = JSONBody(list[schema]), select(*columns(model, schema))
+
+    def run(session: Session) -> bytes:
+        return body.dump(session.execute(stmt).all())
+    return run
+
+
+def _best(engine, run, repeat: int) -> tuple[float, int]:
+    best, size = float("inf"), 0
+    for _ in range(repeat):
+        with Session(engine) as session:  # новая сессия — пустая identity map, как в запросе
+            started = time.perf_counter()
+            size = len(run(session))
+            best = min(best, time.perf_counter() - started)
+    return best, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        _fill(engine, args.rows)
+        for name, model, schema in (("executors", Executor, ExecutorOut), ("deals", Deal, DealOut)):
+            report = {"list": name, "rows": args.rows}
+            for path, make in (("orm", _orm), ("projected", _projected)):
+                seconds, size = _best(engine, make(model, schema), args.repeat)
+                report[path] = {"ms": round(seconds * 1000, 2), "rows_per_s": round(args.rows / seconds), "bytes": size}
+            report["speedup"] = round(report["orm"]["ms"] / report["projected"]["ms"], 2)
+            reports.append(report)
+        engine.dispose()
+    print(json.dumps(reports, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+"""Общие вычисления для отчётов бенчмарков."""
+
+from __future__ import annotations
+import math
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(p / 100 * len(sorted_values))  # nearest-rank
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
@@ -0,0 +1,251 @@
+"""
+Массовый импорт клиентов: POST /api/clients/bulk (CSV или NDJSON).
+
+- Тело читается потоком (request.stream()), разбирается построчно — в памяти держим
+  только текущую строку и по пачке разобранных и валидных записей, независимо от размера
+  файла. Строка (запись CSV) длиннее MAX_LINE символов отбрасывается с ошибкой, не
+  накапливаясь целиком.
+- Каждая строка проверяется схемой ClientIn (там же правила цифр/длины, как в CHECK Client)
+  и наличием type_client в client_types — пачкой в потоке пула, не в цикле событий.
+- Валидные строки вставляются пачками через core insert() (executemany), по commit на пачку.
+  Транзакция записи открывается только на время вставки пачки, не на время чтения тела.
+  Если пачка упала на ограничении БД — повторяем её построчно в savepoint'ах, чтобы
+  отчитаться об ошибке конкретной строки, а остальные всё же вставить.
+- Ответ — сводка и отчёт об ошибках по номерам строк (номер записи данных, с 1).
+"""
+
+from __future__ import annotations
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from db import ReadSessionLocal
+from ids import new_id
+from models import Client, ClientType
+from routes import ClientIn, get_db
+
+router = APIRouter(prefix="/api", tags=["crm"])
+
+MAX_LINE = 64 * 1024  # символов; строка клиента — порядка 500
+
+
+class RowError(BaseModel):
+    row: int
+    errors: list[str]
+
+
+class BulkImportReport(BaseModel):
+    total: int
+    inserted: int
+    failed: int
+    errors: list[RowError]
+    errors_truncated: bool
+
+
+TOO_LONG = f"строка длиннее {MAX_LINE} символов"
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str | None]:
+    """Строки тела; None — строка длиннее MAX_LINE (её остаток до перевода строки пропускается)."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    skipping = False
+    async for chunk in chunks:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            if skipping:  # конец уже отброшенной строки
+                skipping = False
+            elif len(line) > MAX_LINE:
+                yield None
+            else:
+                yield line.removesuffix("\r")
+        if len(tail) > MAX_LINE:
+            if not skipping:
+                skipping = True
+                yield None
+            tail = ""
+    tail += decoder.decode(b"", final=True)
+    if skipping or not tail.strip():
+        return
+    yield None if len(tail) > MAX_LINE else tail.removesuffix("\r")
+
+
+async def _csv_rows(lines: AsyncIterator[str | None]) -> AsyncIterator[dict[str, Any] | str]:
+    header: list[str] | None = None
+    pending: list[str] = []
+    size = quotes = 0
+    skipping = False  # запись длиннее MAX_LINE: дочитываем до баланса кавычек, не храня
+    async for line in lines:
+        if line is None:
+            if not skipping:
+                yield TOO_LONG
+            pending, size, skipping = [], 0, quotes % 2 == 1
+            continue
+        # запись заканчивается, когда кавычки сбалансированы (перевод строки внутри "..." — часть поля)
+        quotes += line.count('"')
+        if skipping:
+            skipping = quotes % 2 == 1
+            continue
+        pending.append(line)
+        size += len(line) + 1
+        if quotes % 2:
+            if size > MAX_LINE:
+                yield TOO_LONG
+                pending, size, skipping = [], 0, True
+            continue
+        record = "\n".join(pending)
+        pending, size, quotes = [], 0, 0
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [h.strip() for h in values]
+            missing = set(ClientIn.model_fields) - set(header) - {"kpp_client"}
+            if missing:
+                raise HTTPException(status_code=400, detail=f"В заголовке CSV нет колонок: {sorted(missing)}")
+            continue
+        if len(values) != len(header):
+            yield f"ожидалось {len(header)} колонок, получено {len(values)}"
+            continue
+        row = dict(zip(header, values))
+        if row.get("kpp_client") == "":
+            row["kpp_client"] = None
+        yield row
+    if pending:
+        yield "незакрытая кавычка в последней записи"
+
+
+async def _ndjson_rows(lines: AsyncIterator[str | None]) -> AsyncIterator[dict[str, Any] | str]:
+    async for line in lines:
+        if line is None:
+            yield TOO_LONG
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield f"некорректный JSON: {e}"
+            continue
+        yield row if isinstance(row, dict) else "ожидался JSON-объект"
+
+
+def _known_types() -> set[int]:
+    # не через сессию записи: на SQLite её SELECT открыл бы BEGIN IMMEDIATE и держал лок
+    # писателя всё время, пока тело запроса идёт по сети до первой пачки
+    db = ReadSessionLocal()
+    try:
+        return set(db.scalars(select(ClientType.id_type_client)))
+    finally:
+        db.close()
+
+
+class _ClientImporter:
+    def __init__(self, db: Session, batch_size: int, max_errors: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.known_types = _known_types()
+        self.batch: list[tuple[int, dict[str, Any]]] = []
+        self.total = self.inserted = self.failed = 0
+        self.errors: list[RowError] = []
+
+    def error(self, row_no: int, messages: list[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(RowError(row=row_no, errors=messages))
+
+    def add(self, row_no: int, row: dict[str, Any] | str) -> bool:
+        """Проверяет строку; True — пачка заполнена и её пора вставлять."""
+        self.total += 1
+        if isinstance(row, str):
+            self.error(row_no, [row])
+            return False
+        try:
+            client = ClientIn.model_validate(row)
+        except ValidationError as e:
+            self.error(row_no, [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()])
+            return False
+        if client.type_client not in self.known_types:
+            self.error(row_no, [f"type_client: нет типа клиента {client.type_client}"])
+            return False
+        self.batch.append((row_no, {"id_client": new_id("client"), **client.model_dump()}))
+        return len(self.batch) >= self.batch_size
+
+    def load(self, rows: list[tuple[int, dict[str, Any] | str]]) -> None:
+        """Проверка и вставка пачки разобранных строк — в потоке пула."""
+        for row_no, row in rows:
+            if self.add(row_no, row):
+                self.flush()
+
+    def flush(self) -> None:
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        stmt = insert(Client.__table__)
+        try:
+            self.db.execute(stmt, [values for _, values in batch])
+            self.db.commit()
+            self.inserted += len(batch)
+            return
+        except IntegrityError:
+            self.db.rollback()
+        for row_no, values in batch:
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(stmt, [values])
+                self.inserted += 1
+            except IntegrityError as e:
+                self.error(row_no, [str(e.orig)])
+        self.db.commit()
+
+    def report(self) -> BulkImportReport:
+        return BulkImportReport(
+            total=self.total, inserted=self.inserted, failed=self.failed,
+            errors=self.errors, errors_truncated=self.failed > len(self.errors),
+        )
+
+
+def _detect_format(request: Request, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return "ndjson"
+    raise HTTPException(status_code=415, detail="Ожидается text/csv или application/x-ndjson (или ?format=)")
+
+
+@router.post("/clients/bulk", response_model=BulkImportReport)
+async def bulk_import_clients(
+    request: Request,
+    format: str | None = Query(None, pattern="^(csv|ndjson)$"),
+    batch_size: int = Query(1000, ge=1, le=10000),
+    max_errors: int = Query(1000, ge=0, le=100000),
+    db: Session = Depends(get_db),
+):
+    fmt = _detect_format(request, format)
+    importer = await run_in_threadpool(_ClientImporter, db, batch_size, max_errors)
+    parse = _csv_rows if fmt == "csv" else _ndjson_rows
+    rows: list[tuple[int, dict[str, Any] | str]] = []
+    try:
+        async for row in parse(_lines(request.stream())):
+            rows.append((len(rows) + importer.total + 1, row))
+            if len(rows) >= batch_size:
+                await run_in_threadpool(importer.load, rows)
+                rows = []
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Файл должен быть в кодировке UTF-8")
+    await run_in_threadpool(importer.load, rows)
+    await run_in_threadpool(importer.flush)
+    return importer.report()
@@ -0,0 +1,221 @@
+"""
+Дашборд: GET /api/dashboard — помесячные итоги по исполнителям.
+
+Читает только сводную таблицу dashboard_monthly (models.DashboardMonthly), без GROUP BY
+по deals/attachments. Сводка поддерживается инкрементально триггерами БД — так её не
+обходят ни core-вставки (bulk_import), ни set-based UPDATE пересчёта статусов:
+
+- deals: INSERT — +договор; UPDATE исполнителя/даты/status_orig_deal — вычесть вклад
+  договора (вместе с его приложениями) из старой корзины и добавить в новую;
+  BEFORE DELETE — вычесть вклад договора с приложениями (каскадно удаляемые приложения
+  договор уже не находят и второй раз не вычитаются);
+- attachments: INSERT/DELETE/UPDATE статуса, цены или договора — +-1 к активным/истёкшим
+  и +-цена в корзине договора.
+
+Сумма цен копится в копейках (price_total_minor, целое): на SQLite цены — REAL, и сумма
+приращений расходилась бы с rebuild() в младших разрядах, а на крупных суммах — и в копейках.
+
+Ремонт (после ручных правок или смены логики): python dashboard.py --rebuild
+"""
+
+from __future__ import annotations
+from decimal import Decimal
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+from sqlalchemy import event, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from models import Base, DashboardMonthly
+from routes import get_db
+
+router = APIRouter(prefix="/api", tags=["crm"])
+
+SUMMARY_COLS = (
+    "id_executor, month, deals, deals_waiting_orig, attachments_active, attachments_expired, price_total_minor"
+)
+ON_CONFLICT = (
+    "ON CONFLICT (id_executor, month) DO UPDATE SET "
+    + ", ".join(
+        f"{c} = dashboard_monthly.{c} + excluded.{c}"
+        for c in ("deals", "deals_waiting_orig", "attachments_active", "attachments_expired", "price_total_minor")
+    )
+)
+
+
+def _month(dialect: str, expr: str) -> str:
+    return f"to_char({expr}, 'YYYY-MM')" if dialect == "postgresql" else f"substr({expr}, 1, 7)"
+
+
+def _minor(expr: str) -> str:
+    """Цена в копейках: целое, складывается без ошибок округления."""
+    return f"CAST(ROUND({expr} * 100) AS BIGINT)"
+
+
+def _deal_delta(dialect: str, r: str, sign: int) -> str:
+    """Вклад договора r (NEW/OLD) вместе с его приложениями, со знаком sign."""
+    return (
+        f"INSERT INTO dashboard_monthly ({SUMMARY_COLS}) "
+        f"SELECT {r}.id_executor_deal, {_month(dialect, f'{r}.date_deal')}, {sign}, "
+        f"{sign} * (CASE WHEN {r}.status_orig_deal THEN 0 ELSE 1 END), "
+        f"{sign} * COALESCE(SUM(CASE WHEN a.status_attachment THEN 1 ELSE 0 END), 0), "
+        f"{sign} * COALESCE(SUM(CASE WHEN a.status_attachment THEN 0 ELSE 1 END), 0), "
+        f"{sign} * COALESCE(SUM({_minor('a.price_attachment')}), 0) "
+        f"FROM attachments a WHERE a.id_attachment_deal = {r}.id_deal {ON_CONFLICT}"
+    )
+
+
+def _attachment_delta(dialect: str, r: str, sign: int) -> str:
+    """Вклад приложения r (NEW/OLD) в корзину его договора, со знаком sign."""
+    return (
+        f"INSERT INTO dashboard_monthly ({SUMMARY_COLS}) "
+        f"SELECT d.id_executor_deal, {_month(dialect, 'd.date_deal')}, 0, 0, "
+        f"{sign} * (CASE WHEN {r}.status_attachment THEN 1 ELSE 0 END), "
+        f"{sign} * (CASE WHEN {r}.status_attachment THEN 0 ELSE 1 END), "
+        f"{sign} * COALESCE({_minor(f'{r}.price_attachment')}, 0) "
+        f"FROM deals d WHERE d.id_deal = {r}.id_attachment_deal {ON_CONFLICT}"
+    )
+
+
+DEAL_COLS = "id_executor_deal, date_deal, status_orig_deal"
+ATTACHMENT_COLS = "id_attachment_deal, status_attachment, price_attachment"
+
+
+def _sqlite_ddl() -> list[str]:
+    d = "sqlite"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS dashboard_deals_ai AFTER INSERT ON deals BEGIN "
+        f"{_deal_delta(d, 'NEW', 1)}; END",
+        f"CREATE TRIGGER IF NOT EXISTS dashboard_deals_au AFTER UPDATE OF {DEAL_COLS} ON deals BEGIN "
+        f"{_deal_delta(d, 'OLD', -1)}; {_deal_delta(d, 'NEW', 1)}; END",
+        f"CREATE TRIGGER IF NOT EXISTS dashboard_deals_bd BEFORE DELETE ON deals BEGIN "
+        f"{_deal_delta(d, 'OLD', -1)}; END",
+        f"CREATE TRIGGER IF NOT EXISTS dashboard_attachments_ai AFTER INSERT ON attachments BEGIN "
+        f"{_attachment_delta(d, 'NEW', 1)}; END",
+        f"CREATE TRIGGER IF NOT EXISTS dashboard_attachments_au AFTER UPDATE OF {ATTACHMENT_COLS} ON attachments BEGIN "
+        f"{_attachment_delta(d, 'OLD', -1)}; {_attachment_delta(d, 'NEW', 1)}; END",
+        f"CREATE TRIGGER IF NOT EXISTS dashboard_attachments_ad AFTER DELETE ON attachments BEGIN "
+        f"{_attachment_delta(d, 'OLD', -1)}; END",
+    ]
+
+
+SQLITE_TRIGGERS = ("dashboard_deals_ai", "dashboard_deals_au", "dashboard_deals_bd",
+                   "dashboard_attachments_ai", "dashboard_attachments_au", "dashboard_attachments_ad")
+
+
+def _pg_ddl() -> list[str]:
+    d = "postgresql"
+    return [
+        f"""CREATE OR REPLACE FUNCTION dashboard_deals_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN {_deal_delta(d, 'OLD', -1)}; END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN {_deal_delta(d, 'NEW', 1)}; END IF;
+    IF TG_OP = 'DELETE' THEN RETURN OLD; END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql""",
+        f"""CREATE OR REPLACE FUNCTION dashboard_attachments_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN {_attachment_delta(d, 'OLD', -1)}; END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN {_attachment_delta(d, 'NEW', 1)}; END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql""",
+        "DROP TRIGGER IF EXISTS dashboard_deals_aiu ON deals",
+        f"CREATE TRIGGER dashboard_deals_aiu AFTER INSERT OR UPDATE OF {DEAL_COLS} ON deals "
+        "FOR EACH ROW EXECUTE FUNCTION dashboard_deals_trg()",
+        "DROP TRIGGER IF EXISTS dashboard_deals_bd ON deals",
+        "CREATE TRIGGER dashboard_deals_bd BEFORE DELETE ON deals "
+        "FOR EACH ROW EXECUTE FUNCTION dashboard_deals_trg()",
+        "DROP TRIGGER IF EXISTS dashboard_attachments_aiud ON attachments",
+        f"CREATE TRIGGER dashboard_attachments_aiud AFTER INSERT OR DELETE OR UPDATE OF {ATTACHMENT_COLS} "
+        "ON attachments FOR EACH ROW EXECUTE FUNCTION dashboard_attachments_trg()",
+    ]
+
+
+def ddl(dialect: str) -> list[str]:
+    """DDL для диалекта (пусто — диалект не поддерживается); входит в отпечаток схемы (migrations.py)."""
+    return {"sqlite": _sqlite_ddl, "postgresql": _pg_ddl}.get(dialect, list)()
+
+
+def install(conn: Connection) -> None:
+    for stmt in ddl(conn.dialect.name):
+        conn.exec_driver_sql(stmt)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, conn: Connection, **kw) -> None:
+    install(conn)
+
+
+def reinstall(conn: Connection) -> None:
+    """Заменить триггеры текущими (SQLite: CREATE TRIGGER IF NOT EXISTS старые не трогает) и пересчитать сводку."""
+    if conn.dialect.name == "sqlite":
+        for name in SQLITE_TRIGGERS:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    install(conn)
+    rebuild(conn)
+
+
+def rebuild(conn: Connection) -> None:
+    """Полный пересчёт сводки из deals/attachments (одна транзакция)."""
+    month = _month(conn.dialect.name, "d.date_deal")
+    conn.exec_driver_sql("DELETE FROM dashboard_monthly")
+    conn.exec_driver_sql(
+        f"INSERT INTO dashboard_monthly ({SUMMARY_COLS}) "
+        f"SELECT d.id_executor_deal, {month}, COUNT(*), "
+        f"SUM(CASE WHEN d.status_orig_deal THEN 0 ELSE 1 END), "
+        f"COALESCE(SUM(a.active), 0), COALESCE(SUM(a.expired), 0), COALESCE(SUM(a.price), 0) "
+        f"FROM deals d LEFT JOIN ("
+        f"  SELECT id_attachment_deal, "
+        f"         SUM(CASE WHEN status_attachment THEN 1 ELSE 0 END) AS active, "
+        f"         SUM(CASE WHEN status_attachment THEN 0 ELSE 1 END) AS expired, "
+        f"         SUM(COALESCE({_minor('price_attachment')}, 0)) AS price "
+        f"  FROM attachments GROUP BY id_attachment_deal"
+        f") a ON a.id_attachment_deal = d.id_deal "
+        f"GROUP BY d.id_executor_deal, {month}"
+    )
+
+
+class DashboardRow(BaseModel):
+    id_executor: str
+    month: str
+    deals: int
+    deals_waiting_orig: int
+    attachments_active: int
+    attachments_expired: int
+    price_total: Decimal  # DashboardMonthly.price_total: копейки / 100, без двоичного округления
+
+    class Config:
+        from_attributes = True
+
+
+@router.get("/dashboard", response_model=list[DashboardRow])
+def get_dashboard(
+    id_executor: str | None = None,
+    month_from: str | None = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    month_to: str | None = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    db: Session = Depends(get_db),
+):
+    stmt = select(DashboardMonthly).where(
+        (DashboardMonthly.deals != 0) | (DashboardMonthly.attachments_active != 0)
+        | (DashboardMonthly.attachments_expired != 0)
+    )
+    if id_executor is not None:
+        stmt = stmt.where(DashboardMonthly.id_executor == id_executor)
+    if month_from is not None:
+        stmt = stmt.where(DashboardMonthly.month >= month_from)
+    if month_to is not None:
+        stmt = stmt.where(DashboardMonthly.month <= month_to)
+    return db.scalars(stmt.order_by(DashboardMonthly.id_executor, DashboardMonthly.month)).all()
+
+
+if __name__ == "__main__":
+    import argparse
+    from db import engine
+
+    parser = argparse.ArgumentParser(description="Сводка дашборда")
+    parser.add_argument("--rebuild", action="store_true", help="создать триггеры и пересчитать сводку целиком")
+    args = parser.parse_args()
+    if args.rebuild:
+        with engine.begin() as conn:
+            reinstall(conn)
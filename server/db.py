@@ -1,7 +1,137 @@
+"""
+Подключение к БД: профиль движка выбирается по CRM_DATABASE_URL.
 
-from sqlalchemy import create_engine
+- SQLite (по умолчанию sqlite:///./crm.db): на каждом подключении — WAL, synchronous=NORMAL,
+  busy_timeout, mmap_size, cache_size и foreign_keys=ON (иначе RESTRICT/CASCADE из models.py
+  не работают). Транзакции открываем сами, иначе pysqlite ломает SAVEPOINT'ы:
+  пишущие — BEGIN IMMEDIATE (CRM_SQLITE_BEGIN), читающие (ReadSessionLocal, GET-запросы) —
+  обычный BEGIN, в WAL они писателей не ждут.
+- PostgreSQL: размер пула, overflow, pre_ping, recycle и серверные таймауты
+  (statement_timeout, lock_timeout, idle_in_transaction_session_timeout).
+
+Все параметры — переменные окружения CRM_*, см. SqliteProfile.from_env / PostgresProfile.from_env.
+Сравнение профилей под конкурентной нагрузкой: python -m bench.db_profiles
+"""
+
+from __future__ import annotations
+import os
+from dataclasses import dataclass
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
 
-# SQLite файл в текущей папке. Можно заменить на Postgres DSN.
-engine = create_engine("sqlite:///./crm.db", future=True)
+DATABASE_URL = os.getenv("CRM_DATABASE_URL", "sqlite:///./crm.db")
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+@dataclass(frozen=True)
+class SqliteProfile:
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    busy_timeout_ms: int = 5000
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size_kib: int = 64 * 1024
+    foreign_keys: bool = True
+    # IMMEDIATE — писатели сразу берут RESERVED-лок и ждут busy_timeout, а не падают с
+    # "database is locked" при попытке повысить читающую транзакцию до пишущей
+    begin: str = "IMMEDIATE"
+
+    @classmethod
+    def from_env(cls) -> "SqliteProfile":
+        return cls(
+            journal_mode=os.getenv("CRM_SQLITE_JOURNAL_MODE", cls.journal_mode),
+            synchronous=os.getenv("CRM_SQLITE_SYNCHRONOUS", cls.synchronous),
+            busy_timeout_ms=_env_int("CRM_SQLITE_BUSY_TIMEOUT_MS", cls.busy_timeout_ms),
+            mmap_size=_env_int("CRM_SQLITE_MMAP_SIZE", cls.mmap_size),
+            cache_size_kib=_env_int("CRM_SQLITE_CACHE_SIZE_KIB", cls.cache_size_kib),
+            foreign_keys=os.getenv("CRM_SQLITE_FOREIGN_KEYS", "1") != "0",
+            begin=os.getenv("CRM_SQLITE_BEGIN", cls.begin).upper(),
+        )
+
+
+@dataclass(frozen=True)
+class PostgresProfile:
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: int = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_timeout_ms: int = 30000
+    lock_timeout_ms: int = 5000
+    idle_in_transaction_timeout_ms: int = 60000
+
+    @classmethod
+    def from_env(cls) -> "PostgresProfile":
+        return cls(
+            pool_size=_env_int("CRM_DB_POOL_SIZE", cls.pool_size),
+            max_overflow=_env_int("CRM_DB_MAX_OVERFLOW", cls.max_overflow),
+            pool_timeout=_env_int("CRM_DB_POOL_TIMEOUT", cls.pool_timeout),
+            pool_recycle=_env_int("CRM_DB_POOL_RECYCLE", cls.pool_recycle),
+            pool_pre_ping=os.getenv("CRM_DB_POOL_PRE_PING", "1") != "0",
+            statement_timeout_ms=_env_int("CRM_PG_STATEMENT_TIMEOUT_MS", cls.statement_timeout_ms),
+            lock_timeout_ms=_env_int("CRM_PG_LOCK_TIMEOUT_MS", cls.lock_timeout_ms),
+            idle_in_transaction_timeout_ms=_env_int("CRM_PG_IDLE_TX_TIMEOUT_MS", cls.idle_in_transaction_timeout_ms),
+        )
+
+
+def _sqlite_engine(url: str, profile: SqliteProfile, **kw) -> Engine:
+    engine = create_engine(url, future=True, connect_args={"timeout": profile.busy_timeout_ms / 1000}, **kw)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        # транзакциями управляет SQLAlchemy (см. _on_begin), драйвер — в autocommit
+        dbapi_conn.isolation_level = None
+        cur = dbapi_conn.cursor()
+        cur.execute(f"PRAGMA journal_mode={profile.journal_mode}")
+        cur.execute(f"PRAGMA synchronous={profile.synchronous}")
+        cur.execute(f"PRAGMA busy_timeout={profile.busy_timeout_ms}")
+        cur.execute(f"PRAGMA mmap_size={profile.mmap_size}")
+        cur.execute(f"PRAGMA cache_size=-{profile.cache_size_kib}")
+        cur.execute(f"PRAGMA foreign_keys={'ON' if profile.foreign_keys else 'OFF'}")
+        cur.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        mode = conn.get_execution_options().get("sqlite_begin", profile.begin)
+        conn.exec_driver_sql("BEGIN" if mode == "DEFERRED" else f"BEGIN {mode}")
+
+    return engine
+
+
+def _postgres_engine(url: str, profile: PostgresProfile, **kw) -> Engine:
+    options = (
+        f"-c statement_timeout={profile.statement_timeout_ms} "
+        f"-c lock_timeout={profile.lock_timeout_ms} "
+        f"-c idle_in_transaction_session_timeout={profile.idle_in_transaction_timeout_ms}"
+    )
+    return create_engine(
+        url, future=True,
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        pool_timeout=profile.pool_timeout,
+        pool_recycle=profile.pool_recycle,
+        pool_pre_ping=profile.pool_pre_ping,
+        connect_args={"options": options},
+        **kw,
+    )
+
+
+def make_engine(url: str = DATABASE_URL, profile: SqliteProfile | PostgresProfile | None = None, **kw) -> Engine:
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return _sqlite_engine(url, profile or SqliteProfile.from_env(), **kw)
+    if backend == "postgresql":
+        return _postgres_engine(url, profile or PostgresProfile.from_env(), **kw)
+    return create_engine(url, future=True, **kw)
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+
+# Только чтение: тот же пул, но на SQLite — отложенный BEGIN (не занимает лок писателя)
+read_engine = engine.execution_options(sqlite_begin="DEFERRED")
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False, future=True)
@@ -0,0 +1,308 @@
+"""
+Генерация документов договоров и приложений по шаблонам (.doc -> .doc + .pdf).
+
+Шаблоны (SampleContract.path_sample_contract, SampleAttach.path_sample_attach) — RTF,
+сохранённый с расширением .doc (Word открывает его как обычный документ), либо простой
+текст. Поля подставляются по плейсхолдерам {{имя_колонки}}: колонки клиента, исполнителя,
+договора, приложения и услуги (id_*, name_*, inn_*, date_*, price_* ...). Плейсхолдер нужно
+набирать в шаблоне целиком, без смены форматирования внутри, иначе Word разобьёт его
+служебными RTF-кодами.
+
+- Рендер идёт в пуле процессов (CRM_DOC_WORKERS, по умолчанию — все ядра); обработчики
+  только ставят задание в очередь и сразу отвечают 202 с id задания (GET /api/jobs/{id}).
+  Процессы пула стартуют через spawn: fork многопоточного процесса uvicorn копирует
+  локи, захваченные другими потоками, и дочерний процесс может повиснуть на них.
+- В каждом процессе — кэш разобранных шаблонов по (путь, mtime).
+- .pdf получается через LibreOffice (CRM_SOFFICE, по умолчанию soffice) — у каждого
+  процесса пула свой профиль, чтобы параллельные конвертации не блокировали друг друга.
+- Файлы — в DOCS_DIR/<id договора>/ (storage.py, CRM_DOCS_DIR); id договора и приложения
+  CHECK проверяет только по префиксу, поэтому путь проверяется: ровно
+  DOCS_DIR/<id договора>/<файл>, без выхода за DOCS_DIR.
+- После успешного рендера пути path_doc_* / path_pdf_* в БД обновляются — в отдельном
+  потоке записи: колбэк готовности выполняется в служебном потоке пула процессов, и
+  ожидание лока БД там задержало бы разбор результатов всех остальных рендеров.
+- Задания живут в памяти процесса (см. jobs.py): с несколькими воркерами uvicorn
+  GET /api/jobs/{id} находит задание только в том воркере, который его создал.
+"""
+
+from __future__ import annotations
+import multiprocessing
+import os
+import re
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from functools import partial
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, selectinload
+
+import jobs
+from db import SessionLocal
+from models import Attachment, Deal, SampleContract, Service
+from routes import get_db
+from storage import DOCS_DIR
+
+router = APIRouter(prefix="/api", tags=["crm"])
+
+SOFFICE = os.getenv("CRM_SOFFICE", "soffice")
+DOC_WORKERS = int(os.getenv("CRM_DOC_WORKERS", "0")) or None
+PDF_TIMEOUT = 120
+
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+# ================= Процессы пула =================
+# path -> (mtime_ns, RTF?, (литерал, поле, литерал, поле, ..., литерал))
+_templates: dict[str, tuple[int, bool, tuple[str, ...]]] = {}
+
+
+def _compiled(path: str) -> tuple[tuple[str, ...], bool]:
+    mtime = os.stat(path).st_mtime_ns
+    cached = _templates.get(path)
+    if cached is None or cached[0] != mtime:
+        data = Path(path).read_bytes()
+        rtf = data.lstrip().startswith(b"{\\rtf")
+        text = data.decode("cp1251" if rtf else "utf-8")
+        cached = (mtime, rtf, tuple(PLACEHOLDER.split(text)))
+        _templates[path] = cached
+    return cached[2], cached[1]
+
+
+def _rtf_escape(value: str) -> str:
+    out = []
+    for ch in value:
+        code = ord(ch)
+        if ch in "\\{}":
+            out.append("\\" + ch)
+        elif ch == "\n":
+            out.append("\\par ")
+        elif code < 128:
+            out.append(ch)
+        else:
+            out.append(f"\\u{code if code < 32768 else code - 65536}?")
+    return "".join(out)
+
+
+def _to_pdf(doc_path: Path, pdf_path: Path) -> None:
+    profile = Path(tempfile.gettempdir()) / f"crm-lo-{os.getpid()}"
+    with tempfile.TemporaryDirectory(dir=pdf_path.parent) as outdir:
+        try:
+            subprocess.run(
+                [SOFFICE, f"-env:UserInstallation={profile.as_uri()}", "--headless",
+                 "--convert-to", "pdf", "--outdir", outdir, str(doc_path)],
+                check=True, capture_output=True, timeout=PDF_TIMEOUT,
+            )
+        except FileNotFoundError:
+            raise RuntimeError(f"Не найден LibreOffice ({SOFFICE}) для конвертации в PDF")
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Конвертация в PDF не удалась: {e.stderr.decode(errors='replace')[-500:]}")
+        os.replace(Path(outdir) / (doc_path.stem + ".pdf"), pdf_path)
+
+
+def render_document(template_path: str, context: dict[str, str], doc_path: str, pdf_path: str) -> None:
+    """Выполняется в процессе пула: шаблон -> .doc -> .pdf (обе записи атомарные)."""
+    parts, rtf = _compiled(template_path)
+    escape = _rtf_escape if rtf else str
+    missing = sorted({parts[i] for i in range(1, len(parts), 2)} - context.keys())
+    if missing:
+        raise KeyError(f"{template_path}: нет значений для {missing}")
+    rendered = "".join(p if i % 2 == 0 else escape(context[p]) for i, p in enumerate(parts))
+
+    doc, pdf = Path(doc_path), Path(pdf_path)
+    doc.parent.mkdir(parents=True, exist_ok=True)
+    pdf.parent.mkdir(parents=True, exist_ok=True)
+    tmp = doc.with_name(doc.name + ".tmp")
+    # RTF-шаблон читали как cp1251, подставленные значения уже экранированы в \uN
+    tmp.write_bytes(rendered.encode("cp1251" if rtf else "utf-8"))
+    os.replace(tmp, doc)
+    _to_pdf(doc, pdf)
+
+
+# ================= Процесс приложения =================
+_pool: ProcessPoolExecutor | None = None
+_writer: ThreadPoolExecutor | None = None
+_closed = False  # после shutdown_pool поздние колбэки пула не пересоздают поток записи
+_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool, _closed
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=DOC_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            _closed = False
+        return _pool
+
+
+def _write_back(job: jobs.Job, task: RenderTask) -> bool:
+    """Ставит запись путей в поток записи; False — пул уже остановлен."""
+    global _writer
+    with _lock:  # вызывается из служебного потока пула
+        if _closed:
+            return False
+        if _writer is None:
+            # один поток: записи в БД всё равно идут по одной (лок писателя SQLite)
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="docs-writeback")
+        _writer.submit(_save_paths, job, task)
+        return True
+
+
+def shutdown_pool() -> None:
+    global _pool, _writer, _closed
+    with _lock:
+        _closed = True
+        pool, _pool = _pool, None
+        writer, _writer = _writer, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if writer is not None:
+        writer.shutdown(wait=True)  # уже готовые документы успеваем записать в БД
+
+
+def _fmt(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "да" if value else "нет"
+    if isinstance(value, date):
+        return value.strftime("%d.%m.%Y")
+    if isinstance(value, Decimal):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def _context(*objs) -> dict[str, str]:
+    ctx: dict[str, str] = {}
+    for obj in objs:
+        for col in obj.__table__.columns:
+            ctx[col.key] = _fmt(getattr(obj, col.key))
+    return ctx
+
+
+class RenderTask(NamedTuple):
+    model: type
+    id: str
+    template: str
+    context: dict[str, str]
+    doc_path: str
+    pdf_path: str
+
+
+def _doc_path(id_deal: str, name: str) -> str:
+    """DOCS_DIR/<id_deal>/<name>; id с "/", ".." и т.п. -> 422, а не запись за пределами DOCS_DIR."""
+    path = (DOCS_DIR / id_deal / name).resolve()
+    if not path.is_relative_to(DOCS_DIR) or path.relative_to(DOCS_DIR).parts != (id_deal, name):
+        raise HTTPException(status_code=422, detail=f"Недопустимый id для пути документа: {id_deal}/{name}")
+    return str(path)
+
+
+def _deal_task(deal: Deal, contract: SampleContract) -> RenderTask:
+    return RenderTask(
+        Deal, deal.id_deal, contract.path_sample_contract,
+        _context(deal.client, deal.executor, contract, deal),
+        _doc_path(deal.id_deal, f"{deal.id_deal}.doc"), _doc_path(deal.id_deal, f"{deal.id_deal}.pdf"),
+    )
+
+
+def _attachment_task(deal: Deal, att: Attachment) -> RenderTask:
+    contract = att.service.contract_tpl
+    # шаблон приложения — первый шаблон приложений договора, к которому относится услуга
+    templates = sorted(contract.sample_attaches, key=lambda t: t.id_sample_attach)
+    if not templates:
+        raise HTTPException(status_code=422, detail=f"У шаблона {contract.id_sample_contract} нет шаблонов приложений")
+    return RenderTask(
+        Attachment, att.id_attachment, templates[0].path_sample_attach,
+        _context(deal.client, deal.executor, contract, deal, att.service, att),
+        _doc_path(deal.id_deal, f"{att.id_attachment}.doc"), _doc_path(deal.id_deal, f"{att.id_attachment}.pdf"),
+    )
+
+
+def _on_done(job: jobs.Job, task: RenderTask, fut: Future) -> None:
+    if fut.cancelled():
+        job.task_done(f"{task.id}: отменено")
+        return
+    error = fut.exception()
+    if error is not None:
+        job.task_done(f"{task.id}: {error}")
+        return
+    if not _write_back(job, task):
+        job.task_done(f"{task.id}: сервер останавливается, пути документов не записаны")
+
+
+def _save_paths(job: jobs.Job, task: RenderTask) -> None:
+    prefix = "deal" if task.model is Deal else "attachment"
+    pk = task.model.__table__.primary_key.columns[0]
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(task.model.__table__).where(pk == task.id).values(
+                {f"path_doc_{prefix}": task.doc_path, f"path_pdf_{prefix}": task.pdf_path})
+        )
+        db.commit()
+    except Exception as e:
+        job.task_done(f"{task.id}: {e}")
+        return
+    finally:
+        db.close()
+    job.task_done()
+
+
+def submit(kind: str, tasks: list[RenderTask]) -> jobs.Job:
+    job = jobs.create(kind, len(tasks))
+    pool = get_pool()
+    for task in tasks:
+        fut = pool.submit(render_document, task.template, task.context, task.doc_path, task.pdf_path)
+        fut.add_done_callback(partial(_on_done, job, task))
+    return job
+
+
+def _load_deal(db: Session, id_deal: str) -> Deal:
+    deal = db.scalar(
+        select(Deal).where(Deal.id_deal == id_deal).options(
+            selectinload(Deal.client),
+            selectinload(Deal.executor),
+            selectinload(Deal.attachments)
+            .selectinload(Attachment.service)
+            .selectinload(Service.contract_tpl)
+            .selectinload(SampleContract.sample_attaches),
+        )
+    )
+    if deal is None:
+        raise HTTPException(status_code=404, detail="Договор не найден")
+    return deal
+
+
+@router.post("/deals/{id_deal}/documents", response_model=jobs.JobOut, status_code=202)
+def generate_deal_documents(id_deal: str, attachments: bool = True,
+                            id_sample_contract: str | None = None, db: Session = Depends(get_db)):
+    """Договор и (по умолчанию) все его приложения — одним пакетным заданием."""
+    deal = _load_deal(db, id_deal)
+    if id_sample_contract is not None:
+        contract = db.get(SampleContract, id_sample_contract)
+    else:
+        # шаблон договора — тот, к которому относятся услуги его приложений
+        contract = next((a.service.contract_tpl for a in deal.attachments), None)
+    if contract is None:
+        raise HTTPException(status_code=422, detail="Не удалось определить шаблон договора")
+
+    tasks = [_deal_task(deal, contract)]
+    if attachments:
+        tasks += [_attachment_task(deal, a) for a in deal.attachments]
+    return submit("deal_documents", tasks).out()
+
+
+@router.post("/attachments/{id_attachment}/documents", response_model=jobs.JobOut, status_code=202)
+def generate_attachment_documents(id_attachment: str, db: Session = Depends(get_db)):
+    id_deal = db.scalar(select(Attachment.id_attachment_deal).where(Attachment.id_attachment == id_attachment))
+    if id_deal is None:
+        raise HTTPException(status_code=404, detail="Приложение не найдено")
+    deal = _load_deal(db, id_deal)
+    att = next(a for a in deal.attachments if a.id_attachment == id_attachment)
+    return submit("attachment_documents", [_attachment_task(deal, att)]).out()
@@ -0,0 +1,262 @@
+"""
+Выгрузка договоров для бухгалтерии: GET /api/export/deals?format=csv|ndjson|xlsx
+
+Строка выгрузки — приложение договора вместе с договором, клиентом и исполнителем
+(договор без приложений — одна строка с пустыми полями приложения). Фильтры — как у
+GET /api/deals: id_client_deal, id_executor_deal, date_from, date_to.
+
+Память не зависит от размера таблиц:
+- выборка — только нужные колонки, yield_per(EXPORT_BATCH): серверный курсор на
+  PostgreSQL (stream_results), на SQLite — построчная выборка из курсора;
+- каждая пачка сразу кодируется и отдаётся в StreamingResponse; заголовок (и начало
+  xlsx-архива) уходит клиенту до выполнения запроса;
+- gzip=true — сжатие потоком (zlib), файл *.csv.gz / *.ndjson.gz; xlsx и так zip.
+- xlsx пишется вручную (минимальная книга из одного листа, inlineStr) через zipfile в
+  несбрасываемый поток: openpyxl даже в write_only собирает архив только в конце.
+  Управляющие символы, недопустимые в XML 1.0 (0x00–0x08, 0x0B, 0x0C, 0x0E–0x1F и т.п.),
+  из строк вырезаются — иначе Excel отказывается открывать весь файл.
+
+Сессия открывается внутри генератора: зависимость get_db закрылась бы раньше, чем
+StreamingResponse дочитает курсор.
+"""
+
+from __future__ import annotations
+import csv
+import io
+import json
+import re
+import zipfile
+import zlib
+from datetime import date
+from decimal import Decimal
+from typing import Any, Iterator
+from xml.sax.saxutils import escape
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from db import ReadSessionLocal
+from models import Attachment, Client, Deal, Executor
+from routes import filter_deals
+
+router = APIRouter(prefix="/api", tags=["crm"])
+
+EXPORT_BATCH = 1000
+
+# (заголовок, колонка) — порядок колонок выгрузки
+DEAL_EXPORT_COLUMNS = (
+    ("id_deal", Deal.id_deal),
+    ("number_deal", Deal.number_deal),
+    ("date_deal", Deal.date_deal),
+    ("status_deal", Deal.status_deal),
+    ("status_orig_deal", Deal.status_orig_deal),
+    ("id_client", Client.id_client),
+    ("name_client", Client.name_client),
+    ("inn_client", Client.inn_client),
+    ("kpp_client", Client.kpp_client),
+    ("id_executor", Executor.id_executor),
+    ("name_executor", Executor.name_executor),
+    ("inn_executor", Executor.inn_executor),
+    ("id_attachment", Attachment.id_attachment),
+    ("id_service_attachment", Attachment.id_service_attachment),
+    ("date_start_attachment", Attachment.date_start_attachment),
+    ("date_end_attachment", Attachment.date_end_attachment),
+    ("place_attachment", Attachment.place_attachment),
+    ("price_attachment", Attachment.price_attachment),
+    ("status_sign_attachment", Attachment.status_sign_attachment),
+    ("status_attachment", Attachment.status_attachment),
+)
+HEADER = [name for name, _ in DEAL_EXPORT_COLUMNS]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _deal_rows(id_client_deal, id_executor_deal, date_from, date_to) -> Iterator[list]:
+    """Пачки строк выгрузки; в памяти — не больше EXPORT_BATCH строк."""
+    stmt = (
+        select(*(col for _, col in DEAL_EXPORT_COLUMNS))
+        .join(Client, Client.id_client == Deal.id_client_deal)
+        .join(Executor, Executor.id_executor == Deal.id_executor_deal)
+        .outerjoin(Attachment, Attachment.id_attachment_deal == Deal.id_deal)
+        .order_by(Deal.date_deal, Deal.id_deal, Attachment.id_attachment)
+        .execution_options(yield_per=EXPORT_BATCH)
+    )
+    stmt = filter_deals(stmt, id_client_deal, id_executor_deal, date_from, date_to)
+    db = ReadSessionLocal()
+    try:
+        for batch in db.execute(stmt).partitions():
+            yield batch
+    finally:
+        db.close()
+
+
+# ================= Форматы =================
+def _csv(batches: Iterator[list]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\r\n")
+    writer.writerow(HEADER)
+    yield ("\ufeff" + buf.getvalue()).encode()  # BOM — Excel иначе не узнаёт UTF-8
+    for batch in batches:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(batch)
+        yield buf.getvalue().encode()
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)  # без потери точности, как в DealOut/AttachmentOut
+    return value
+
+
+def _ndjson(batches: Iterator[list]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(HEADER, map(_json_value, row))), ensure_ascii=False) + "\n"
+            for row in batch
+        ).encode()
+
+
+class _Sink(io.RawIOBase):
+    """Несбрасываемый поток для zipfile: накопленное забирается drain() после каждой пачки."""
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="deals" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    # стиль 1 — дата (встроенный формат 14)
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+EXCEL_EPOCH = date(1899, 12, 30)
+XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+
+def _xlsx_cell(value: Any) -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - EXCEL_EPOCH).days}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f"<c><v>{value}</v></c>"
+    return f'<c t="inlineStr"><is><t>{escape(XML_INVALID.sub("", str(value)))}</t></is></c>'
+
+
+def _xlsx_row(values) -> str:
+    return "<row>" + "".join(map(_xlsx_cell, values)) + "</row>"
+
+
+def _xlsx(batches: Iterator[list]) -> Iterator[bytes]:
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, body in XLSX_STATIC.items():
+            zf.writestr(name, body)
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(HEADER).encode()
+            )
+            yield sink.drain()
+            for batch in batches:
+                sheet.write("".join(map(_xlsx_row, batch)).encode())
+                yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 — формат gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+FORMATS = {"csv": _csv, "ndjson": _ndjson, "xlsx": _xlsx}
+
+
+@router.get("/export/deals")
+def export_deals(
+    format: str = Query("csv", pattern="^(csv|ndjson|xlsx)$"),
+    gzip: bool = False,
+    id_client_deal: str | None = None,
+    id_executor_deal: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+):
+    body = FORMATS[format](_deal_rows(id_client_deal, id_executor_deal, date_from, date_to))
+    filename, media_type = f"deals.{format}", MEDIA_TYPES[format]
+    if gzip and format != "xlsx":
+        body, filename, media_type = _gzip(body), filename + ".gz", "application/gzip"
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,109 @@
+"""
+Реестр фоновых заданий (в памяти процесса) и GET /api/jobs/{id}.
+
+Задание — счётчик подзадач: сколько всего, сколько выполнено, сколько упало и с какими
+ошибками. Подзадачи отмечаются из любых потоков (колбэки пулов), поэтому всё под локом.
+Храним последние MAX_JOBS заданий; старые завершённые вытесняются.
+
+Реестр — в пределах процесса (как Hub в events.py): с несколькими воркерами uvicorn
+GET /api/jobs/{id} отвечает 404, если запрос попал не в тот воркер, что создал задание.
+Для нескольких воркеров нужна привязка клиента к воркеру или общее хранилище заданий.
+"""
+
+from __future__ import annotations
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+router = APIRouter(prefix="/api", tags=["crm"])
+
+MAX_JOBS = 1000
+MAX_ERRORS = 100
+
+JobStatus = Literal["queued", "running", "done", "failed"]
+
+
+class JobOut(BaseModel):
+    id: str
+    kind: str
+    status: JobStatus
+    total: int
+    done: int
+    failed: int
+    errors: list[str]
+    created_at: datetime
+    finished_at: datetime | None = None
+
+
+class Job:
+    def __init__(self, kind: str, total: int):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.errors: list[str] = []
+        self.created_at = datetime.now(timezone.utc)
+        self.finished_at: datetime | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def status(self) -> JobStatus:
+        if self.done + self.failed < self.total:
+            return "running" if self.done + self.failed else "queued"
+        return "failed" if self.failed else "done"
+
+    def task_done(self, error: str | None = None) -> None:
+        with self._lock:
+            if error is None:
+                self.done += 1
+            else:
+                self.failed += 1
+                if len(self.errors) < MAX_ERRORS:
+                    self.errors.append(error)
+            if self.done + self.failed >= self.total:
+                self.finished_at = datetime.now(timezone.utc)
+
+    def out(self) -> JobOut:
+        with self._lock:
+            return JobOut(
+                id=self.id, kind=self.kind, status=self.status, total=self.total,
+                done=self.done, failed=self.failed, errors=list(self.errors),
+                created_at=self.created_at, finished_at=self.finished_at,
+            )
+
+
+_lock = threading.Lock()
+_jobs: OrderedDict[str, Job] = OrderedDict()
+
+
+def create(kind: str, total: int) -> Job:
+    job = Job(kind, total)
+    if total == 0:
+        job.finished_at = job.created_at
+    with _lock:
+        _jobs[job.id] = job
+        while len(_jobs) > MAX_JOBS:
+            oldest = next(iter(_jobs.values()))
+            if oldest.finished_at is None:
+                break
+            _jobs.popitem(last=False)
+    return job
+
+
+def get(job_id: str) -> Job | None:
+    with _lock:
+        return _jobs.get(job_id)
+
+
+@router.get("/jobs/{job_id}", response_model=JobOut)
+def get_job(job_id: str):
+    job = get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+    return job.out()
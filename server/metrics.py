@@ -0,0 +1,219 @@
+"""
+Метрики запросов и БД в формате Prometheus: GET /metrics.
+
+- MetricsMiddleware (чистый ASGI, без BaseHTTPMiddleware) — гистограмма латентности по
+  (method, route, status); route — шаблон пути (/api/deals/{id_deal}), не сырой URL.
+- События before/after_cursor_execute всех Engine — число SQL-запросов и время в БД,
+  приписанные текущему HTTP-запросу (contextvar; в run_in_threadpool контекст копируется),
+  плюс общая гистограмма длительности запросов.
+- instrument_pool(engine) — ожидание выдачи соединения из пула (гистограмма) и число
+  выданных соединений.
+- Медленные запросы/HTTP-запросы пишутся в лог с текстом SQL
+  (CRM_SLOW_REQUEST_MS, CRM_SLOW_QUERY_MS; 0 — выключить).
+
+Накладные расходы — пара perf_counter() и короткий лок на запрос/SQL-вызов.
+"""
+
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+router = APIRouter(tags=["metrics"])
+
+SLOW_REQUEST_S = float(os.getenv("CRM_SLOW_REQUEST_MS", "500")) / 1000
+SLOW_QUERY_S = float(os.getenv("CRM_SLOW_QUERY_MS", "100")) / 1000
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последний — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list[str]:
+        sep = "," if labels else ""
+        braces = f"{{{labels}}}" if labels else ""
+        lines, acc = [], 0
+        for le, n in zip((*map(repr, self.buckets), "+Inf"), self.counts):
+            acc += n
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{le}"}} {acc}')
+        lines.append(f"{name}_sum{braces} {self.sum}")
+        lines.append(f"{name}_count{braces} {self.count}")
+        return lines
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_time", "slowest_sql", "slowest_s")
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.db_time = 0.0
+        self.slowest_sql = ""
+        self.slowest_s = 0.0
+
+
+_lock = threading.Lock()
+_current: ContextVar[RequestStats | None] = ContextVar("crm_request_stats", default=None)
+
+# (method, route, status) -> Histogram; (method, route) -> [statements, db seconds]
+_http: dict[tuple[str, str, int], Histogram] = {}
+_http_db: dict[tuple[str, str], list[float]] = {}
+_db_statements = Histogram(DB_BUCKETS)
+_pool_wait = Histogram(DB_BUCKETS)
+_pools: list = []
+
+
+# ================= SQL =================
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info["crm_query_start"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - conn.info.pop("crm_query_start", time.perf_counter())
+    with _lock:
+        _db_statements.observe(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+        if elapsed > stats.slowest_s:
+            stats.slowest_s, stats.slowest_sql = elapsed, statement
+    if SLOW_QUERY_S and elapsed >= SLOW_QUERY_S:
+        log.warning("slow query %.1f ms: %s", elapsed * 1000, statement)
+
+
+def instrument_pool(engine: Engine) -> None:
+    """Оборачивает pool.connect(): время ожидания свободного соединения."""
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            waited = time.perf_counter() - started
+            with _lock:
+                _pool_wait.observe(waited)
+
+    pool.connect = timed_connect
+    _pools.append(pool)
+
+
+# ================= HTTP =================
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        stream_opened = None
+
+        async def send_wrapper(message):
+            nonlocal status, stream_opened
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # SSE (events.py) живёт минутами — латентность считаем до начала ответа
+                if any(k == b"content-type" and v.startswith(b"text/event-stream")
+                       for k, v in message.get("headers", ())):
+                    stream_opened = time.perf_counter()
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = (stream_opened or time.perf_counter()) - started
+            _current.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "<unmatched>"
+            _record(scope["method"], path, status, elapsed, stats)
+
+
+def _record(method: str, route: str, status: int, elapsed: float, stats: RequestStats) -> None:
+    with _lock:
+        hist = _http.get((method, route, status))
+        if hist is None:
+            hist = _http[(method, route, status)] = Histogram(LATENCY_BUCKETS)
+        hist.observe(elapsed)
+        db = _http_db.setdefault((method, route), [0, 0.0])
+        db[0] += stats.statements
+        db[1] += stats.db_time
+    if SLOW_REQUEST_S and elapsed >= SLOW_REQUEST_S:
+        log.warning(
+            "slow request %s %s -> %s: %.1f ms, %d SQL, %.1f ms in DB; slowest %.1f ms: %s",
+            method, route, status, elapsed * 1000, stats.statements, stats.db_time * 1000,
+            stats.slowest_s * 1000, stats.slowest_sql,
+        )
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render() -> str:
+    out: list[str] = []
+    with _lock:
+        out += ["# HELP crm_http_request_duration_seconds HTTP request latency",
+                "# TYPE crm_http_request_duration_seconds histogram"]
+        for (method, route, status), hist in sorted(_http.items()):
+            out += hist.render("crm_http_request_duration_seconds",
+                               f'method="{method}",route="{_label(route)}",status="{status}"')
+
+        out += ["# HELP crm_http_request_db_statements_total SQL statements issued while serving requests",
+                "# TYPE crm_http_request_db_statements_total counter"]
+        out += [f'crm_http_request_db_statements_total{{method="{m}",route="{_label(r)}"}} {v[0]}'
+                for (m, r), v in sorted(_http_db.items())]
+        out += ["# HELP crm_http_request_db_seconds_total Time spent in the database while serving requests",
+                "# TYPE crm_http_request_db_seconds_total counter"]
+        out += [f'crm_http_request_db_seconds_total{{method="{m}",route="{_label(r)}"}} {v[1]}'
+                for (m, r), v in sorted(_http_db.items())]
+
+        out += ["# HELP crm_db_statement_duration_seconds SQL statement duration",
+                "# TYPE crm_db_statement_duration_seconds histogram"]
+        out += _db_statements.render("crm_db_statement_duration_seconds", "")
+        out += ["# HELP crm_db_pool_checkout_wait_seconds Time waiting for a pooled connection",
+                "# TYPE crm_db_pool_checkout_wait_seconds histogram"]
+        out += _pool_wait.render("crm_db_pool_checkout_wait_seconds", "")
+
+    checked_out = [p.checkedout() for p in _pools if hasattr(p, "checkedout")]
+    if checked_out:
+        out += ["# HELP crm_db_pool_checked_out Connections currently checked out",
+                "# TYPE crm_db_pool_checked_out gauge",
+                f"crm_db_pool_checked_out {sum(checked_out)}"]
+    return "\n".join(out) + "\n"
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
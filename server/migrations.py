@@ -0,0 +1,257 @@
+"""
+Версионированная схема БД вместо create_all + проверок count() на каждом старте.
+
+- schema_version (одна строка): номер последней применённой миграции и отпечаток
+  целевой схемы — sha256 от DDL всех таблиц/индексов models.py для текущего диалекта,
+  DDL триггеров и FTS-таблиц (ddl() модулей из DDL_MODULES) и списка миграций.
+  Отпечаток считается в процессе, без обращения к БД.
+- ensure_schema(engine) на старте: один SELECT из schema_version; совпало — всё.
+  Иначе — под блокировкой (PostgreSQL: pg_advisory_xact_lock, SQLite: BEGIN IMMEDIATE)
+  перечитываем версию и применяем недостающие миграции по порядку, один раз на все воркеры.
+- Новая миграция — функция в конце MIGRATIONS. 0001 создаёт схему по текущим моделям,
+  поэтому последующие миграции должны проверять, что их изменения ещё не применены
+  (см. _has_column).
+- Поменялся текст триггера (или FTS-таблицы) — тоже нужна миграция: на SQLite
+  CREATE TRIGGER IF NOT EXISTS старый триггер не заменит (см. _replace_triggers).
+- Если модели поменялись, а миграции нет — старт падает с SchemaDriftError, отпечаток в
+  schema_version не меняется: create_all досоздал бы таблицы, но не новые колонки, и
+  ошибка всплыла бы уже на запросах. Нужна миграция; если схема БД сверена с моделями
+  вручную (например, DDL изменился только из-за новой версии SQLAlchemy) —
+  python migrations.py --stamp записывает текущий отпечаток.
+
+Запуск вручную: python migrations.py [--status | --stamp]
+"""
+
+from __future__ import annotations
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, inspect, select, text,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from models import Base, ClientType, DashboardMonthly, Executor, RefCacheVersion, SampleContract
+import dashboard  # регистрируют after_create-DDL (триггеры сводки, FTS, status_deal, версий справочников)
+import refcache
+import search
+import status_engine
+
+log = logging.getLogger(__name__)
+
+LOCK_KEY = 0x43524D  # "CRM" — ключ advisory-лока PostgreSQL
+DDL_MODULES = (dashboard, refcache, search, status_engine)
+
+version_metadata = MetaData()
+schema_version = Table(
+    "schema_version", version_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("fingerprint", String(64), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+# ================= Миграции =================
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def _initial_schema(conn: Connection) -> None:
+    """
+    Схема по текущим моделям. Таблицы со старой несовместимой схемой (в crm.db из
+    репозитория: executors.id INTEGER, clients.id INTEGER) переименовываются в legacy_*,
+    данные в них сохраняются.
+    """
+    existing = set(inspect(conn).get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        columns = {c["name"] for c in inspect(conn).get_columns(table.name)}
+        if not {c.name for c in table.primary_key.columns} <= columns:
+            log.warning("legacy table %s renamed to legacy_%s", table.name, table.name)
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO legacy_{table.name}")
+    # after_create-слушатели (search.py, dashboard.py) досоздают FTS/триггеры
+    Base.metadata.create_all(conn)
+
+
+SEED = {
+    ClientType: [
+        dict(id_type_client=1, id_type_short="ООО", id_type_long="Общество с ограниченной ответственностью"),
+    ],
+    Executor: [
+        dict(
+            id_executor="executor1",
+            type_executor=1,
+            name_executor="Иван Петров",
+            inn_executor="1234567890",
+            ogrn_executor="1234567890123",
+            kpp_executor=None,
+            adress_executor="Адрес",
+            bank_executor="Банк",
+            cor_bank_executor="12345678901234567890",
+            acc_bank_executor="12345678901234567890",
+            bik_bank_executor="123456789",
+            contact_name_executor="Иван Петров",
+            mail_executor="ivan@example.com",
+            tel_executor="1234567890",
+            mess_executor="Telegram",
+        ),
+    ],
+    SampleContract: [
+        dict(
+            id_sample_contract="sample_contract1",
+            name_sample_contract="Договор А",
+            path_sample_contract="/docs/contract_a.doc",
+        ),
+    ],
+}
+
+
+def seed(conn: Connection) -> None:
+    """Начальные справочники: один INSERT ... ON CONFLICT DO NOTHING на таблицу."""
+    dialect_insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+    for model, rows in SEED.items():
+        conn.execute(dialect_insert(model.__table__).on_conflict_do_nothing(), rows)
+
+
+def _refcache_versions(conn: Connection) -> None:
+    """Версии справочников в БД (refcache.py): таблица, строки и триггеры."""
+    RefCacheVersion.__table__.create(conn, checkfirst=True)
+    refcache.install(conn)
+
+
+def _dashboard_price_minor_units(conn: Connection) -> None:
+    """Сводка дашборда: сумма цен в копейках (BigInteger) вместо Numeric — таблица производная, строится заново."""
+    DashboardMonthly.__table__.drop(conn, checkfirst=True)
+    DashboardMonthly.__table__.create(conn)
+    dashboard.reinstall(conn)
+
+
+def _replace_triggers(conn: Connection) -> None:
+    """Триггеры БД — заново по текущему ddl() модулей (теперь они входят в отпечаток)."""
+    if conn.dialect.name == "sqlite":
+        tables = ", ".join(f"'{t.name}'" for t in Base.metadata.sorted_tables)
+        for (name,) in conn.exec_driver_sql(
+                f"SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({tables})").all():
+            conn.exec_driver_sql(f'DROP TRIGGER "{name}"')
+    for module in DDL_MODULES:
+        module.install(conn)
+
+
+MIGRATIONS: list[tuple[str, Callable[[Connection], None]]] = [
+    ("0001_initial_schema", _initial_schema),
+    ("0002_seed_reference_data", seed),
+    ("0003_deal_status_triggers", status_engine.install),
+    ("0004_refcache_versions", _refcache_versions),
+    ("0005_dashboard_price_minor_units", _dashboard_price_minor_units),
+    ("0006_replace_triggers", _replace_triggers),
+]
+
+
+# ================= Версия и отпечаток =================
+def fingerprint(engine: Engine) -> str:
+    h = hashlib.sha256()
+    for name, _ in MIGRATIONS:
+        h.update(name.encode())
+    for table in Base.metadata.sorted_tables:
+        h.update(str(CreateTable(table).compile(dialect=engine.dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            h.update(str(CreateIndex(index).compile(dialect=engine.dialect)).encode())
+    for module in DDL_MODULES:
+        for stmt in module.ddl(engine.dialect.name):
+            h.update(stmt.encode())
+    return h.hexdigest()
+
+
+class SchemaDriftError(RuntimeError):
+    """Схема БД и models.py разошлись, а миграции для этого нет."""
+
+
+def current_version(conn: Connection) -> tuple[int, str] | None:
+    try:
+        row = conn.execute(select(schema_version.c.version, schema_version.c.fingerprint)).first()
+    except DBAPIError:
+        return None  # таблицы ещё нет
+    return (row.version, row.fingerprint) if row else None
+
+
+def _lock(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+    # SQLite: транзакция уже открыта BEGIN IMMEDIATE (см. ensure_schema) — это и есть лок
+
+
+def _record(conn: Connection, state: tuple[int, str] | None, target: str) -> None:
+    values = dict(version=len(MIGRATIONS), fingerprint=target, applied_at=datetime.now(timezone.utc))
+    if state is None:
+        conn.execute(schema_version.insert().values(id=1, **values))
+    else:
+        conn.execute(schema_version.update().where(schema_version.c.id == 1).values(**values))
+
+
+def stamp(engine: Engine) -> None:
+    """Записывает текущий отпечаток без миграций — после ручной сверки схемы с моделями."""
+    with engine.connect() as conn:
+        conn.execution_options(sqlite_begin="IMMEDIATE")
+        with conn.begin():
+            _lock(conn)
+            state = current_version(conn)
+            if state is None or state[0] != len(MIGRATIONS):
+                raise SchemaDriftError(f"stamp только для БД на последней миграции; в БД: {state}")
+            _record(conn, state, fingerprint(engine))
+
+
+def ensure_schema(engine: Engine) -> bool:
+    """Приводит схему к текущей; True — что-то применялось."""
+    target = fingerprint(engine)
+    with engine.connect() as conn:
+        conn.execution_options(sqlite_begin="DEFERRED")
+        if current_version(conn) == (len(MIGRATIONS), target):
+            return False
+
+    with engine.connect() as conn:
+        conn.execution_options(sqlite_begin="IMMEDIATE")
+        with conn.begin():
+            _lock(conn)
+            version_metadata.create_all(conn)
+            state = current_version(conn)
+            if state == (len(MIGRATIONS), target):
+                return False  # другой воркер успел раньше
+            applied = state[0] if state else 0
+            if applied > len(MIGRATIONS):
+                raise SchemaDriftError(
+                    f"БД на миграции {applied}, а код знает только {len(MIGRATIONS)}: запущена старая версия")
+            if applied == len(MIGRATIONS):
+                raise SchemaDriftError(
+                    "Модели изменились без новой миграции (отпечаток схемы не совпадает с schema_version): "
+                    "добавьте миграцию в MIGRATIONS; если схема БД сверена вручную — python migrations.py --stamp")
+            for name, migrate in MIGRATIONS[applied:]:
+                log.info("applying migration %s", name)
+                migrate(conn)
+            _record(conn, state, target)
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+    from db import engine
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Миграции схемы БД")
+    parser.add_argument("--status", action="store_true", help="только показать версию")
+    parser.add_argument("--stamp", action="store_true", help="записать текущий отпечаток (схема сверена вручную)")
+    args = parser.parse_args()
+    if args.stamp:
+        stamp(engine)
+        print("stamped")
+    elif args.status:
+        with engine.connect() as conn:
+            print(f"db: {current_version(conn)}; target: ({len(MIGRATIONS)}, {fingerprint(engine)!r})")
+    else:
+        print("applied" if ensure_schema(engine) else "up to date")
@@ -11,7 +11,8 @@ CRM models (PostgreSQL, SQLAlchemy 2.0)
 - attachments
 
 Принципы:
-- Строковые PK с обязательным префиксом (client..., executor..., deal..., attachment..., service..., sample_contract..., sample_attach...).
+- Строковые PK с обязательным префиксом (client..., executor..., deal..., attachment..., service..., sample_contract..., sample_attach...);
+  новые ключи — префикс + упорядоченный по времени ULID (ids.py), если id не задан явно.
 - Идентификаторы/реквизиты "число фиксированной длины" — храним как TEXT/STRING + CHECK (только цифры и длина), чтобы не терять ведущие нули.
 - Даты: DATE.
 - Удаление родителя запрещено при наличии детей (RESTRICT), кроме каскада шаблонов: удаление шаблона договора удаляет его шаблоны приложений (CASCADE).
@@ -20,12 +21,47 @@ CRM models (PostgreSQL, SQLAlchemy 2.0)
 from __future__ import annotations
 from typing import Optional
 from datetime import date
+from decimal import Decimal
 from sqlalchemy import (
-    CheckConstraint, ForeignKey, UniqueConstraint, Text, SmallInteger,
-    String, Date, Numeric, Boolean
+    CheckConstraint, ForeignKey, UniqueConstraint, Index, Text, SmallInteger,
+    String, Date, Numeric, Boolean, BigInteger, Integer, false
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
+from ids import id_factory
+
+
+# ============ CHECK «только цифры заданной длины» ============
+def _sqlite_digits_expr(column: str, min_len: int, max_len: int | None) -> str:
+    """Встроенные функции SQLite вместо REGEXP: ограничение проверяет любой клиент БД."""
+    if max_len is None:
+        length = f"length({column}) >= {min_len}"
+    elif max_len == min_len:
+        length = f"length({column}) = {min_len}"
+    else:
+        length = f"length({column}) BETWEEN {min_len} AND {max_len}"
+    return f"{length} AND {column} NOT GLOB '*[^0-9]*'"
+
+
+def digits_check(column: str, name: str, min_len: int = 1, max_len: int | None = None,
+                 nullable: bool = False) -> tuple[CheckConstraint, ...]:
+    """
+    Только цифры, длина min_len..max_len (None — без верхней границы).
+    PostgreSQL: column ~ '^[0-9]{…}$'. SQLite: length() и GLOB (см. _sqlite_digits_expr).
+    """
+    if max_len is None:
+        quantifier = "+" if min_len == 1 else f"{{{min_len},}}"
+    elif max_len == min_len:
+        quantifier = f"{{{min_len}}}"
+    else:
+        quantifier = f"{{{min_len},{max_len}}}"
+    null = f"({column} IS NULL) OR " if nullable else ""
+    return (
+        CheckConstraint(f"{null}({column} ~ '^[0-9]{quantifier}$')", name=name).ddl_if(dialect="postgresql"),
+        CheckConstraint(f"{null}({_sqlite_digits_expr(column, min_len, max_len)})", name=name)
+        .ddl_if(dialect="sqlite"),
+    )
+
 
 # =================== Base ===================
 class Base(DeclarativeBase):
@@ -57,15 +93,21 @@ class Client(Base):
     __tablename__ = "clients"
     __table_args__ = (
         CheckConstraint("id_client LIKE 'client%'", name="ck_clients_id_prefix"),
-        CheckConstraint("(inn_client ~ '^[0-9]{10,12}$')", name="ck_clients_inn_digits_len"),
-        CheckConstraint("(ogrn_client ~ '^[0-9]{13,15}$')", name="ck_clients_ogrn_digits_len"),
-        CheckConstraint("(kpp_client IS NULL) OR (kpp_client ~ '^[0-9]{9}$')", name="ck_clients_kpp_digits_len"),
-        CheckConstraint("(cor_bank_client ~ '^[0-9]{20}$')",  name="ck_clients_cor_bank_20"),
-        CheckConstraint("(acc_bank_client ~ '^[0-9]{20}$')",  name="ck_clients_acc_bank_20"),
-        CheckConstraint("(bik_bank_client ~ '^[0-9]{9}$')",   name="ck_clients_bik_9"),
+        *digits_check("inn_client", "ck_clients_inn_digits_len", 10, 12),
+        *digits_check("ogrn_client", "ck_clients_ogrn_digits_len", 13, 15),
+        *digits_check("kpp_client", "ck_clients_kpp_digits_len", 9, 9, nullable=True),
+        *digits_check("cor_bank_client", "ck_clients_cor_bank_20", 20, 20),
+        *digits_check("acc_bank_client", "ck_clients_acc_bank_20", 20, 20),
+        *digits_check("bik_bank_client", "ck_clients_bik_9", 9, 9),
+        # ключи сортировки списков (keyset-пагинация), PK последним — для стабильного порядка
+        Index("ix_clients_name", "name_client", "id_client"),
+        Index("ix_clients_type_name", "type_client", "name_client", "id_client"),
+        # поиск по префиксу ИНН/ОГРН (диапазон inn >= q AND inn < q+1)
+        Index("ix_clients_inn", "inn_client"),
+        Index("ix_clients_ogrn", "ogrn_client"),
     )
 
-    id_client: Mapped[str] = mapped_column(String(128), primary_key=True)
+    id_client: Mapped[str] = mapped_column(String(128), primary_key=True, default=id_factory("client"))
     type_client: Mapped[int] = mapped_column(
         SmallInteger,
         ForeignKey("client_types.id_type_client", ondelete="RESTRICT"),
@@ -102,15 +144,17 @@ class Executor(Base):
     __tablename__ = "executors"
     __table_args__ = (
         CheckConstraint("id_executor LIKE 'executor%'", name="ck_executors_id_prefix"),
-        CheckConstraint("(inn_executor ~ '^[0-9]{10,12}$')", name="ck_executors_inn_digits_len"),
-        CheckConstraint("(ogrn_executor ~ '^[0-9]{13,15}$')", name="ck_executors_ogrn_digits_len"),
-        CheckConstraint("(kpp_executor IS NULL) OR (kpp_executor ~ '^[0-9]{9}$')", name="ck_executors_kpp_digits_len"),
-        CheckConstraint("(cor_bank_executor ~ '^[0-9]{20}$')",  name="ck_executors_cor_bank_20"),
-        CheckConstraint("(acc_bank_executor ~ '^[0-9]{20}$')",  name="ck_executors_acc_bank_20"),
-        CheckConstraint("(bik_bank_executor ~ '^[0-9]{9}$')",   name="ck_executors_bik_9"),
+        *digits_check("inn_executor", "ck_executors_inn_digits_len", 10, 12),
+        *digits_check("ogrn_executor", "ck_executors_ogrn_digits_len", 13, 15),
+        *digits_check("kpp_executor", "ck_executors_kpp_digits_len", 9, 9, nullable=True),
+        *digits_check("cor_bank_executor", "ck_executors_cor_bank_20", 20, 20),
+        *digits_check("acc_bank_executor", "ck_executors_acc_bank_20", 20, 20),
+        *digits_check("bik_bank_executor", "ck_executors_bik_9", 9, 9),
+        Index("ix_executors_inn", "inn_executor"),
+        Index("ix_executors_ogrn", "ogrn_executor"),
     )
 
-    id_executor: Mapped[str] = mapped_column(String(128), primary_key=True)
+    id_executor: Mapped[str] = mapped_column(String(128), primary_key=True, default=id_factory("executor"))
     type_executor: Mapped[int] = mapped_column(
         SmallInteger,
         ForeignKey("client_types.id_type_client", ondelete="RESTRICT"),  # используем те же типы 1..9
@@ -148,7 +192,7 @@ class SampleContract(Base):
         CheckConstraint("id_sample_contract LIKE 'sample_contract%'", name="ck_sample_contract_id_prefix"),
     )
 
-    id_sample_contract:  Mapped[str] = mapped_column(String(128), primary_key=True)
+    id_sample_contract:  Mapped[str] = mapped_column(String(128), primary_key=True, default=id_factory("sample_contract"))
     name_sample_contract: Mapped[str] = mapped_column(Text, nullable=False)
     path_sample_contract: Mapped[str] = mapped_column(Text, nullable=False)  # путь к .doc
 
@@ -167,7 +211,7 @@ class SampleAttach(Base):
         CheckConstraint("id_sample_attach LIKE 'sample_attach%'", name="ck_sample_attach_id_prefix"),
     )
 
-    id_sample_attach: Mapped[str] = mapped_column(String(128), primary_key=True)
+    id_sample_attach: Mapped[str] = mapped_column(String(128), primary_key=True, default=id_factory("sample_attach"))
 
     id_sample_attach_contract: Mapped[str] = mapped_column(
         String(128),
@@ -191,7 +235,7 @@ class Service(Base):
         CheckConstraint("id_service LIKE 'service%'", name="ck_service_id_prefix"),
     )
 
-    id_service: Mapped[str] = mapped_column(String(128), primary_key=True)
+    id_service: Mapped[str] = mapped_column(String(128), primary_key=True, default=id_factory("service"))
     name_service: Mapped[str] = mapped_column(Text, nullable=False)
 
     # ссылка на применимый шаблон договора
@@ -214,10 +258,14 @@ class Deal(Base):
     __table_args__ = (
         CheckConstraint("id_deal LIKE 'deal%'", name="ck_deals_id_prefix"),
         # номер договора — только цифры (сохраним как строку, чтобы не терять ведущие нули)
-        CheckConstraint("(number_deal ~ '^[0-9]+$')", name="ck_deals_number_digits"),
+        *digits_check("number_deal", "ck_deals_number_digits"),
+        # FK + дата: фильтры списков и JOIN'ы по клиенту/исполнителю
+        Index("ix_deals_client_date", "id_client_deal", "date_deal", "id_deal"),
+        Index("ix_deals_executor_date", "id_executor_deal", "date_deal", "id_deal"),
+        Index("ix_deals_date", "date_deal", "id_deal"),
     )
 
-    id_deal: Mapped[str] = mapped_column(String(128), primary_key=True)
+    id_deal: Mapped[str] = mapped_column(String(128), primary_key=True, default=id_factory("deal"))
 
     id_client_deal: Mapped[str] = mapped_column(
         String(128),
@@ -234,11 +282,11 @@ class Deal(Base):
     date_deal:   Mapped[date] = mapped_column(Date, nullable=False)       # ДД.ММ.ГГГГ → DATE
 
     # Статусы — вычисляемые бизнес-логикой; в БД храним как флаги
-    status_deal:     Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="false")
+    status_deal:     Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=false())
     path_doc_deal:   Mapped[str]  = mapped_column(Text, nullable=False)   # путь к .doc
     path_pdf_deal:   Mapped[str]  = mapped_column(Text, nullable=False)   # путь к .pdf
     path_sign_deal:  Mapped[str]  = mapped_column(Text, nullable=True)    # путь к подписанному .pdf (может быть пусто)
-    status_orig_deal: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="false")
+    status_orig_deal: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=false())
 
     client:   Mapped["Client"]   = relationship(back_populates="deals")
     executor: Mapped["Executor"] = relationship(back_populates="deals")
@@ -256,9 +304,14 @@ class Attachment(Base):
         # дата окончания не раньше даты начала
         CheckConstraint("(date_end_attachment >= date_start_attachment)", name="ck_attachment_dates_order"),
         # цена — число с 2 знаками после запятой (на уровне БД NUMERIC, на уровне формата — в приложении)
+        Index("ix_attachments_deal_date_end", "id_attachment_deal", "date_end_attachment", "id_attachment"),
+        Index("ix_attachments_date_end", "date_end_attachment", "id_attachment"),
+        # пересчёт status_attachment: выборка "флаг не совпадает с датой" идёт по диапазону индекса
+        Index("ix_attachments_status_date_end", "status_attachment", "date_end_attachment"),
+        Index("ix_attachments_path_sign", "path_sign_attachment"),
     )
 
-    id_attachment: Mapped[str] = mapped_column(String(128), primary_key=True)
+    id_attachment: Mapped[str] = mapped_column(String(128), primary_key=True, default=id_factory("attachment"))
 
     id_attachment_deal: Mapped[str] = mapped_column(
         String(128),
@@ -286,11 +339,73 @@ class Attachment(Base):
     # Статусы (вычисляет бэкенд):
     # - status_sign_attachment: True, если по path_sign_attachment реально есть .pdf
     # - status_attachment: True, если услуга ещё активна (текущая дата <= date_end_attachment)
-    status_sign_attachment: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="false")
-    status_attachment:      Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="false")
+    status_sign_attachment: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=false())
+    status_attachment:      Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=false())
 
     deal:    Mapped["Deal"]    = relationship(back_populates="attachments")
     service: Mapped["Service"] = relationship(back_populates="attachments")
 
     def __repr__(self) -> str:
         return f"<Attachment {self.id_attachment} deal={self.id_attachment_deal} service={self.id_service_attachment}>"
+
+
+# ============== Служебное состояние пересчёта статусов ==============
+class SweepState(Base):
+    """Дата последнего прохода истечения status_attachment (status_engine; выборку не ограничивает)."""
+    __tablename__ = "sweep_state"
+
+    name:       Mapped[str]  = mapped_column(String(64), primary_key=True)
+    swept_till: Mapped[date] = mapped_column(Date, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<SweepState {self.name} till={self.swept_till}>"
+
+
+class FileStat(Base):
+    """Последний увиденный stat() файла подписанного .pdf (чтобы не пересчитывать неизменённые пути)."""
+    __tablename__ = "file_stats"
+
+    path:     Mapped[str]           = mapped_column(Text, primary_key=True)
+    mtime_ns: Mapped[Optional[int]] = mapped_column(BigInteger)  # NULL — файла нет
+    size:     Mapped[Optional[int]] = mapped_column(BigInteger)
+
+    def __repr__(self) -> str:
+        return f"<FileStat {self.path!r} mtime={self.mtime_ns}>"
+
+
+class RefCacheVersion(Base):
+    """Версия данных справочника для refcache.py: триггеры поднимают её на каждую запись в таблицу."""
+    __tablename__ = "refcache_versions"
+
+    name:    Mapped[str] = mapped_column(String(64), primary_key=True)  # имя таблицы справочника
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<RefCacheVersion {self.name} v{self.version}>"
+
+
+# ============== Сводка для дашборда (исполнитель × месяц) ==============
+class DashboardMonthly(Base):
+    """
+    Поддерживается триггерами на deals/attachments (см. dashboard.py), руками не пишется.
+    Месяц — месяц даты договора; приложения считаются в месяце своего договора.
+    """
+    __tablename__ = "dashboard_monthly"
+
+    id_executor: Mapped[str] = mapped_column(String(128), primary_key=True)
+    month:       Mapped[str] = mapped_column(String(7), primary_key=True)  # ГГГГ-ММ
+
+    deals:               Mapped[int]   = mapped_column(Integer, nullable=False, default=0)
+    deals_waiting_orig:  Mapped[int]   = mapped_column(Integer, nullable=False, default=0)  # status_orig_deal = false
+    attachments_active:  Mapped[int]   = mapped_column(Integer, nullable=False, default=0)
+    attachments_expired: Mapped[int]   = mapped_column(Integer, nullable=False, default=0)
+    # копейки: на SQLite Numeric — это REAL, и сумма приращений от триггеров расходилась бы
+    # с пересчётом с нуля; сумма целых точна в любом порядке
+    price_total_minor:   Mapped[int]   = mapped_column(BigInteger, nullable=False, default=0)
+
+    @property
+    def price_total(self) -> Decimal:
+        return Decimal(self.price_total_minor).scaleb(-2)
+
+    def __repr__(self) -> str:
+        return f"<DashboardMonthly {self.id_executor} {self.month} deals={self.deals}>"
@@ -0,0 +1,81 @@
+"""
+Keyset (cursor) пагинация для списочных эндпоинтов.
+
+Курсор — это значения ключа сортировки последней строки страницы (base64url от JSON).
+Следующая страница выбирается условием (a, b) > (x, y) по тем же колонкам, поэтому
+стоимость страницы N не зависит от N (в отличие от OFFSET), если есть подходящий индекс.
+Последняя колонка каждого ключа — PK, чтобы порядок был стабильным.
+
+stmt может выбирать как сущность (select(Deal)), так и отдельные колонки
+(select(*projection.columns(...))) — тогда items содержит Row; колонки ключа сортировки
+должны входить в выборку.
+"""
+
+from __future__ import annotations
+import base64
+import binascii
+import json
+from datetime import date
+from typing import Any, Generic, TypeVar
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import Date, Select, tuple_
+from sqlalchemy.orm import Session
+
+T = TypeVar("T")
+
+# sort -> (колонки ключа, по убыванию?)
+SortSpec = dict[str, tuple[tuple[Any, ...], bool]]
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: str | None = None
+
+
+def encode_cursor(sort: str, values: list[Any]) -> str:
+    raw = json.dumps([sort, values], default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, columns: tuple[Any, ...]) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, values = json.loads(raw)
+        if cursor_sort != sort or len(values) != len(columns):
+            raise ValueError
+        return [
+            date.fromisoformat(v) if isinstance(col.type, Date) else v
+            for col, v in zip(columns, values)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+def _selects_entity(stmt: Select) -> bool:
+    described = stmt.column_descriptions
+    return len(described) == 1 and described[0]["expr"] is described[0]["entity"]
+
+
+def paginate(db: Session, stmt: Select, sorts: SortSpec, sort: str,
+             cursor: str | None, limit: int) -> dict:
+    if sort not in sorts:
+        raise HTTPException(status_code=400, detail=f"Неизвестная сортировка: {sort}")
+    columns, descending = sorts[sort]
+
+    if cursor:
+        key = tuple_(*columns)
+        after = tuple_(*decode_cursor(cursor, sort, columns))
+        stmt = stmt.where(key < after if descending else key > after)
+
+    order = [c.desc() if descending else c.asc() for c in columns]
+    result = db.execute(stmt.order_by(*order).limit(limit + 1))
+    rows = result.scalars().all() if _selects_entity(stmt) else result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, [getattr(last, c.key) for c in columns])
+    return {"items": rows, "next_cursor": next_cursor}
@@ -0,0 +1,39 @@
+"""
+Быстрый путь для списочных эндпоинтов: выбираем только колонки, объявленные в модели
+ответа, и сериализуем строки сразу в JSON-байты.
+
+- columns(Model, Schema) — колонки ORM-модели по полям pydantic-схемы (в порядке полей).
+  select(*columns(...)) возвращает простые Row: без identity map, без инструментации
+  и без загрузки неиспользуемых колонок (реквизиты банка и т.п.).
+- JSONBody(Schema) — заранее собранный TypeAdapter; dump(value) валидирует Row/словари
+  (from_attributes) и сериализует в bytes средствами pydantic-core, минуя
+  jsonable_encoder и json.dumps FastAPI. Эндпоинт возвращает готовый Response, а
+  response_model остаётся только для OpenAPI.
+
+Сравнение с прежним путём (ORM-сущности + response_model): python -m bench.serialization
+"""
+
+from __future__ import annotations
+from typing import Any, Generic, TypeVar
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+T = TypeVar("T")
+
+
+def columns(model: type, schema: type[BaseModel]) -> tuple[Any, ...]:
+    return tuple(getattr(model, name) for name in schema.model_fields)
+
+
+class JSONBody(Generic[T]):
+    __slots__ = ("adapter",)
+
+    def __init__(self, tp: type[T]):
+        self.adapter = TypeAdapter(tp)
+
+    def dump(self, value: Any) -> bytes:
+        return self.adapter.dump_json(self.adapter.validate_python(value, from_attributes=True))
+
+    def response(self, value: Any) -> Response:
+        return Response(content=self.dump(value), media_type="application/json")
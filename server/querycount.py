@@ -0,0 +1,51 @@
+"""
+Подсчёт SQL-запросов — для тестов, которые фиксируют число запросов на эндпоинт:
+
+    with assert_max_queries(engine, 2):
+        client.get("/api/deals/deal1")
+
+При превышении — AssertionError со списком выполненных запросов (видно, какой лишний).
+Управление транзакцией (BEGIN — на SQLite его шлёт db.py) не считается: на PostgreSQL
+драйвер открывает транзакцию неявно, и счёт должен совпадать на обеих БД.
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+TX_CONTROL = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if not statement.lstrip().upper().startswith(TX_CONTROL):
+            self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine: Engine) -> Iterator[QueryCounter]:
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter._on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter._on_execute)
+
+
+@contextmanager
+def assert_max_queries(engine: Engine, limit: int) -> Iterator[QueryCounter]:
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        listing = "\n".join(f"  {i}. {s}" for i, s in enumerate(counter.statements, 1))
+        raise AssertionError(f"Ожидалось не больше {limit} SQL-запросов, выполнено {counter.count}:\n{listing}")
@@ -0,0 +1,121 @@
+"""
+Кэш справочников (исполнители, шаблоны договоров, типы клиентов) в памяти процесса.
+
+- Храним уже сериализованное тело ответа (bytes) и сильный ETag.
+- Версия данных — в БД: строка refcache_versions на таблицу справочника, её поднимают
+  триггеры на любую запись (ORM, core insert(), другой воркер uvicorn, ручная правка).
+  Счётчик в памяти процесса видел бы только свои коммиты, и остальные воркеры отдавали
+  бы устаревший справочник с «верным» ETag.
+- На запрос — один SELECT версий по первичному ключу; тело из кэша отдаётся, только
+  если оно построено при тех же версиях, иначе строится заново в том же снимке.
+- If-None-Match с совпавшим ETag -> 304 без тела.
+"""
+
+from __future__ import annotations
+import hashlib
+import threading
+from typing import Callable
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from db import read_engine
+from models import Base, ClientType, Executor, SampleContract
+
+TRACKED = (Executor, SampleContract, ClientType)
+TABLES = tuple(m.__tablename__ for m in TRACKED)
+
+_lock = threading.Lock()
+# key -> (версии зависимостей, тело, etag)
+_entries: dict[str, tuple[tuple[int, ...], bytes, str]] = {}
+stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+
+# ================= DDL =================
+def _bump(table: str) -> str:
+    return f"UPDATE refcache_versions SET version = version + 1 WHERE name = '{table}'"
+
+
+def _sqlite_ddl() -> list[str]:
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS refcache_{table}_a{op[0].lower()} AFTER {op} ON {table} "
+        f"BEGIN {_bump(table)}; END"
+        for table in TABLES for op in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+
+def _pg_ddl() -> list[str]:
+    ddl = [
+        """CREATE OR REPLACE FUNCTION refcache_bump() RETURNS trigger AS $$
+BEGIN
+    UPDATE refcache_versions SET version = version + 1 WHERE name = TG_TABLE_NAME;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql""",
+    ]
+    for table in TABLES:
+        ddl += [
+            f"DROP TRIGGER IF EXISTS refcache_bump ON {table}",
+            f"CREATE TRIGGER refcache_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION refcache_bump()",
+        ]
+    return ddl
+
+
+def ddl(dialect: str) -> list[str]:
+    """DDL для диалекта (пусто — диалект не поддерживается); входит в отпечаток схемы (migrations.py)."""
+    return {"sqlite": _sqlite_ddl, "postgresql": _pg_ddl}.get(dialect, list)()
+
+
+def install(conn: Connection) -> None:
+    statements = ddl(conn.dialect.name)
+    if not statements:
+        return
+    values = ", ".join(f"('{table}', 0)" for table in TABLES)
+    conn.exec_driver_sql(f"INSERT INTO refcache_versions (name, version) VALUES {values} ON CONFLICT (name) DO NOTHING")
+    for stmt in statements:
+        conn.exec_driver_sql(stmt)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, conn: Connection, **kw) -> None:
+    install(conn)
+
+
+# ================= Кэш =================
+def cached_json(request: Request, key: str, models: tuple[type, ...],
+                build: Callable[[Session], bytes]) -> Response:
+    """Ответ из кэша (или 304), если версии справочников в БД не менялись; иначе build(db)."""
+    # попадание — голое соединение и неизменный SQL: через ORM-сессию проверка версий
+    # стоила бы вдвое дороже самого ответа из кэша
+    with read_engine.connect() as conn:
+        versions = dict(conn.exec_driver_sql("SELECT name, version FROM refcache_versions").all())
+        version = tuple(versions.get(m.__tablename__, 0) for m in models)
+        with _lock:
+            entry = _entries.get(key)
+        if entry is not None and entry[0] == version:
+            stats["hits"] += 1
+            _, body, etag = entry
+        else:
+            stats["misses"] += 1
+            with Session(bind=conn) as db:
+                body = build(db)  # в той же транзакции, что и версии (SQLite: один снимок)
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            with _lock:
+                _entries[key] = (version, body, etag)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match запроса совпал с etag (слабое сравнение, как для GET) — можно ответить 304."""
+    value = request.headers.get("if-none-match")
+    if not value:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in value.split(",")}
+    return etag in tags or "*" in tags
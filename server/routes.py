@@ -1,22 +1,33 @@
-from fastapi import APIRouter, Depends
-from pydantic import BaseModel
-from sqlalchemy.orm import Session
-import uuid
+from datetime import date
+from decimal import Decimal
 
-from db import SessionLocal
-from models import Executor, ClientType, SampleContract, Client
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload
+
+from db import ReadSessionLocal, SessionLocal
+from ids import new_id
+from models import Executor, ClientType, SampleContract, Client, Deal, Attachment, Service
+from pagination import Page, SortSpec, paginate
+from projection import JSONBody, columns
+import refcache
 
 router = APIRouter(prefix="/api", tags=["crm"])
 
 
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    # GET/HEAD — читающая сессия (на SQLite без лока писателя), остальное — пишущая
+    db = ReadSessionLocal() if request.method in ("GET", "HEAD") else SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
 class ExecutorOut(BaseModel):
+    id_executor: str
+    name_executor: str
+
     class Config:
         from_attributes = True
 
@@ -36,7 +47,26 @@ class ClientTypeOut(BaseModel):
     class Config:
         from_attributes = True
 
+# Те же правила "только цифры + длина", что и CHECK-ограничения Client в models.py
 class ClientIn(BaseModel):
+    type_client: int = Field(ge=1, le=9)
+    inn_client: str = Field(pattern=r"^[0-9]{10,12}$")
+    ogrn_client: str = Field(pattern=r"^[0-9]{13,15}$")
+    kpp_client: str | None = Field(default=None, pattern=r"^[0-9]{9}$")
+    name_client: str
+    adress_client: str
+    bank_client: str
+    bik_bank_client: str = Field(pattern=r"^[0-9]{9}$")
+    acc_bank_client: str = Field(pattern=r"^[0-9]{20}$")
+    cor_bank_client: str = Field(pattern=r"^[0-9]{20}$")
+    tel_client: str
+    mail_client: str
+    mess_client: str
+    contact_name_client: str
+
+
+# Без ограничений ClientIn: строки, записанные до них (или в обход API), список не ломают
+class ClientOut(BaseModel):
     type_client: int
     inn_client: str
     ogrn_client: str
@@ -51,32 +81,248 @@ class ClientIn(BaseModel):
     mail_client: str
     mess_client: str
     contact_name_client: str
+    id_client: str
 
+    class Config:
+        from_attributes = True
 
-class ClientOut(ClientIn):
-    id_client: str
+
+class DealOut(BaseModel):
+    id_deal: str
+    id_client_deal: str
+    id_executor_deal: str
+    number_deal: str
+    date_deal: date
+    status_deal: bool
+    path_doc_deal: str
+    path_pdf_deal: str
+    path_sign_deal: str | None = None
+    status_orig_deal: bool
+
+    class Config:
+        from_attributes = True
+
+
+class AttachmentOut(BaseModel):
+    id_attachment: str
+    id_attachment_deal: str
+    id_service_attachment: str
+    date_start_attachment: date
+    date_end_attachment: date
+    place_attachment: str
+    price_attachment: Decimal | None = None
+    path_doc_attachment: str
+    path_pdf_attachment: str
+    path_sign_attachment: str | None = None
+    status_sign_attachment: bool
+    status_attachment: bool
 
     class Config:
         from_attributes = True
 
 
+class ExecutorDetailOut(BaseModel):
+    id_executor: str
+    type_executor: int
+    name_executor: str
+    inn_executor: str
+    ogrn_executor: str
+    kpp_executor: str | None = None
+    adress_executor: str
+    bank_executor: str
+    cor_bank_executor: str
+    acc_bank_executor: str
+    bik_bank_executor: str
+    contact_name_executor: str
+    mail_executor: str
+    tel_executor: str
+    mess_executor: str
+
+    class Config:
+        from_attributes = True
+
+
+class ServiceOut(BaseModel):
+    id_service: str
+    name_service: str
+    id_contract_service: str
+    contract_tpl: SampleContractOut
+
+    class Config:
+        from_attributes = True
+
+
+class AttachmentDetailOut(AttachmentOut):
+    service: ServiceOut
+
+
+class DealDetailOut(DealOut):
+    client: ClientOut
+    executor: ExecutorDetailOut
+    attachments: list[AttachmentDetailOut]
+
+
+# Весь граф карточки договора фиксированным числом запросов:
+# 1) deal + client + executor (JOIN), 2) attachments + service + contract_tpl (IN по id договоров).
+# Всё остальное — raiseload: случайный ленивый доступ упадёт, а не выстрелит N запросами.
+DEAL_GRAPH = (
+    joinedload(Deal.client),
+    joinedload(Deal.executor),
+    selectinload(Deal.attachments).joinedload(Attachment.service).joinedload(Service.contract_tpl),
+    raiseload("*"),
+)
+
+
+# Допустимые сортировки списков: имя -> (колонки ключа с PK в конце, по убыванию?)
+CLIENT_SORTS: SortSpec = {
+    "name":  ((Client.name_client, Client.id_client), False),
+    "-name": ((Client.name_client, Client.id_client), True),
+    "id":    ((Client.id_client,), False),
+}
+
+DEAL_SORTS: SortSpec = {
+    "date":  ((Deal.date_deal, Deal.id_deal), False),
+    "-date": ((Deal.date_deal, Deal.id_deal), True),
+    "id":    ((Deal.id_deal,), False),
+}
+
+ATTACHMENT_SORTS: SortSpec = {
+    "date_end":  ((Attachment.date_end_attachment, Attachment.id_attachment), False),
+    "-date_end": ((Attachment.date_end_attachment, Attachment.id_attachment), True),
+    "id":        ((Attachment.id_attachment,), False),
+}
+
+
+# Списки выбирают только колонки своей модели ответа (Row без ORM-сущностей)
+# и сериализуются заранее собранным TypeAdapter сразу в байты, см. projection.py
+EXECUTOR_COLUMNS = columns(Executor, ExecutorOut)
+SAMPLE_CONTRACT_COLUMNS = columns(SampleContract, SampleContractOut)
+CLIENT_TYPE_COLUMNS = columns(ClientType, ClientTypeOut)
+CLIENT_COLUMNS = columns(Client, ClientOut)
+DEAL_COLUMNS = columns(Deal, DealOut)
+ATTACHMENT_COLUMNS = columns(Attachment, AttachmentOut)
+
+_executors_json = JSONBody(list[ExecutorOut])
+_sample_contracts_json = JSONBody(list[SampleContractOut])
+_client_types_json = JSONBody(list[ClientTypeOut])
+_clients_page_json = JSONBody(Page[ClientOut])
+_deals_page_json = JSONBody(Page[DealOut])
+_attachments_page_json = JSONBody(Page[AttachmentOut])
+
+
+# Справочники формы: отдаются из refcache (готовые байты + ETag); при неизменных версиях в БД — без построения
 @router.get("/executors", response_model=list[ExecutorOut])
-def list_executors(db: Session = Depends(get_db)):
-    return db.query(Executor).order_by(Executor.name_executor).all()
+def list_executors(request: Request):
+    return refcache.cached_json(request, "executors", (Executor,), lambda db: _executors_json.dump(
+        db.execute(select(*EXECUTOR_COLUMNS).order_by(Executor.name_executor)).all()))
+
 
 @router.get("/sample-contracts", response_model=list[SampleContractOut])
-def list_sample_contracts(db: Session = Depends(get_db)):
-    return db.query(SampleContract).order_by(SampleContract.name_sample_contract).all()
+def list_sample_contracts(request: Request):
+    return refcache.cached_json(request, "sample-contracts", (SampleContract,), lambda db: _sample_contracts_json.dump(
+        db.execute(select(*SAMPLE_CONTRACT_COLUMNS).order_by(SampleContract.name_sample_contract)).all()))
 
 
 @router.get("/client-types", response_model=list[ClientTypeOut])
-def list_client_types(db: Session = Depends(get_db)):
-    return db.query(ClientType).order_by(ClientType.id_type_long).all()
+def list_client_types(request: Request):
+    return refcache.cached_json(request, "client-types", (ClientType,), lambda db: _client_types_json.dump(
+        db.execute(select(*CLIENT_TYPE_COLUMNS).order_by(ClientType.id_type_long)).all()))
+
+
+@router.get("/reference-cache/stats")
+def reference_cache_stats():
+    return refcache.stats
+
+
+@router.get("/clients", response_model=Page[ClientOut])
+def list_clients(
+    type_client: int | None = None,
+    sort: str = "name",
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    stmt = select(*CLIENT_COLUMNS)
+    if type_client is not None:
+        stmt = stmt.where(Client.type_client == type_client)
+    return _clients_page_json.response(paginate(db, stmt, CLIENT_SORTS, sort, cursor, limit))
+
+
+def filter_deals(stmt, id_client_deal, id_executor_deal, date_from, date_to):
+    """Фильтры GET /api/deals; ими же отбирает строки выгрузка (export.py)."""
+    if id_client_deal is not None:
+        stmt = stmt.where(Deal.id_client_deal == id_client_deal)
+    if id_executor_deal is not None:
+        stmt = stmt.where(Deal.id_executor_deal == id_executor_deal)
+    if date_from is not None:
+        stmt = stmt.where(Deal.date_deal >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Deal.date_deal <= date_to)
+    return stmt
+
+
+@router.get("/deals", response_model=Page[DealOut])
+def list_deals(
+    id_client_deal: str | None = None,
+    id_executor_deal: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    sort: str = "-date",
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    stmt = filter_deals(select(*DEAL_COLUMNS), id_client_deal, id_executor_deal, date_from, date_to)
+    return _deals_page_json.response(paginate(db, stmt, DEAL_SORTS, sort, cursor, limit))
+
+
+# объявлен до /deals/{id_deal}, иначе "detailed" будет принят за id
+@router.get("/deals/detailed", response_model=Page[DealDetailOut])
+def list_deals_detailed(
+    id_client_deal: str | None = None,
+    id_executor_deal: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    sort: str = "-date",
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db),
+):
+    stmt = filter_deals(select(Deal).options(*DEAL_GRAPH), id_client_deal, id_executor_deal, date_from, date_to)
+    return paginate(db, stmt, DEAL_SORTS, sort, cursor, limit)
+
+
+@router.get("/deals/{id_deal}", response_model=DealDetailOut)
+def get_deal(id_deal: str, db: Session = Depends(get_db)):
+    deal = db.scalar(select(Deal).where(Deal.id_deal == id_deal).options(*DEAL_GRAPH))
+    if deal is None:
+        raise HTTPException(status_code=404, detail="Договор не найден")
+    return deal
+
+
+@router.get("/attachments", response_model=Page[AttachmentOut])
+def list_attachments(
+    id_attachment_deal: str | None = None,
+    status_attachment: bool | None = None,
+    status_sign_attachment: bool | None = None,
+    sort: str = "date_end",
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    stmt = select(*ATTACHMENT_COLUMNS)
+    if id_attachment_deal is not None:
+        stmt = stmt.where(Attachment.id_attachment_deal == id_attachment_deal)
+    if status_attachment is not None:
+        stmt = stmt.where(Attachment.status_attachment == status_attachment)
+    if status_sign_attachment is not None:
+        stmt = stmt.where(Attachment.status_sign_attachment == status_sign_attachment)
+    return _attachments_page_json.response(paginate(db, stmt, ATTACHMENT_SORTS, sort, cursor, limit))
 
 
 @router.post("/clients", response_model=ClientOut, status_code=201)
 def create_client(payload: ClientIn, db: Session = Depends(get_db)):
-     client = Client(id_client=f"client{uuid.uuid4().hex}", **payload.model_dump())
+    client = Client(id_client=new_id("client"), **payload.model_dump())
     db.add(client)
     db.commit()
     db.refresh(client)
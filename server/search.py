@@ -0,0 +1,223 @@
+"""
+Поиск клиентов и исполнителей (typeahead): GET /api/clients/search?q=, /api/executors/search?q=
+
+- Запрос только из цифр -> префиксный поиск по ИНН/ОГРН: диапазон по B-tree индексам
+  (inn >= q AND inn < q+1), без LIKE.
+- Иначе — полнотекстовый по названию, контактному лицу и почте, каждое слово как префикс:
+  * SQLite: FTS5-таблицы clients_fts/executors_fts (external content) + триггеры
+    синхронизации. Ранжирование — по ступеням: сначала совпадения в названии, затем в
+    контакте/почте; внутри ступени — короче название выше. bm25 не используем: его IDF
+    проходит весь список документов термина, и для широких префиксов ("оо", "сер")
+    одно это стоит десятки мс, а различает такие совпадения он всё равно слабо.
+    Ступень берёт не больше RANK_CANDIDATES совпадений: если их больше, порядок —
+    среди первых RANK_CANDIDATES по rowid, но более сильная ступень всегда выше слабой;
+  * PostgreSQL: GIN-индекс pg_trgm по lower(название || контакт || почта), LIKE на каждое
+    слово (% и _ в слове экранируются — это не шаблон). Как и на SQLite, индекс отдаёт не
+    больше RANK_CANDIDATES кандидатов, и word_similarity сортирует только их, а не всё
+    множество совпадений. Операторы <% / %> индекс тоже поддерживает, но они нечёткие и
+    отбросили бы совпадения с середины слова ("маш" в "ромашка"), которые LIKE находит.
+Индексы/триггеры создаются вместе с таблицами (after_create у metadata);
+для существующей БД: python search.py --install (заодно перестраивает FTS).
+"""
+
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+from sqlalchemy import event, func, literal_column, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from models import Base, Client, Executor
+from routes import get_db
+
+router = APIRouter(prefix="/api", tags=["crm"])
+
+TOKEN = re.compile(r"\w+")
+RANK_CANDIDATES = 500
+
+
+@dataclass(frozen=True)
+class SearchSpec:
+    model: type
+    table: str
+    pk: str
+    text_cols: tuple[str, ...]     # первый — название, с наибольшим весом
+    digit_cols: tuple[str, ...]    # ИНН, ОГРН
+
+
+CLIENTS = SearchSpec(Client, "clients", "id_client",
+                     ("name_client", "contact_name_client", "mail_client"), ("inn_client", "ogrn_client"))
+EXECUTORS = SearchSpec(Executor, "executors", "id_executor",
+                       ("name_executor", "contact_name_executor", "mail_executor"), ("inn_executor", "ogrn_executor"))
+
+
+# ================= DDL =================
+def _sqlite_ddl(spec: SearchSpec) -> list[str]:
+    fts = f"{spec.table}_fts"
+    cols = ", ".join(spec.text_cols)
+    new = ", ".join(f"new.{c}" for c in spec.text_cols)
+    old = ", ".join(f"old.{c}" for c in spec.text_cols)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{spec.table}', "
+        f"content_rowid='rowid', tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {spec.table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {spec.table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {spec.table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new}); END",
+    ]
+
+
+def _pg_search_expr(spec: SearchSpec) -> str:
+    return "lower(" + " || ' ' || ".join(spec.text_cols) + ")"
+
+
+def _pg_ddl(spec: SearchSpec) -> list[str]:
+    return [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"CREATE INDEX IF NOT EXISTS ix_{spec.table}_search_trgm ON {spec.table} "
+        f"USING gin (({_pg_search_expr(spec)}) gin_trgm_ops)",
+    ]
+
+
+def ddl(dialect: str) -> list[str]:
+    """DDL для диалекта (пусто — диалект не поддерживается); входит в отпечаток схемы (migrations.py)."""
+    build = {"sqlite": _sqlite_ddl, "postgresql": _pg_ddl}.get(dialect)
+    return [stmt for spec in (CLIENTS, EXECUTORS) for stmt in build(spec)] if build else []
+
+
+def install(conn: Connection, rebuild: bool = False) -> None:
+    for stmt in ddl(conn.dialect.name):
+        conn.exec_driver_sql(stmt)
+    if rebuild and conn.dialect.name == "sqlite":
+        for spec in (CLIENTS, EXECUTORS):
+            conn.exec_driver_sql(f"INSERT INTO {spec.table}_fts({spec.table}_fts) VALUES ('rebuild')")
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, conn: Connection, **kw) -> None:
+    install(conn)
+
+
+# ================= Запросы =================
+class SearchHit(BaseModel):
+    id: str
+    name: str
+    inn: str
+    ogrn: str
+    contact_name: str
+    mail: str
+
+
+def _prefix_upper(q: str) -> str:
+    """Наименьшая строка, большая всех строк с префиксом q (для цифр: '123' -> '124')."""
+    return q[:-1] + chr(ord(q[-1]) + 1)
+
+
+def _columns(spec: SearchSpec):
+    t = spec.model.__table__.c
+    return (t[spec.pk], t[spec.text_cols[0]], t[spec.digit_cols[0]], t[spec.digit_cols[1]],
+            t[spec.text_cols[1]], t[spec.text_cols[2]])
+
+
+def _digits_search(db: Session, spec: SearchSpec, q: str, limit: int):
+    t = spec.model.__table__.c
+    hi = _prefix_upper(q)
+    # по запросу на колонку: каждый идёт по своему индексу в его порядке и останавливается на limit
+    rows, seen = [], set()
+    for c in spec.digit_cols:
+        for row in db.execute(
+            select(*_columns(spec)).where(t[c] >= q, t[c] < hi).order_by(t[c]).limit(limit)
+        ):
+            if row[0] not in seen:
+                seen.add(row[0])
+                rows.append(row)
+    # точное совпадение ИНН/ОГРН — первым
+    rows.sort(key=lambda r: q not in (r[2], r[3]))
+    return rows[:limit]
+
+
+def _sqlite_text_search(db: Session, spec: SearchSpec, tokens: list[str], limit: int):
+    fts = f"{spec.table}_fts"
+    name = spec.text_cols[0]
+    cols = ", ".join(f"t.{c.name}" for c in _columns(spec))
+    phrase = " ".join(f'"{tok}"*' for tok in tokens)
+    rows, seen = [], set()
+    for match in (f"{{{name}}} : ({phrase})", phrase):
+        for row in db.execute(
+            text(f"SELECT {cols} FROM (SELECT rowid AS rid FROM {fts} WHERE {fts} MATCH :match "
+                 f"LIMIT :candidates) h JOIN {spec.table} t ON t.rowid = h.rid "
+                 f"ORDER BY length(t.{name}), t.{name} LIMIT :limit"),
+            {"match": match, "candidates": RANK_CANDIDATES, "limit": limit},
+        ):
+            if row[0] not in seen:
+                seen.add(row[0])
+                rows.append(row)
+        if len(rows) >= limit:
+            break
+    return rows[:limit]
+
+
+def _like_escape(tok: str) -> str:
+    return tok.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _pg_text_query(spec: SearchSpec, tokens: list[str], limit: int):
+    expr = literal_column(_pg_search_expr(spec))
+    candidates = (
+        select(*_columns(spec), expr.label("search_text"))
+        .where(*[expr.like(f"%{_like_escape(tok)}%", escape="\\") for tok in tokens])
+        .limit(RANK_CANDIDATES)
+        .subquery()
+    )
+    rank = func.word_similarity(" ".join(tokens), candidates.c.search_text)
+    return (select(*[candidates.c[c.name] for c in _columns(spec)])
+            .order_by(rank.desc(), candidates.c[spec.text_cols[0]]).limit(limit))
+
+
+def _pg_text_search(db: Session, spec: SearchSpec, tokens: list[str], limit: int):
+    return db.execute(_pg_text_query(spec, tokens, limit)).all()
+
+
+def search(db: Session, spec: SearchSpec, q: str, limit: int) -> list[SearchHit]:
+    q = q.strip()
+    if q.isdigit():
+        rows = _digits_search(db, spec, q, limit)
+    else:
+        tokens = [tok.lower() for tok in TOKEN.findall(q)]
+        if not tokens:
+            return []
+        if db.get_bind().dialect.name == "postgresql":
+            rows = _pg_text_search(db, spec, tokens, limit)
+        else:
+            rows = _sqlite_text_search(db, spec, tokens, limit)
+    return [SearchHit(id=r[0], name=r[1], inn=r[2], ogrn=r[3], contact_name=r[4], mail=r[5]) for r in rows]
+
+
+@router.get("/clients/search", response_model=list[SearchHit])
+def search_clients(q: str = Query(..., min_length=1, max_length=200),
+                   limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+    return search(db, CLIENTS, q, limit)
+
+
+@router.get("/executors/search", response_model=list[SearchHit])
+def search_executors(q: str = Query(..., min_length=1, max_length=200),
+                     limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+    return search(db, EXECUTORS, q, limit)
+
+
+if __name__ == "__main__":
+    import argparse
+    from db import engine
+
+    parser = argparse.ArgumentParser(description="Индексы поиска клиентов/исполнителей")
+    parser.add_argument("--install", action="store_true", help="создать индексы/триггеры и перестроить FTS")
+    args = parser.parse_args()
+    if args.install:
+        with engine.begin() as conn:
+            install(conn, rebuild=True)
@@ -0,0 +1,252 @@
+"""
+Подписанные PDF договоров и приложений: загрузка потоком и скачивание с Range/ETag.
+
+    PUT /api/deals/{id_deal}/signed             тело — application/pdf
+    PUT /api/attachments/{id_attachment}/signed
+    GET /api/deals/{id_deal}/signed             (HEAD, Range, If-Range, If-None-Match)
+    GET /api/attachments/{id_attachment}/signed
+
+- Тело читается потоком (request.stream()) во временный файл; в памяти — не больше
+  WRITE_BUFFER байт. SHA-256 считается на лету, запись и хеширование — в пуле потоков.
+- Хранилище адресуется содержимым: SIGNED_DIR/ab/cd/<sha256>.pdf (storage.py,
+  CRM_SIGNED_DIR; в БД пишется абсолютный путь). Повторная загрузка
+  того же скана (частый случай) не создаёт копию — временный файл просто удаляется.
+  Файл появляется в хранилище атомарно (os.replace), частично записанных файлов там нет.
+- Пока путь не записан в БД, файл держит «аренда» SIGNED_DIR/tmp/<sha256>.<...>.lease:
+  --gc такие не удаляет. mtime самого файла при дубликате не трогаем — это время его
+  появления в хранилище, и на него опираются --gc и кэш stat() в status_engine (FileStat).
+- После сохранения путь ставится одним UPDATE: path_sign_deal либо
+  path_sign_attachment вместе с status_sign_attachment = true (status_engine считает
+  приложение подписанным, пока файл по пути существует).
+- Скачивание — FileResponse: Range и If-Range, http.response.pathsend (отдача файла
+  сервером без чтения в Python), если сервер его поддерживает, иначе — чтение кусками.
+  ETag — sha256 содержимого, на If-None-Match отвечаем 304.
+- Файлы, на которые больше не ссылается ни одна строка: python signed_docs.py --gc
+
+Лимит размера — CRM_SIGNED_MAX_MB (по умолчанию 200), иначе 413; не PDF — 415.
+"""
+
+from __future__ import annotations
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from sqlalchemy import select, update
+from starlette.concurrency import run_in_threadpool
+
+from db import ReadSessionLocal, SessionLocal
+from models import Attachment, Deal
+import refcache
+from storage import SIGNED_DIR
+
+router = APIRouter(prefix="/api", tags=["crm"])
+
+MAX_UPLOAD_BYTES = int(os.getenv("CRM_SIGNED_MAX_MB", "200")) * 2**20
+WRITE_BUFFER = 1 << 20
+PDF_MAGIC = b"%PDF-"
+GC_MIN_AGE_S = 3600  # моложе — возможно, загрузка ещё не записала путь в БД
+
+
+class SignedUploadOut(BaseModel):
+    sha256: str
+    size: int
+    path: str
+    deduplicated: bool
+
+
+# ================= Хранилище =================
+def blob_path(digest: str) -> Path:
+    return SIGNED_DIR / digest[:2] / digest[2:4] / f"{digest}.pdf"
+
+
+def _write(f: BinaryIO, h, data: bytearray) -> None:
+    h.update(data)  # hashlib отпускает GIL на больших буферах
+    f.write(data)
+
+
+def _finish(f: BinaryIO) -> None:
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _leased(digest: str) -> bool:
+    cutoff = time.time() - GC_MIN_AGE_S
+    return any(lease.stat().st_mtime > cutoff for lease in (SIGNED_DIR / "tmp").glob(f"{digest}.*.lease"))
+
+
+def _publish(tmp: Path, target: Path, lease: Path) -> bool:
+    """Переносит файл в хранилище; True — такой файл уже был (дубликат)."""
+    lease.touch()  # до проверки существования: --gc смотрит аренду перед удалением
+    if target.exists():
+        tmp.unlink()
+        return True
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp, target)
+    return False
+
+
+async def store_stream(chunks: AsyncIterator[bytes]) -> tuple[SignedUploadOut, Path]:
+    """Сохраняет тело в хранилище; второе — аренда файла, снять после записи пути в БД."""
+    tmp_dir = SIGNED_DIR / "tmp"
+    await run_in_threadpool(tmp_dir.mkdir, parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+    tmp = Path(tmp_name)
+    h = hashlib.sha256()
+    size, head, buf = 0, b"", bytearray()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                if len(head) < len(PDF_MAGIC):
+                    head += chunk[:len(PDF_MAGIC) - len(head)]
+                    if len(head) == len(PDF_MAGIC) and head != PDF_MAGIC:
+                        raise HTTPException(status_code=415, detail="Ожидается PDF")
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Файл слишком большой")
+                buf += chunk
+                if len(buf) >= WRITE_BUFFER:
+                    data, buf = buf, bytearray()
+                    await run_in_threadpool(_write, f, h, data)
+            if head != PDF_MAGIC:
+                raise HTTPException(status_code=415, detail="Ожидается PDF")
+            if buf:
+                await run_in_threadpool(_write, f, h, buf)
+            await run_in_threadpool(_finish, f)
+        digest = h.hexdigest()
+        target = blob_path(digest)
+        lease = tmp_dir / f"{digest}.{tmp.stem}.lease"
+        deduplicated = await run_in_threadpool(_publish, tmp, target, lease)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return SignedUploadOut(sha256=digest, size=size, path=str(target), deduplicated=deduplicated), lease
+
+
+# ================= БД =================
+def _exists(model, id_value: str) -> bool:
+    pk = model.__table__.primary_key.columns[0]
+    db = ReadSessionLocal()
+    try:
+        return db.scalar(select(pk).where(pk == id_value)) is not None
+    finally:
+        db.close()
+
+
+def _set_path(model, id_value: str, values: dict) -> bool:
+    pk = model.__table__.primary_key.columns[0]
+    db = SessionLocal()
+    try:
+        updated = db.execute(update(model.__table__).where(pk == id_value).values(values)).rowcount
+        db.commit()
+        return updated == 1
+    finally:
+        db.close()
+
+
+def _get_path(column, pk, id_value: str) -> str | None:
+    db = ReadSessionLocal()
+    try:
+        row = db.execute(select(column).where(pk == id_value)).first()
+    finally:
+        db.close()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Не найдено")
+    return row[0]
+
+
+async def _upload(request: Request, model, id_value: str, values_for) -> SignedUploadOut:
+    # 404 — до чтения тела, чтобы не гонять файл впустую
+    if not await run_in_threadpool(_exists, model, id_value):
+        raise HTTPException(status_code=404, detail="Не найдено")
+    stored, lease = await store_stream(request.stream())
+    try:
+        # строку могли удалить, пока шла загрузка: файл остаётся в хранилище до --gc
+        if not await run_in_threadpool(_set_path, model, id_value, values_for(stored.path)):
+            raise HTTPException(status_code=404, detail="Не найдено")
+    finally:
+        await run_in_threadpool(lease.unlink, True)
+    return stored
+
+
+def _download(request: Request, path: str | None, filename: str) -> Response:
+    if not path or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Подписанный документ не загружен")
+    stem = Path(path).stem
+    # в хранилище имя файла — sha256 содержимого; старые пути — ETag от stat() (FileResponse)
+    etag = f'"{stem}"' if Path(path).is_relative_to(SIGNED_DIR) and len(stem) == 64 else None
+    headers = {"Cache-Control": "no-cache"}
+    if etag:
+        headers["ETag"] = etag
+        if refcache.etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="application/pdf", filename=filename, headers=headers)
+
+
+# ================= Эндпоинты =================
+@router.put("/deals/{id_deal}/signed", response_model=SignedUploadOut)
+async def upload_deal_signed(id_deal: str, request: Request):
+    return await _upload(request, Deal, id_deal, lambda path: {"path_sign_deal": path})
+
+
+@router.put("/attachments/{id_attachment}/signed", response_model=SignedUploadOut)
+async def upload_attachment_signed(id_attachment: str, request: Request):
+    return await _upload(request, Attachment, id_attachment, lambda path: {
+        "path_sign_attachment": path, "status_sign_attachment": True})
+
+
+@router.api_route("/deals/{id_deal}/signed", methods=["GET", "HEAD"])
+async def download_deal_signed(id_deal: str, request: Request):
+    path = await run_in_threadpool(_get_path, Deal.path_sign_deal, Deal.id_deal, id_deal)
+    return _download(request, path, f"{id_deal}.pdf")
+
+
+@router.api_route("/attachments/{id_attachment}/signed", methods=["GET", "HEAD"])
+async def download_attachment_signed(id_attachment: str, request: Request):
+    path = await run_in_threadpool(
+        _get_path, Attachment.path_sign_attachment, Attachment.id_attachment, id_attachment)
+    return _download(request, path, f"{id_attachment}.pdf")
+
+
+# ================= Сборка мусора =================
+def collect_garbage(dry_run: bool = False) -> dict:
+    """Удаляет из хранилища файлы, на которые не ссылается ни один path_sign_* и которые не в аренде."""
+    db = ReadSessionLocal()
+    try:
+        referenced = {os.path.normpath(p) for p in db.scalars(
+            select(Deal.path_sign_deal).where(Deal.path_sign_deal.is_not(None))
+            .union(select(Attachment.path_sign_attachment).where(Attachment.path_sign_attachment.is_not(None)))
+        )}
+    finally:
+        db.close()
+    removed = kept = 0
+    cutoff = time.time() - GC_MIN_AGE_S
+    for blob in SIGNED_DIR.glob("*/*/*.pdf"):
+        # аренда проверяется последней, прямо перед удалением: загрузка берёт её до дедупликации
+        if os.path.normpath(blob) in referenced or blob.stat().st_mtime > cutoff or _leased(blob.stem):
+            kept += 1
+            continue
+        removed += 1
+        if not dry_run:
+            blob.unlink(missing_ok=True)
+    # аренды упавших загрузок
+    for lease in (SIGNED_DIR / "tmp").glob("*.lease"):
+        if lease.stat().st_mtime <= cutoff and not dry_run:
+            lease.unlink(missing_ok=True)
+    return {"kept": kept, "removed": removed, "dry_run": dry_run}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Хранилище подписанных PDF")
+    parser.add_argument("--gc", action="store_true", help="удалить файлы без ссылок из БД")
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать")
+    args = parser.parse_args()
+    if args.gc:
+        print(collect_garbage(dry_run=args.dry_run))
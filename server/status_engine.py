@@ -0,0 +1,383 @@
+"""
+Пересчёт вычисляемых статусов (см. комментарии в models.py):
+
+- Attachment.status_attachment      — услуга активна: сегодня <= date_end_attachment;
+- Attachment.status_sign_attachment — по path_sign_attachment реально лежит файл;
+- Deal.status_deal                  — у договора есть хотя бы одно активное приложение.
+
+Трогаем только строки, чьё состояние могло измениться:
+- истечение — диапазоны индекса (status_attachment, date_end_attachment): активные с
+  датой окончания в прошлом и неактивные с датой в будущем, то есть только строки с
+  устаревшим флагом, включая исправленные задним числом даты (sweep_state хранит лишь
+  дату последнего прохода);
+- подписи — stat() всех путей пачками на читающем соединении, UPDATE только по путям,
+  у которых изменились mtime/size/наличие относительно file_stats, плюс сверка флагов
+  строк с file_stats одним запросом;
+- договоры — только те, у чьих приложений в этом проходе поменялся status_attachment;
+  удаление активного приложения (или перенос в другой договор) пересчитывает status_deal
+  триггером БД — иначе договор остался бы активным до прохода full.
+
+Все изменения — set-based UPDATE (core), без загрузки ORM-объектов.
+full=True игнорирует file_stats и сверяет status_deal всех договоров (ремонт после ручных правок БД).
+
+Запуск: фоновой задачей приложения (CRM_STATUS_INTERVAL, сек; 0 — выключено) — при
+нескольких воркерах uvicorn пересчёт идёт только в одном (_Leader), или разово:
+python status_engine.py [--full] [--today ГГГГ-ММ-ДД]
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from pydantic import BaseModel
+from sqlalchemy import and_, delete, event, exists, func, insert, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from db import SessionLocal, engine
+from models import Attachment, Base, Deal, FileStat, SweepState
+
+try:
+    import fcntl
+except ImportError:  # Windows: flock нет, фоновая задача идёт в каждом воркере
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+attachments = Attachment.__table__
+deals = Deal.__table__
+file_stats = FileStat.__table__
+
+EXPIRY_WATERMARK = "attachments_expiry"
+CHUNK = 1000
+STAT_WORKERS = 16
+LEADER_LOCK_KEY = 0x43524D01  # advisory-лок PostgreSQL (migrations.LOCK_KEY + 1)
+
+
+class PassStats(BaseModel):
+    examined: int = 0
+    changed: int = 0
+
+
+class RecomputeReport(BaseModel):
+    today: date
+    full: bool
+    attachments_expiry: PassStats
+    attachments_sign: PassStats
+    deals: PassStats
+    elapsed_ms: float
+
+
+def _chunks(items: list, size: int = CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ---------------- status_attachment ----------------
+def _sweep_expiry(db: Session, today: date, touched_deals: set[str]) -> PassStats:
+    # оба условия — диапазоны индекса (status_attachment, date_end_attachment), и в них
+    # попадают ровно строки с устаревшим флагом: истёкшие с прошлого прохода, а также
+    # приложения, дату которых сдвинули задним числом или вперёд
+    expired = db.execute(
+        update(attachments)
+        .where(attachments.c.status_attachment.is_(True), attachments.c.date_end_attachment < today)
+        .values(status_attachment=False)
+        .returning(attachments.c.id_attachment_deal)
+    ).scalars().all()
+    activated = db.execute(
+        update(attachments)
+        .where(attachments.c.status_attachment.is_(False), attachments.c.date_end_attachment >= today)
+        .values(status_attachment=True)
+        .returning(attachments.c.id_attachment_deal)
+    ).scalars().all()
+    touched_deals.update(expired)
+    touched_deals.update(activated)
+
+    state = db.get(SweepState, EXPIRY_WATERMARK)
+    if state is None:
+        db.add(SweepState(name=EXPIRY_WATERMARK, swept_till=today))
+    else:
+        state.swept_till = today
+    db.commit()
+    changed = len(expired) + len(activated)
+    return PassStats(examined=changed, changed=changed)
+
+
+# ---------------- status_sign_attachment ----------------
+def _stat(path: str) -> tuple[str, int | None, int | None]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return path, None, None
+    if not stat.S_ISREG(st.st_mode) or st.st_size == 0:
+        return path, None, None
+    return path, st.st_mtime_ns, st.st_size
+
+
+def _sweep_signatures(db: Session, full: bool, touched_deals: set[str]) -> PassStats:
+    stats = PassStats()
+    path_col = attachments.c.path_sign_attachment
+
+    # путь очищен, а флаг остался
+    cleared = db.execute(
+        update(attachments)
+        .where(path_col.is_(None), attachments.c.status_sign_attachment.is_(True))
+        .values(status_sign_attachment=False)
+        .returning(attachments.c.id_attachment)
+    ).scalars().all()
+    db.commit()
+    stats.changed += len(cleared)
+
+    # выборки и stat() — на читающем соединении (обычный BEGIN): в обычном проходе без
+    # изменений лок писателя SQLite не берётся вовсе; пишем короткой транзакцией по пачке
+    read = db.get_bind().execution_options(sqlite_begin="DEFERRED").connect()
+    last = None
+    try:
+        with ThreadPoolExecutor(max_workers=STAT_WORKERS) as pool:
+            while True:
+                # keyset по различным путям (индекс ix_attachments_path_sign)
+                q = select(path_col).where(path_col.is_not(None)).distinct().order_by(path_col).limit(CHUNK)
+                if last is not None:
+                    q = q.where(path_col > last)
+                paths = read.scalars(q).all()
+                if not paths:
+                    break
+                last = paths[-1]
+                stats.examined += len(paths)
+
+                seen = {} if full else {
+                    row.path: (row.mtime_ns, row.size)
+                    for row in read.execute(select(file_stats).where(file_stats.c.path.in_(paths)))
+                }
+                read.commit()  # не держим снимок, пока идут stat()
+                changed = [
+                    (path, mtime, size)
+                    for path, mtime, size in pool.map(_stat, paths)
+                    if path not in seen or seen[path] != (mtime, size)
+                ]
+                if not changed:
+                    continue
+
+                changed_paths = [c[0] for c in changed]
+                db.execute(delete(file_stats).where(file_stats.c.path.in_(changed_paths)))
+                db.execute(insert(file_stats), [{"path": p, "mtime_ns": m, "size": s} for p, m, s in changed])
+                for present in (True, False):
+                    group = [p for p, m, _ in changed if (m is not None) == present]
+                    if not group:
+                        continue
+                    touched = db.execute(
+                        update(attachments)
+                        .where(path_col.in_(group), attachments.c.status_sign_attachment.is_not(present))
+                        .values(status_sign_attachment=present)
+                        .returning(attachments.c.id_attachment)
+                    ).scalars().all()
+                    stats.changed += len(touched)
+                db.commit()
+
+        # file_stats ведётся по путям: строка, флаг которой разошёлся с уже известным
+        # (неизменным) файлом — путь поставлен в обход _upload, флаг правили руками, — выше
+        # не попадёт. Сверяем флаги с file_stats одним запросом.
+        present = (
+            select(file_stats.c.mtime_ns.is_not(None))
+            .where(file_stats.c.path == path_col)
+            .scalar_subquery()
+        )
+        drifted = and_(
+            path_col.is_not(None),
+            exists().where(file_stats.c.path == path_col),
+            attachments.c.status_sign_attachment.is_distinct_from(present),
+        )
+        has_drift = read.scalar(select(exists().where(drifted)))
+        read.commit()
+    finally:
+        read.close()
+    if has_drift:
+        stats.changed += db.execute(
+            update(attachments).where(drifted).values(status_sign_attachment=present)
+        ).rowcount
+        db.commit()
+
+    if full:
+        db.execute(delete(file_stats).where(~exists().where(path_col == file_stats.c.path)))
+        db.commit()
+    return stats
+
+
+# ---------------- status_deal ----------------
+def _has_active(deal_ids: list[str] | None = None):
+    # некоррелированный IN: активные приложения выбираются один раз на запрос (по FK-индексу
+    # для пачки договоров); коррелированный EXISTS SQLite вёл по ix_attachments_status_date_end
+    # и для каждого договора перебирал все активные приложения
+    active = select(attachments.c.id_attachment_deal).where(attachments.c.status_attachment.is_(True))
+    if deal_ids is not None:
+        active = active.where(attachments.c.id_attachment_deal.in_(deal_ids))
+    return deals.c.id_deal.in_(active)
+
+
+def _sweep_deals(db: Session, full: bool, touched_deals: set[str]) -> PassStats:
+    if full:
+        has_active = _has_active()
+        examined = db.scalar(select(func.count()).select_from(deals))
+        changed = db.execute(
+            update(deals).where(deals.c.status_deal != has_active).values(status_deal=has_active)
+        ).rowcount
+        db.commit()
+        return PassStats(examined=examined, changed=changed)
+
+    stats = PassStats(examined=len(touched_deals))
+    for chunk in _chunks(sorted(touched_deals)):
+        has_active = _has_active(chunk)
+        stats.changed += db.execute(
+            update(deals)
+            .where(deals.c.id_deal.in_(chunk), deals.c.status_deal != has_active)
+            .values(status_deal=has_active)
+        ).rowcount
+    db.commit()
+    return stats
+
+
+def _deal_status(r: str) -> str:
+    """status_deal договора приложения r (NEW/OLD) по его оставшимся приложениям."""
+    return (
+        f"UPDATE deals SET status_deal = EXISTS (SELECT 1 FROM attachments a "
+        f"WHERE a.id_attachment_deal = {r}.id_attachment_deal AND a.status_attachment) "
+        f"WHERE id_deal = {r}.id_attachment_deal"
+    )
+
+
+def _sqlite_ddl() -> list[str]:
+    return [
+        "CREATE TRIGGER IF NOT EXISTS deal_status_attachments_ad AFTER DELETE ON attachments "
+        f"WHEN OLD.status_attachment BEGIN {_deal_status('OLD')}; END",
+        "CREATE TRIGGER IF NOT EXISTS deal_status_attachments_au AFTER UPDATE OF id_attachment_deal ON attachments "
+        f"WHEN OLD.status_attachment BEGIN {_deal_status('OLD')}; {_deal_status('NEW')}; END",
+    ]
+
+
+def _pg_ddl() -> list[str]:
+    return [
+        f"""CREATE OR REPLACE FUNCTION deal_status_attachments_trg() RETURNS trigger AS $$
+BEGIN
+    {_deal_status('OLD')};
+    IF TG_OP = 'UPDATE' THEN {_deal_status('NEW')}; END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql""",
+        "DROP TRIGGER IF EXISTS deal_status_attachments_aud ON attachments",
+        "CREATE TRIGGER deal_status_attachments_aud AFTER DELETE OR UPDATE OF id_attachment_deal ON attachments "
+        "FOR EACH ROW WHEN (OLD.status_attachment) EXECUTE FUNCTION deal_status_attachments_trg()",
+    ]
+
+
+def ddl(dialect: str) -> list[str]:
+    """DDL для диалекта (пусто — диалект не поддерживается); входит в отпечаток схемы (migrations.py)."""
+    return {"sqlite": _sqlite_ddl, "postgresql": _pg_ddl}.get(dialect, list)()
+
+
+def install(conn: Connection) -> None:
+    for stmt in ddl(conn.dialect.name):
+        conn.exec_driver_sql(stmt)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, conn: Connection, **kw) -> None:
+    install(conn)
+
+
+def recompute(db: Session, today: date | None = None, full: bool = False) -> RecomputeReport:
+    started = time.perf_counter()
+    today = today or date.today()
+    touched_deals: set[str] = set()
+    expiry = _sweep_expiry(db, today, touched_deals)
+    sign = _sweep_signatures(db, full, touched_deals)
+    deal_stats = _sweep_deals(db, full, touched_deals)
+    return RecomputeReport(
+        today=today, full=full,
+        attachments_expiry=expiry, attachments_sign=sign, deals=deal_stats,
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+    )
+
+
+def recompute_once(today: date | None = None, full: bool = False) -> RecomputeReport:
+    db = SessionLocal()
+    try:
+        return recompute(db, today=today, full=full)
+    finally:
+        db.close()
+
+
+class _Leader:
+    """
+    Пересчёт — в одном воркере из всех: PostgreSQL — сессионный advisory-лок на отдельном
+    соединении, SQLite — flock файла рядом с БД. Лок держится до конца процесса (или
+    release); остальные воркеры пробуют взять его каждый интервал и подхватывают
+    пересчёт, если лидер завершился.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._conn: Connection | None = None
+        self._file = None
+
+    def acquire(self) -> bool:
+        if self._conn is not None or self._file is not None:
+            return True
+        backend = self.engine.dialect.name
+        if backend == "postgresql":
+            conn = self.engine.connect()
+            if conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": LEADER_LOCK_KEY}):
+                conn.commit()
+                self._conn = conn
+                return True
+            conn.close()
+            return False
+        database = self.engine.url.database
+        if backend != "sqlite" or fcntl is None or not database or database == ":memory:":
+            return True  # без межпроцессного лока: считаем, что воркер один
+        f = open(f"{os.path.abspath(database)}.status-lock", "a+b")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self) -> None:
+        if self._conn is not None:
+            self._conn.close()  # advisory-лок сессии снимается вместе с ней
+            self._conn = None
+        if self._file is not None:
+            self._file.close()  # закрытие снимает flock
+            self._file = None
+
+
+async def run_periodically(interval: float) -> None:
+    """Фоновая задача приложения: пересчёт каждые interval секунд (в одном воркере)."""
+    leader = _Leader(engine)
+    try:
+        while True:
+            try:
+                if await run_in_threadpool(leader.acquire):
+                    report = await run_in_threadpool(recompute_once)
+                    log.info("status recompute: %s", report.model_dump_json())
+            except Exception:
+                log.exception("status recompute failed")
+            await asyncio.sleep(interval)
+    finally:
+        leader.release()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Пересчёт статусов приложений и договоров")
+    parser.add_argument("--full", action="store_true", help="игнорировать кэш stat() и сверить все договоры")
+    parser.add_argument("--today", type=date.fromisoformat, default=None, help="ГГГГ-ММ-ДД (по умолчанию сегодня)")
+    args = parser.parse_args()
+    print(recompute_once(today=args.today, full=args.full).model_dump_json(indent=2))
@@ -0,0 +1,18 @@
+"""
+Корни файлового хранилища: сгенерированные документы (documents.py) и подписанные PDF
+(signed_docs.py).
+
+- CRM_DOCS_DIR — по умолчанию ./documents;
+- CRM_SIGNED_DIR — по умолчанию <CRM_DOCS_DIR>/signed.
+
+Каталоги приводятся к абсолютным при импорте: пути в path_doc_* / path_pdf_* / path_sign_*
+пишутся от них, а относительный путь читатель разрешил бы от своего текущего каталога
+(python status_engine.py, запущенный из другого места, счёл бы все файлы пропавшими).
+"""
+
+from __future__ import annotations
+import os
+from pathlib import Path
+
+DOCS_DIR = Path(os.getenv("CRM_DOCS_DIR", "documents")).resolve()
+SIGNED_DIR = Path(os.getenv("CRM_SIGNED_DIR", str(DOCS_DIR / "signed"))).resolve()
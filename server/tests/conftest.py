@@ -0,0 +1,88 @@
+"""
+Общие фикстуры тестов: временная SQLite вместо crm.db, схема — через migrations.
+
+Переменные окружения ставятся до импорта db/app (движок создаётся при импорте).
+Запуск из server/: python -m pytest -q
+"""
+
+from __future__ import annotations
+import itertools
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVER_DIR))
+
+_TMP = Path(tempfile.mkdtemp(prefix="crm-tests-"))
+os.environ["CRM_DATABASE_URL"] = f"sqlite:///{_TMP / 'test.db'}"
+os.environ["CRM_DOCS_DIR"] = str(_TMP / "docs")
+os.environ["CRM_STATUS_INTERVAL"] = "0"
+
+
+@pytest.fixture(scope="session")
+def engine():
+    from db import engine
+    import migrations
+
+    migrations.ensure_schema(engine)
+    return engine
+
+
+@pytest.fixture(scope="session")
+def client(engine):
+    from fastapi.testclient import TestClient
+
+    from app import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+CLIENT_REQUISITES = dict(
+    inn_client="7701234567", ogrn_client="1027700000001", kpp_client="770101001",
+    adress_client="г. Москва", bank_client="Банк", cor_bank_client="30101810400000000225",
+    acc_bank_client="40702810900000000001", bik_bank_client="044525225",
+    contact_name_client="Иван Петров", mail_client="ivan@example.com", tel_client="+79001234567",
+    mess_client="Telegram",
+)
+
+
+@pytest.fixture(scope="session")
+def make_client(engine):
+    """Новый клиент на каждый вызов: договоры теста отбираются по id_client_deal."""
+    from db import SessionLocal
+    from models import Client
+
+    names = itertools.count(1)
+
+    def make(name: str | None = None) -> str:
+        db = SessionLocal()
+        try:
+            client = Client(type_client=1, name_client=name or f"Клиент {next(names)}", **CLIENT_REQUISITES)
+            db.add(client)
+            db.commit()
+            return client.id_client
+        finally:
+            db.close()
+
+    return make
+
+
+@pytest.fixture(scope="session")
+def service_id(engine) -> str:
+    """Услуга по шаблону sample_contract1 (исполнитель executor1 и шаблон — из сидов миграций)."""
+    from db import SessionLocal
+    from models import Service
+
+    db = SessionLocal()
+    try:
+        service = Service(name_service="Перевозка", id_contract_service="sample_contract1")
+        db.add(service)
+        db.commit()
+        return service.id_service
+    finally:
+        db.close()
@@ -0,0 +1,111 @@
+"""Массовый импорт клиентов: CSV/NDJSON, отчёт по строкам, слишком длинные строки; список со старыми строками."""
+
+from __future__ import annotations
+import csv
+import io
+import json
+import sqlite3
+
+from conftest import CLIENT_REQUISITES
+
+FIELDS = ["type_client", "name_client", *CLIENT_REQUISITES]
+
+
+def _row(name: str, **overrides) -> dict:
+    return {"type_client": 1, "name_client": name, **CLIENT_REQUISITES, **overrides}
+
+
+def _csv(rows: list[dict]) -> bytes:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=FIELDS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue().encode()
+
+
+def _names(client, prefix: str) -> set[str]:
+    items = client.get("/api/clients", params={"limit": 500}).json()["items"]
+    return {c["name_client"] for c in items if c["name_client"].startswith(prefix)}
+
+
+def test_csv_import_reports_bad_rows(client):
+    body = _csv([
+        _row("csv-1"),
+        _row("csv-2", inn_client="12ab"),
+        _row("csv-3\nс переводом строки"),
+        _row("csv-4", type_client=9),
+    ])
+    resp = client.post("/api/clients/bulk", content=body, headers={"content-type": "text/csv"},
+                       params={"batch_size": 1})
+    assert resp.status_code == 200, resp.text
+    report = resp.json()
+    assert (report["total"], report["inserted"], report["failed"]) == (4, 2, 2)
+    assert [e["row"] for e in report["errors"]] == [2, 4]
+    assert report["errors"][0]["errors"][0].startswith("inn_client")
+    assert _names(client, "csv-") == {"csv-1", "csv-3\nс переводом строки"}
+
+
+def test_csv_missing_columns(client):
+    resp = client.post("/api/clients/bulk", content=b"name_client\nx\n", params={"format": "csv"})
+    assert resp.status_code == 400
+
+
+def test_ndjson_overlong_line_is_rejected(client):
+    import bulk_import
+
+    huge = json.dumps(_row("nd-huge", adress_client="x" * (bulk_import.MAX_LINE + 10)))
+    lines = [json.dumps(_row("nd-1")), huge, "не json", "[1]", json.dumps(_row("nd-2"))]
+    # без перевода строки в конце: хвост тоже проверяется
+    resp = client.post("/api/clients/bulk", content="\n".join(lines).encode(),
+                       headers={"content-type": "application/x-ndjson"})
+    assert resp.status_code == 200, resp.text
+    report = resp.json()
+    assert (report["total"], report["inserted"], report["failed"]) == (5, 2, 3)
+    assert report["errors"][0] == {"row": 2, "errors": [bulk_import.TOO_LONG]}
+    assert _names(client, "nd-") == {"nd-1", "nd-2"}
+
+
+async def _collect(chunks: list[bytes]) -> list[str | None]:
+    import bulk_import
+
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    return [line async for line in bulk_import._lines(stream())]
+
+
+def test_lines_drop_overlong_line_without_buffering_it():
+    import asyncio
+
+    import bulk_import
+
+    block = b"x" * (bulk_import.MAX_LINE // 2)
+    chunks = [b"a\n", *[block] * 5, b"yy\nb\r\n", *[block] * 3]
+    assert asyncio.run(_collect(chunks)) == ["a", None, "b", None]
+
+
+def test_csv_unclosed_quote_is_one_error(client):
+    import bulk_import
+
+    body = _csv([_row("q-1")]) + b'1,"q-2\n' + b"x\n" * (bulk_import.MAX_LINE // 2 + 1)
+    resp = client.post("/api/clients/bulk", content=body, params={"format": "csv"})
+    report = resp.json()
+    assert (report["total"], report["inserted"]) == (2, 1)
+    assert report["errors"] == [{"row": 2, "errors": [bulk_import.TOO_LONG]}]
+
+
+def test_list_clients_returns_legacy_rows(client, engine):
+    # строка из старой базы: ИНН с пробелами ClientIn не пропустил бы
+    conn = sqlite3.connect(engine.url.database)
+    try:
+        conn.execute("PRAGMA ignore_check_constraints = ON")
+        values = _row("legacy-1", inn_client="77 01 234567")
+        conn.execute(f"INSERT INTO clients (id_client, {', '.join(values)}) VALUES (?{', ?' * len(values)})",
+                     ["client_legacy1", *values.values()])
+        conn.commit()
+    finally:
+        conn.close()
+    resp = client.get("/api/clients", params={"limit": 500})
+    assert resp.status_code == 200
+    assert any(c["inn_client"] == "77 01 234567" for c in resp.json()["items"])
@@ -0,0 +1,106 @@
+"""Сводка дашборда: приращения триггеров совпадают с rebuild() — вставка, правка, перенос даты, каскадное удаление."""
+
+from __future__ import annotations
+import random
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import delete, insert, update
+
+# месяцы, в которые другие тесты договоров не пишут
+JAN, FEB = date(1999, 1, 15), date(1999, 2, 15)
+# крупные цены: в REAL-сумме приращений терялись бы копейки
+PRICES = [Decimal("0.10"), Decimal("0.20"), Decimal("999999999999.99"), Decimal("1234.56"), None,
+          Decimal("123456789012.37")]
+TOTAL = sum(p for p in PRICES if p is not None)
+
+
+def _summary(conn) -> dict[tuple[str, str], tuple]:
+    rows = conn.exec_driver_sql(
+        "SELECT id_executor, month, deals, deals_waiting_orig, attachments_active, attachments_expired, price_total_minor "
+        "FROM dashboard_monthly WHERE deals != 0 OR attachments_active != 0 OR attachments_expired != 0"
+    )
+    return {(r[0], r[1]): tuple(r[2:]) for r in rows}
+
+
+def _assert_matches_rebuild(engine) -> dict[tuple[str, str], tuple]:
+    """Сводка из триггеров побитово равна пересчёту с нуля (пересчёт откатывается)."""
+    import dashboard
+
+    with engine.connect() as conn:
+        with conn.begin() as trans:
+            incremental = _summary(conn)
+            dashboard.rebuild(conn)
+            assert _summary(conn) == incremental
+            trans.rollback()
+    return incremental
+
+
+@pytest.fixture
+def deal(engine, make_client, service_id):
+    from models import Attachment, Deal
+
+    id_client = make_client()
+    with engine.begin() as conn:
+        id_deal = conn.execute(insert(Deal).values(
+            id_client_deal=id_client, id_executor_deal="executor1", number_deal="1", date_deal=JAN,
+            path_doc_deal="d.doc", path_pdf_deal="d.pdf", status_orig_deal=False,
+        ).returning(Deal.id_deal)).scalar_one()
+        conn.execute(insert(Attachment), [
+            dict(id_attachment_deal=id_deal, id_service_attachment=service_id, date_start_attachment=FEB,
+                 date_end_attachment=FEB, place_attachment="Москва", price_attachment=price,
+                 path_doc_attachment="a.doc", path_pdf_attachment="a.pdf", status_attachment=i % 2 == 0)
+            for i, price in enumerate(PRICES)
+        ])
+    yield id_deal
+    with engine.begin() as conn:
+        conn.execute(delete(Deal).where(Deal.id_deal == id_deal))
+
+
+def _bucket(summary, month: str) -> tuple:
+    return summary.get(("executor1", month), (0, 0, 0, 0, 0))
+
+
+def test_insert_counts_deal_and_attachments(engine, client, deal):
+    summary = _assert_matches_rebuild(engine)
+    assert _bucket(summary, "1999-01") == (1, 1, 3, 3, TOTAL * 100)
+    rows = client.get("/api/dashboard", params={"id_executor": "executor1", "month_to": "1999-01"}).json()
+    assert [(r["month"], Decimal(r["price_total"])) for r in rows] == [("1999-01", TOTAL)]
+
+
+def test_price_and_status_updates_do_not_drift(engine, deal):
+    from models import Attachment, Deal
+
+    with engine.begin() as conn:
+        ids = conn.execute(Attachment.__table__.select().with_only_columns(Attachment.id_attachment)
+                           .where(Attachment.id_attachment_deal == deal)).scalars().all()
+    rnd = random.Random(1)
+    for step in range(200):
+        with engine.begin() as conn:
+            conn.execute(update(Attachment).where(Attachment.id_attachment == ids[step % len(ids)])
+                         .values(price_attachment=Decimal(rnd.randint(0, 10**13)) / 100, status_attachment=step % 3 == 0))
+    with engine.begin() as conn:
+        conn.execute(update(Deal).where(Deal.id_deal == deal).values(status_orig_deal=True))
+    summary = _assert_matches_rebuild(engine)
+    assert _bucket(summary, "1999-01")[1] == 0
+
+
+def test_moving_deal_date_moves_its_attachments(engine, deal):
+    from models import Deal
+
+    before = _bucket(_assert_matches_rebuild(engine), "1999-01")
+    with engine.begin() as conn:
+        conn.execute(update(Deal).where(Deal.id_deal == deal).values(date_deal=FEB))
+    summary = _assert_matches_rebuild(engine)
+    assert _bucket(summary, "1999-01")[:4] == (0, 0, 0, 0)
+    assert _bucket(summary, "1999-02") == before
+
+
+def test_deleting_deal_removes_cascaded_attachments(engine, deal):
+    from models import Deal
+
+    with engine.begin() as conn:
+        conn.execute(delete(Deal).where(Deal.id_deal == deal))
+    summary = _assert_matches_rebuild(engine)
+    assert _bucket(summary, "1999-01")[:4] == (0, 0, 0, 0)
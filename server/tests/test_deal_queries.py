@@ -0,0 +1,57 @@
+"""Число SQL-запросов на карточку договора: граф грузится selectinload, без N+1."""
+
+from __future__ import annotations
+from datetime import date
+
+import pytest
+
+from querycount import assert_max_queries
+
+ATTACHMENTS_PER_DEAL = 5
+DEALS = 3
+
+
+@pytest.fixture(scope="module")
+def client_id(make_client):
+    return make_client()
+
+
+@pytest.fixture(scope="module")
+def deal_ids(client_id, service_id):
+    from db import SessionLocal
+    from models import Attachment, Deal
+
+    db = SessionLocal()
+    try:
+        deals = []
+        for n in range(DEALS):
+            deal = Deal(id_client_deal=client_id, id_executor_deal="executor1", number_deal=str(100 + n),
+                        date_deal=date(2024, 1, 1 + n), path_doc_deal="d.doc", path_pdf_deal="d.pdf")
+            deal.attachments = [
+                Attachment(id_service_attachment=service_id, date_start_attachment=date(2024, 1, 1),
+                           date_end_attachment=date(2024, 2, i + 1), place_attachment="Москва",
+                           path_doc_attachment="a.doc", path_pdf_attachment="a.pdf")
+                for i in range(ATTACHMENTS_PER_DEAL)
+            ]
+            deals.append(deal)
+        db.add_all(deals)
+        db.commit()
+        return [deal.id_deal for deal in deals]
+    finally:
+        db.close()
+
+
+def test_get_deal_is_two_queries(client, engine, deal_ids):
+    with assert_max_queries(engine, 2):
+        r = client.get(f"/api/deals/{deal_ids[0]}")
+    assert r.status_code == 200
+    assert len(r.json()["attachments"]) == ATTACHMENTS_PER_DEAL
+
+
+def test_deals_detailed_is_two_queries(client, engine, client_id, deal_ids):
+    with assert_max_queries(engine, 2):
+        r = client.get("/api/deals/detailed", params={"id_client_deal": client_id})
+    assert r.status_code == 200
+    items = r.json()["items"]
+    assert len(items) == DEALS
+    assert all(len(item["attachments"]) == ATTACHMENTS_PER_DEAL for item in items)
@@ -0,0 +1,48 @@
+"""Генерация документов: пути не выходят за DOCS_DIR, пул на spawn, запись путей после остановки."""
+
+from __future__ import annotations
+from concurrent.futures import Future
+
+import pytest
+
+
+def test_doc_path_stays_under_docs_dir():
+    from fastapi import HTTPException
+
+    import documents
+    from storage import DOCS_DIR
+
+    assert documents._doc_path("deal01", "attachment01.pdf") == str(DOCS_DIR / "deal01" / "attachment01.pdf")
+    for id_deal, name in [("deal/../..", "x.doc"), ("deal/sub", "x.doc"), ("deal01", "../x.doc"),
+                          ("deal01", "attachment/../../x.doc"), ("deal01/..", "x.doc")]:
+        with pytest.raises(HTTPException) as exc:
+            documents._doc_path(id_deal, name)
+        assert exc.value.status_code == 422
+
+
+def test_pool_renders_in_spawned_process(tmp_path):
+    import documents
+
+    template = tmp_path / "t.txt"
+    template.write_text("Договор {{number_deal}}", encoding="utf-8")
+    doc, pdf = tmp_path / "out" / "d.doc", tmp_path / "out" / "d.pdf"
+    pool = documents.get_pool()
+    assert pool._mp_context.get_start_method() == "spawn"
+    fut = pool.submit(documents.render_document, str(template), {"number_deal": "42"}, str(doc), str(pdf))
+    fut.exception(timeout=60)  # .pdf без LibreOffice не получится, .doc пишется до конвертации
+    assert doc.read_text(encoding="utf-8") == "Договор 42"
+
+
+def test_no_write_back_after_shutdown():
+    import documents
+    import jobs
+    from models import Deal
+
+    task = documents.RenderTask(Deal, "deal_missing", "t.doc", {}, "d.doc", "d.pdf")
+    job = jobs.create("deal_documents", 1)
+    fut: Future = Future()
+    fut.set_result(None)
+    documents.shutdown_pool()
+    documents._on_done(job, task, fut)
+    assert documents._writer is None
+    assert job.out().failed == 1
@@ -0,0 +1,122 @@
+"""Лента изменений: один писатель на 1000 подписчиков — очереди ограничены, память не растёт с числом коммитов."""
+
+from __future__ import annotations
+import asyncio
+import tracemalloc
+from typing import NamedTuple
+
+import pytest
+
+SUBSCRIBERS = 1000
+SLOW = 20
+SLOW_DELAY = 0.5
+COMMITS = 200
+MAX_PENDING = 8  # меньше умолчания, чтобы медленные подписчики доходили до reset
+MEMORY_GROWTH_LIMIT = 2.0  # пик на COMMITS / пик на COMMITS // 4 — как в bench.events_fanout
+
+
+class Run(NamedTuple):
+    max_pending: int
+    stale_subscribers: int
+    resets: int
+    peak: int
+
+
+def _writer(make_client, commits: int) -> None:
+    """Коммиты через SessionLocal: новые клиенты и повторные изменения «горячих» строк."""
+    from db import SessionLocal
+    from models import Client
+
+    ids: list[str] = []
+    db = SessionLocal()
+    try:
+        for n in range(commits):
+            if ids and n % 3:
+                db.get(Client, ids[-1 - n % 8 % len(ids)]).adress_client = f"д. {n}"
+                db.commit()
+            else:
+                ids.append(make_client())
+    finally:
+        db.close()
+
+
+async def _fanout(make_client, commits: int) -> Run:
+    import events
+
+    hub = events.hub
+    subs = [hub.subscribe() for _ in range(SUBSCRIBERS)]
+    last_seq = [sub.since for sub in subs]
+    resets = 0
+    max_pending = 0
+    done = asyncio.Event()
+
+    async def consume(i: int) -> None:
+        nonlocal resets
+        sub = subs[i]
+        while True:
+            reset, batch = await hub.next_batch(sub, 0.1)
+            if reset:
+                resets += 1
+                last_seq[i] = sub.since
+            if batch:
+                last_seq[i] = max(last_seq[i], batch[-1].seq)
+            if done.is_set() and not (sub.pending or sub.reset):
+                return
+            if i < SLOW:
+                await asyncio.sleep(SLOW_DELAY)
+
+    async def watch() -> None:
+        nonlocal max_pending
+        while not done.is_set():
+            max_pending = max(max_pending, max(len(sub.pending) for sub in subs))
+            await asyncio.sleep(0.01)
+
+    tracemalloc.start()
+    try:
+        tasks = [asyncio.create_task(consume(i)) for i in range(SUBSCRIBERS)]
+        watcher = asyncio.create_task(watch())
+        await asyncio.to_thread(_writer, make_client, commits)
+        done.set()
+        await watcher
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=60)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        for sub in subs:
+            hub.unsubscribe(sub)
+    final = hub._seq
+    return Run(max_pending, sum(seq < final for seq in last_seq), resets, peak)
+
+
+def test_fanout_to_1000_subscribers_is_bounded(make_client, monkeypatch):
+    import events
+
+    monkeypatch.setattr(events, "MAX_PENDING", MAX_PENDING)
+    small = asyncio.run(_fanout(make_client, COMMITS // 4))
+    full = asyncio.run(_fanout(make_client, COMMITS))
+    assert full.max_pending <= MAX_PENDING
+    assert full.resets > 0
+    assert small.stale_subscribers == full.stale_subscribers == 0
+    assert full.peak <= small.peak * MEMORY_GROWTH_LIMIT
+
+
+def test_reset_event_moves_last_event_id_to_head():
+    import events
+
+    async def first_events() -> list[str]:
+        sub = events.hub.subscribe(None, "stale-1")
+        stream = events._stream(sub, resumed=True)
+        try:
+            return [await stream.__anext__(), await stream.__anext__()]
+        finally:
+            await stream.aclose()
+
+    _, reset = asyncio.run(first_events())
+    assert reset == f"id: {events.EPOCH}-{events.hub._seq}\nevent: reset\ndata: {{}}\n\n"
+    # переподключение с этим id продолжает ленту, а не получает reset снова
+    async def resume() -> bool:
+        sub = events.hub.subscribe(None, f"{events.EPOCH}-{events.hub._seq}")
+        events.hub.unsubscribe(sub)
+        return sub.reset
+
+    assert not asyncio.run(resume())
@@ -0,0 +1,76 @@
+"""Выгрузка договоров: CSV/NDJSON/XLSX, gzip, фильтры, управляющие символы в xlsx."""
+
+from __future__ import annotations
+import csv
+import gzip
+import io
+import json
+import zipfile
+from datetime import date
+from decimal import Decimal
+from xml.etree import ElementTree
+
+import pytest
+
+NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+@pytest.fixture(scope="module")
+def client_id(engine, make_client, service_id) -> str:
+    """Клиент с управляющими символами в названии: договор с двумя приложениями и договор без них."""
+    from db import SessionLocal
+    from models import Attachment, Deal
+
+    id_client = make_client("Экспорт\x01\x0b Тест\tООО")
+    db = SessionLocal()
+    try:
+        attachments = [
+            Attachment(id_service_attachment=service_id, date_start_attachment=date(2024, 3, 1),
+                       date_end_attachment=date(2024, 4, 1), place_attachment="Склад", price_attachment=price,
+                       path_doc_attachment="a.doc", path_pdf_attachment="a.pdf")
+            for price in (Decimal("1500.50"), None)
+        ]
+        for number, date_deal, deal_attachments in (("1", date(2024, 3, 1), attachments), ("2", date(2024, 5, 1), [])):
+            db.add(Deal(id_client_deal=id_client, id_executor_deal="executor1", number_deal=number,
+                        date_deal=date_deal, path_doc_deal="d.doc", path_pdf_deal="d.pdf",
+                        attachments=deal_attachments))
+        db.commit()
+    finally:
+        db.close()
+    return id_client
+
+
+def _export(client, client_id: str, **params):
+    resp = client.get("/api/export/deals", params={"id_client_deal": client_id, **params})
+    assert resp.status_code == 200, resp.text
+    return resp
+
+
+def test_csv(client, client_id):
+    import export
+
+    resp = _export(client, client_id)
+    assert resp.headers["content-disposition"] == 'attachment; filename="deals.csv"'
+    rows = list(csv.DictReader(io.StringIO(resp.content.decode("utf-8-sig"))))
+    assert list(rows[0]) == export.HEADER
+    assert [(r["number_deal"], r["price_attachment"]) for r in rows] == [("1", "1500.50"), ("1", ""), ("2", "")]
+
+
+def test_ndjson_gzip_and_date_filter(client, client_id):
+    resp = _export(client, client_id, format="ndjson", gzip="true", date_from="2024-04-01")
+    assert resp.headers["content-disposition"] == 'attachment; filename="deals.ndjson.gz"'
+    rows = [json.loads(line) for line in gzip.decompress(resp.content).decode().splitlines()]
+    assert [(r["number_deal"], r["date_deal"], r["id_attachment"]) for r in rows] == [("2", "2024-05-01", None)]
+
+
+def test_xlsx_is_valid_xml_without_control_chars(client, client_id):
+    resp = _export(client, client_id, format="xlsx")
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        assert zf.testzip() is None
+        sheet = ElementTree.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+    rows = sheet.findall("m:sheetData/m:row", NS)
+    assert len(rows) == 4  # заголовок + 3 строки
+    texts = [t.text for t in rows[1].iter(f"{{{NS['m']}}}t")]
+    assert "Экспорт Тест\tООО" in texts
+    date_cell = rows[1].findall("m:c", NS)[2]
+    assert date_cell.get("s") == "1" and date_cell.find("m:v", NS).text == str((date(2024, 3, 1) - date(1899, 12, 30)).days)
@@ -0,0 +1,49 @@
+"""Ключи ids.new_id: base32 Crockford, строгий рост в процессе, перенос переполнения."""
+
+from __future__ import annotations
+import os
+import time
+
+
+def _reference_encode(value: int) -> str:
+    import ids
+
+    chars = []
+    for _ in range(ids.ID_LEN):
+        value, r = divmod(value, 32)
+        chars.append(ids.ALPHABET[r])
+    return "".join(reversed(chars))
+
+
+def test_encode_is_crockford_base32():
+    import ids
+
+    for value in [0, (1 << 128) - 1] + [int.from_bytes(os.urandom(16), "big") for _ in range(1000)]:
+        assert ids._encode(value) == _reference_encode(value)
+
+
+def test_keys_strictly_increase():
+    import ids
+
+    keys = [ids.new_id("deal") for _ in range(10000)]
+    assert keys == sorted(set(keys))
+    assert all(len(k) == len("deal") + ids.ID_LEN for k in keys)
+
+
+def test_random_overflow_carries_into_timestamp(monkeypatch):
+    import ids
+
+    ms = time.time_ns() // 1_000_000 + 60_000  # «будущая» миллисекунда: часы её ещё не догнали
+    monkeypatch.setattr(ids, "_last", (ms << ids._RANDOM_BITS) | ((1 << ids._RANDOM_BITS) - 1))
+    first, second = ids.ulid(), ids.ulid()
+    assert first == ids._encode((ms + 1) << ids._RANDOM_BITS)
+    assert first < second
+
+
+def test_make_id_is_reproducible():
+    import ids
+
+    key = ids.make_id("client", 1_700_000_000_000, 12345)
+    assert key == ids.make_id("client", 1_700_000_000_000, 12345)
+    assert key == "client" + ids._encode((1_700_000_000_000 << ids._RANDOM_BITS) | 12345)
+    assert key < ids.make_id("client", 1_700_000_000_001, 0)
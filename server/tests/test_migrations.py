@@ -0,0 +1,55 @@
+"""Миграции: crm.db из репозитория (старая схема -> legacy_*), триггеры в отпечатке схемы."""
+
+from __future__ import annotations
+import shutil
+
+import pytest
+
+from conftest import SERVER_DIR
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    from db import make_engine
+
+    path = tmp_path / "crm.db"
+    shutil.copyfile(SERVER_DIR / "crm.db", path)
+    engine = make_engine(f"sqlite:///{path}")
+    yield engine
+    engine.dispose()
+
+
+def _scalar(engine, sql: str):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(sql).scalar()
+
+
+def test_baseline_db_migrates_and_keeps_legacy_rows(baseline):
+    import migrations
+
+    executors = _scalar(baseline, "SELECT count(*) FROM executors")
+    assert migrations.ensure_schema(baseline)
+    assert not migrations.ensure_schema(baseline)
+
+    with baseline.connect() as conn:
+        assert migrations.current_version(conn) == (len(migrations.MIGRATIONS), migrations.fingerprint(baseline))
+    assert _scalar(baseline, "SELECT count(*) FROM legacy_executors") == executors
+    assert _scalar(baseline, "SELECT count(*) FROM legacy_clients") == 0
+    # новые таблицы — по моделям, с сидами
+    assert _scalar(baseline, "SELECT id_executor FROM executors") == "executor1"
+    expected = sum(stmt.startswith("CREATE TRIGGER") for m in migrations.DDL_MODULES for stmt in m.ddl("sqlite"))
+    assert _scalar(baseline, "SELECT count(*) FROM sqlite_master WHERE type = 'trigger'") == expected
+    assert _scalar(baseline, "SELECT count(*) FROM sqlite_master WHERE name IN ('clients_fts', 'executors_fts')") == 2
+
+
+def test_trigger_change_without_migration_is_drift(baseline, monkeypatch):
+    import dashboard
+    import migrations
+
+    migrations.ensure_schema(baseline)
+    before = migrations.fingerprint(baseline)
+    ddl = dashboard._sqlite_ddl()
+    monkeypatch.setattr(dashboard, "_sqlite_ddl", lambda: ddl[:-1] + [ddl[-1].replace("AFTER DELETE", "BEFORE DELETE")])
+    assert migrations.fingerprint(baseline) != before
+    with pytest.raises(migrations.SchemaDriftError):
+        migrations.ensure_schema(baseline)
@@ -0,0 +1,110 @@
+"""Keyset-пагинация: обход страниц курсором, одинаковые значения ключа сортировки, неверные курсоры."""
+
+from __future__ import annotations
+import base64
+from datetime import date
+
+import pytest
+
+# по три договора на дату: граница страницы попадает внутрь группы одинаковых date_deal
+DATES = [date(2023, 3, 1)] * 3 + [date(2023, 3, 2)] * 3 + [date(2023, 3, 3)]
+
+
+@pytest.fixture(scope="module")
+def client_id(make_client):
+    return make_client()
+
+
+@pytest.fixture(scope="module")
+def deals(client_id, service_id) -> list[tuple[date, str]]:
+    """(date_deal, id_deal) договоров клиента; у каждого — два приложения с одной датой окончания."""
+    from db import SessionLocal
+    from models import Attachment, Deal
+
+    db = SessionLocal()
+    try:
+        rows = [
+            Deal(id_client_deal=client_id, id_executor_deal="executor1", number_deal=str(n), date_deal=d,
+                 path_doc_deal="d.doc", path_pdf_deal="d.pdf",
+                 attachments=[Attachment(id_service_attachment=service_id, date_start_attachment=d,
+                                         date_end_attachment=date(2023, 12, 31), place_attachment="Москва",
+                                         path_doc_attachment="a.doc", path_pdf_attachment="a.pdf")
+                              for _ in range(2)])
+            for n, d in enumerate(DATES)
+        ]
+        db.add_all(rows)
+        db.commit()
+        return [(deal.date_deal, deal.id_deal) for deal in rows]
+    finally:
+        db.close()
+
+
+def _walk(client, path: str, limit: int, **params) -> list[str]:
+    ids, cursor, pages = [], None, 0
+    while True:
+        resp = client.get(path, params={**params, "limit": limit, **({"cursor": cursor} if cursor else {})})
+        assert resp.status_code == 200, resp.text
+        page = resp.json()
+        assert len(page["items"]) <= limit
+        ids += [item.get("id_deal") or item.get("id_attachment") for item in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+        assert pages < 100
+
+
+@pytest.mark.parametrize("sort", ["date", "-date", "id"])
+@pytest.mark.parametrize("path", ["/api/deals", "/api/deals/detailed"])
+def test_walk_deals_with_ties(client, client_id, deals, path, sort):
+    expected = sorted(deals, reverse=sort.startswith("-")) if sort != "id" else sorted(deals, key=lambda d: d[1])
+    ids = _walk(client, path, 2, id_client_deal=client_id, sort=sort)
+    assert ids == [id_deal for _, id_deal in expected]
+
+
+def test_walk_attachments_with_equal_date_end(client, deals):
+    from sqlalchemy import select
+
+    from db import SessionLocal
+    from models import Attachment
+
+    id_deal = deals[0][1]
+    db = SessionLocal()
+    try:
+        expected = sorted(db.scalars(select(Attachment.id_attachment).where(Attachment.id_attachment_deal == id_deal)))
+    finally:
+        db.close()
+    assert _walk(client, "/api/attachments", 1, id_attachment_deal=id_deal, sort="-date_end") == expected[::-1]
+    assert _walk(client, "/api/attachments", 1, id_attachment_deal=id_deal) == expected
+
+
+def test_cursor_round_trip_restores_dates():
+    from models import Deal
+    from pagination import decode_cursor, encode_cursor
+
+    columns = (Deal.date_deal, Deal.id_deal)
+    cursor = encode_cursor("date", [date(2023, 3, 1), "deal01"])
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "date", columns) == [date(2023, 3, 1), "deal01"]
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "не-base64!",
+    _b64(b"not json"),
+    _b64(b'{"sort": "date"}'),
+    _b64(b'["id", ["deal01"]]'),                 # курсор другой сортировки
+    _b64(b'["date", ["2023-03-01"]]'),           # не все колонки ключа
+    _b64(b'["date", ["01.03.2023", "deal01"]]'),  # дата не ISO
+])
+def test_invalid_cursor_is_400(client, cursor):
+    resp = client.get("/api/deals", params={"sort": "date", "cursor": cursor})
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Некорректный курсор"
+
+
+def test_unknown_sort_is_400(client):
+    assert client.get("/api/deals", params={"sort": "price"}).status_code == 400
@@ -0,0 +1,52 @@
+"""Справочники из refcache: 304 по ETag и инвалидация по версиям в БД (в том числе из чужого подключения)."""
+
+from __future__ import annotations
+import sqlite3
+
+from sqlalchemy import update
+
+EXECUTOR = dict(
+    type_executor=1, name_executor="Пётр Сидоров", inn_executor="7701234568", ogrn_executor="1027700000002",
+    kpp_executor=None, adress_executor="Адрес", bank_executor="Банк", cor_bank_executor="30101810400000000225",
+    acc_bank_executor="40702810900000000002", bik_bank_executor="044525225", contact_name_executor="Пётр Сидоров",
+    mail_executor="petr@example.com", tel_executor="+79001234568", mess_executor="Telegram",
+)
+
+
+def _get(client, etag: str | None = None):
+    return client.get("/api/executors", headers={"If-None-Match": etag} if etag else {})
+
+
+def test_matching_etag_is_304_without_body(client):
+    first = _get(client)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    again = _get(client, etag)
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    assert _get(client, f'"stale", W/{etag}').status_code == 304
+
+
+def test_write_outside_the_process_invalidates(client, engine):
+    etag = _get(client).headers["etag"]
+    # другой воркер / ручная правка: обычный sqlite3, мимо сессий и событий SQLAlchemy
+    with sqlite3.connect(engine.url.database) as conn:
+        columns = ", ".join(EXECUTOR)
+        conn.execute(f"INSERT INTO executors (id_executor, {columns}) VALUES (?, {', '.join('?' * len(EXECUTOR))})",
+                     ("executor_refcache_test", *EXECUTOR.values()))
+    r = _get(client, etag)
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    assert "executor_refcache_test" in {e["id_executor"] for e in r.json()}
+
+
+def test_core_update_invalidates(client, engine):
+    from models import Executor
+
+    etag = _get(client).headers["etag"]
+    with engine.begin() as conn:
+        conn.execute(update(Executor).where(Executor.id_executor == "executor1").values(name_executor="Иван Петров-2"))
+    r = _get(client, etag)
+    assert r.status_code == 200
+    assert {e["id_executor"]: e["name_executor"] for e in r.json()}["executor1"] == "Иван Петров-2"
@@ -0,0 +1,74 @@
+"""Поиск клиентов: FTS5 на SQLite (ступени ранжирования, синхронизация триггерами, ИНН), запрос PostgreSQL."""
+
+from __future__ import annotations
+
+import pytest
+
+
+def _search(client, q: str, limit: int = 10) -> list[dict]:
+    resp = client.get("/api/clients/search", params={"q": q, "limit": limit})
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+@pytest.fixture(scope="module")
+def clients(engine, make_client):
+    return {name: make_client(name) for name in ("Ромашка Северная Плюс", "Ромашка", "Сервис Иванова")}
+
+
+def test_prefix_tokens_in_any_order(client, clients):
+    assert [h["name"] for h in _search(client, "север ромаш")] == ["Ромашка Северная Плюс"]
+    # внутри ступени — короче название выше
+    names = [h["name"] for h in _search(client, "ромаш")]
+    assert names[:2] == ["Ромашка", "Ромашка Северная Плюс"]
+
+
+def test_name_matches_rank_above_contact(client, clients):
+    # «Иван Петров» — контактное лицо у всех клиентов теста, в названии — только у одного
+    hits = _search(client, "иван", limit=50)
+    assert hits[0]["name"] == "Сервис Иванова"
+    assert len(hits) > 1
+
+
+def test_fts_follows_updates_and_deletes(client, make_client):
+    from db import SessionLocal
+    from models import Client
+
+    id_client = make_client("Одуванчик")
+    assert [h["id"] for h in _search(client, "одуван")] == [id_client]
+    db = SessionLocal()
+    try:
+        db.get(Client, id_client).name_client = "Лютик"
+        db.commit()
+        assert _search(client, "одуван") == []
+        assert [h["id"] for h in _search(client, "лютик")] == [id_client]
+        db.delete(db.get(Client, id_client))
+        db.commit()
+    finally:
+        db.close()
+    assert _search(client, "лютик") == []
+
+
+def test_digits_search_by_inn_prefix(client, clients):
+    from conftest import CLIENT_REQUISITES
+
+    inn = CLIENT_REQUISITES["inn_client"]
+    hits = _search(client, inn[:6], limit=50)
+    assert hits and all(h["inn"].startswith(inn[:6]) for h in hits)
+    assert _search(client, "99999999") == []
+
+
+def test_pg_query_escapes_like_and_bounds_ranking():
+    from sqlalchemy.dialects import postgresql
+
+    import search
+
+    assert search._like_escape("a_b%c\\") == "a\\_b\\%c\\\\"
+    compiled = search._pg_text_query(search.CLIENTS, ["ооо", "a_b"], 10).compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert sql.count("ESCAPE") == 2
+    # word_similarity сортирует только кандидатов подзапроса с LIMIT
+    inner, outer = sql.split("ORDER BY")
+    assert "LIMIT" in inner and "word_similarity" in outer
+    assert search.RANK_CANDIDATES in compiled.params.values()
+    assert "%a\\_b%" in compiled.params.values()
@@ -0,0 +1,88 @@
+"""Подписанные PDF: загрузка, дедупликация без смены mtime, Range, ETag/304, сборка мусора."""
+
+from __future__ import annotations
+import hashlib
+import os
+import time
+from datetime import date
+
+import pytest
+
+PDF = b"%PDF-1.4\n" + bytes(range(256)) * 64 + b"\n%%EOF\n"
+OLD = time.time() - 7 * 24 * 3600
+
+
+@pytest.fixture
+def deal_id(engine, make_client) -> str:
+    from db import SessionLocal
+    from models import Deal
+
+    db = SessionLocal()
+    try:
+        deal = Deal(id_client_deal=make_client(), id_executor_deal="executor1", number_deal="1",
+                    date_deal=date(2024, 1, 10), path_doc_deal="d.doc", path_pdf_deal="d.pdf")
+        db.add(deal)
+        db.commit()
+        return deal.id_deal
+    finally:
+        db.close()
+
+
+def _upload(client, id_deal: str, body: bytes):
+    return client.put(f"/api/deals/{id_deal}/signed", content=body, headers={"content-type": "application/pdf"})
+
+
+def test_upload_and_dedup_keep_blob_mtime(client, deal_id, make_client):
+    from storage import SIGNED_DIR
+
+    body = PDF + deal_id.encode()
+    first = _upload(client, deal_id, body).json()
+    assert first["sha256"] == hashlib.sha256(body).hexdigest() and not first["deduplicated"]
+    os.utime(first["path"], (OLD, OLD))
+    second = _upload(client, deal_id, body).json()
+    assert second["deduplicated"] and second["path"] == first["path"]
+    assert os.stat(first["path"]).st_mtime == OLD
+    assert list((SIGNED_DIR / "tmp").iterdir()) == []  # ни .part, ни аренд
+
+
+def test_rejects_non_pdf_and_missing_deal(client, deal_id):
+    assert _upload(client, deal_id, b"GIF89a" + PDF).status_code == 415
+    assert _upload(client, "deal_missing", PDF).status_code == 404
+
+
+def test_download_range_and_etag(client, deal_id):
+    body = PDF + b"range" + deal_id.encode()
+    digest = _upload(client, deal_id, body).json()["sha256"]
+    url = f"/api/deals/{deal_id}/signed"
+
+    resp = client.get(url)
+    assert resp.status_code == 200 and resp.content == body
+    assert resp.headers["etag"] == f'"{digest}"'
+    assert client.get(url, headers={"If-None-Match": f'"{digest}"'}).status_code == 304
+
+    part = client.get(url, headers={"Range": "bytes=0-4"})
+    assert part.status_code == 206 and part.content == b"%PDF-"
+    assert part.headers["content-range"] == f"bytes 0-4/{len(body)}"
+    # If-Range с чужим ETag — весь файл
+    assert client.get(url, headers={"Range": "bytes=0-4", "If-Range": '"other"'}).status_code == 200
+
+
+def test_gc_keeps_referenced_and_leased_blobs(client, deal_id):
+    import signed_docs
+
+    referenced = _upload(client, deal_id, PDF + b"ref" + deal_id.encode()).json()["path"]
+    orphan, leased = (signed_docs.blob_path(hashlib.sha256(tag + deal_id.encode()).hexdigest())
+                      for tag in (b"orphan", b"leased"))
+    for blob in (orphan, leased):
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        blob.write_bytes(PDF)
+    for blob in (referenced, orphan, leased):
+        os.utime(blob, (OLD, OLD))
+    lease = signed_docs.SIGNED_DIR / "tmp" / f"{leased.stem}.upload.lease"
+    lease.touch()
+    try:
+        signed_docs.collect_garbage()
+    finally:
+        lease.unlink()
+    assert os.path.exists(referenced) and leased.exists()
+    assert not orphan.exists()
@@ -0,0 +1,96 @@
+"""Пересчёт статусов: даты, исправленные задним числом, удаление приложений, один исполнитель."""
+
+from __future__ import annotations
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import delete, select, update
+
+TODAY = date(2030, 6, 1)
+
+
+@pytest.fixture
+def deal(make_client, service_id):
+    """Договор с одним приложением до TODAY + 30 и id этого приложения."""
+    from db import SessionLocal
+    from models import Attachment, Deal
+
+    db = SessionLocal()
+    try:
+        attachment = Attachment(id_service_attachment=service_id, date_start_attachment=TODAY - timedelta(days=30),
+                                date_end_attachment=TODAY + timedelta(days=30), place_attachment="Москва",
+                                path_doc_attachment="a.doc", path_pdf_attachment="a.pdf")
+        deal = Deal(id_client_deal=make_client(), id_executor_deal="executor1", number_deal="1",
+                    date_deal=TODAY - timedelta(days=30), path_doc_deal="d.doc", path_pdf_deal="d.pdf",
+                    attachments=[attachment])
+        db.add(deal)
+        db.commit()
+        return deal.id_deal, attachment.id_attachment
+    finally:
+        db.close()
+
+
+def _statuses(id_deal: str) -> tuple[bool, list[bool]]:
+    from db import SessionLocal
+    from models import Attachment, Deal
+
+    db = SessionLocal()
+    try:
+        deal_status = db.scalar(select(Deal.status_deal).where(Deal.id_deal == id_deal))
+        return deal_status, db.scalars(
+            select(Attachment.status_attachment).where(Attachment.id_attachment_deal == id_deal)).all()
+    finally:
+        db.close()
+
+
+def _recompute(today: date, full: bool = False):
+    import status_engine
+    return status_engine.recompute_once(today=today, full=full)
+
+
+def test_backdated_end_date_expires_without_full_pass(deal):
+    from db import engine
+    from models import Attachment
+
+    id_deal, id_attachment = deal
+    _recompute(TODAY)
+    assert _statuses(id_deal) == (True, [True])
+
+    _recompute(TODAY + timedelta(days=1))
+    # дата окончания исправлена задним числом — раньше даты прошлого прохода
+    with engine.begin() as conn:
+        conn.execute(update(Attachment).where(Attachment.id_attachment == id_attachment)
+                     .values(date_end_attachment=TODAY - timedelta(days=10)))
+    report = _recompute(TODAY + timedelta(days=2))
+    assert report.attachments_expiry.changed >= 1
+    assert _statuses(id_deal) == (False, [False])
+
+
+def test_deleting_active_attachment_clears_deal_status(deal):
+    from db import engine
+    from models import Attachment
+
+    id_deal, id_attachment = deal
+    _recompute(TODAY)
+    assert _statuses(id_deal) == (True, [True])
+
+    with engine.begin() as conn:
+        conn.execute(delete(Attachment).where(Attachment.id_attachment == id_attachment))
+    assert _statuses(id_deal) == (False, [])
+    _recompute(TODAY)
+    assert _statuses(id_deal) == (False, [])
+
+
+def test_recompute_runs_in_one_worker():
+    from db import engine
+    from status_engine import _Leader
+
+    first, second = _Leader(engine), _Leader(engine)
+    try:
+        assert first.acquire()
+        assert not second.acquire()
+        first.release()
+        assert second.acquire()
+    finally:
+        first.release()
+        second.release()